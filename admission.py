@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Coalesce concurrent identical queries into one computation
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+# Scoring computations allowed to run at once per process
+MAX_CONCURRENT_QUERIES = int(os.environ.get("MAX_CONCURRENT_QUERIES", 8))
+# Seconds a computation may wait for a free slot before the request is shed
+ADMISSION_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", 1.0))
+# Retry-After sent with shed requests, in seconds
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER", 1))
+
+class Overloaded(Exception):
+    """
+    Raised when no scoring slot frees up within the admission timeout.
+    """
+    
+    def __init__(self, retry_after: int = RETRY_AFTER):
+        super().__init__("Server is overloaded, please retry shortly")
+        self.retry_after = retry_after
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one computation.
+    
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it runs wait for it and get the same result, or the same exception.
+    Nothing is remembered once the call finishes; caching is left to the caller.
+    """
+    
+    def __init__(self, enabled: bool = SINGLE_FLIGHT):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Return fn(), sharing one in-flight call among concurrent callers with equal keys.
+        """
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AdmissionLimiter:
+    """
+    Bounds the scoring computations running at once in this process.
+    
+    A computation waits up to timeout seconds for a slot and is otherwise shed
+    with Overloaded, so a burst is answered with 503 and Retry-After instead of
+    queueing until the server's worker timeout kills the process.
+    """
+    
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_QUERIES, timeout: float = ADMISSION_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.shed = 0
+    
+    @contextmanager
+    def slot(self):
+        """
+        Hold a scoring slot for the duration of the block.
+        
+        Raises:
+            Overloaded: If no slot frees up within the timeout
+        """
+        if self._slots is None:
+            yield
+            return
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.shed += 1
+            logger.warning(f"Shedding request: {self.max_concurrent} scoring computations already running")
+            raise Overloaded()
+        with self._lock:
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
@@ -1,14 +1,27 @@
+import gc
 import os
-import json
+import sys
+import math
+import time
+import hmac
+import hashlib
+import signal
 import logging
-import csv
-from flask import Flask, render_template, request, jsonify
+import threading
+from flask import Flask, Response, g, render_template, request, jsonify
 from rag_engine import RAGEngine
-from scraper import scrape_shl_products
-from data_processor import process_data
+from query_cache import QueryCache, normalize_query
+from data_processor import compact_catalog, process_data, completed_urls
+from index_manager import IndexManager
+from metrics import REGISTRY, STAGE_SECONDS
+from product_store import FILTER_FIELDS, filters_key, parse_filters
+from response_encoding import compress_response, dumps, json_array, splice
+from admission import AdmissionLimiter, Overloaded, SingleFlight
+from pagination import (CURSOR_TTL, MAX_TOP_K, RANKED_CACHE_SIZE, RANKED_LIST_SIZE, clamp_top_k, decode_cursor,
+                        encode_cursor)
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -20,13 +33,41 @@ if os.environ.get("RENDER", False):
     app.config['PROPAGATE_EXCEPTIONS'] = True
     app.config['DEBUG'] = False
 
-# Initialize RAG engine
-rag_engine = None
+# Response cache in front of get_recommendations
+query_cache = QueryCache(
+    max_size=int(os.environ.get("QUERY_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("QUERY_CACHE_TTL", 300))
+)
+# Ranked lists behind pagination cursors; later pages are slices of them, without rescoring
+ranked_cache = QueryCache(max_size=RANKED_CACHE_SIZE, ttl=CURSOR_TTL)
+# Concurrent identical requests share one computation, and scoring runs in a bounded
+# number of slots; requests that cannot get one in time are shed with 503
+in_flight = SingleFlight()
+limiter = AdmissionLimiter()
+
+# Upper bound on queries accepted by one batch request
+MAX_BATCH_QUERIES = int(os.environ.get("MAX_BATCH_QUERIES", 1000))
+# Queries scored together per step when streaming batch results
+BATCH_STREAM_SIZE = 64
+# Seconds browsers and CDNs may reuse a GET search response before revalidating its ETag
+SEARCH_CACHE_MAX_AGE = int(os.environ.get("SEARCH_CACHE_MAX_AGE", 60))
+# Build the index while the module is imported (gunicorn --preload imports it once in the
+# master), so forked workers share the index arrays copy-on-write instead of each loading a copy
+def gunicorn_preloading():
+    """
+    Whether this import runs in a gunicorn master started with --preload (on the
+    command line or in GUNICORN_CMD_ARGS), which forks its workers afterwards.
+    """
+    if "gunicorn" not in os.path.basename(sys.argv[0]):
+        return False
+    return "--preload" in sys.argv[1:] + os.environ.get("GUNICORN_CMD_ARGS", "").split()
+
+PRELOAD_INDEX = os.environ.get("PRELOAD_INDEX", "false").lower() in ("1", "true", "yes") or gunicorn_preloading()
 
 # Check if data exists, otherwise scrape and process it
 def initialize_data():
     data_dir = "data"
-    json_file = os.path.join(data_dir, "shl_products.json")
+    jsonl_file = os.path.join(data_dir, "shl_products.jsonl")
     csv_file = os.path.join(data_dir, "shl_products.csv")
     
     # Create data directory if it doesn't exist
@@ -34,33 +75,289 @@ def initialize_data():
         os.makedirs(data_dir)
     
     # If data doesn't exist, scrape and process it
-    if not os.path.exists(json_file) or not os.path.exists(csv_file):
+    if not os.path.exists(jsonl_file) or not os.path.exists(csv_file):
         logger.info("Data files not found. Scraping SHL products...")
-        shl_products = scrape_shl_products()
+        # The crawler stack (requests, bs4, trafilatura) is only loaded when scraping
+        from scraper import iter_shl_products
         
-        # Process the scraped data
-        logger.info("Processing scraped data...")
-        process_data(shl_products)
+        # Stream scrape -> clean -> chunk -> write; resumes after an interrupted run
+        done = completed_urls(data_dir)
+        process_data(iter_shl_products(skip_urls=done), data_dir)
     
     return
 
-# Initialize the RAG engine
-def initialize_rag():
-    global rag_engine
+# Build a fully indexed RAG engine
+def build_engine():
     logger.info("Initializing RAG engine with TF-IDF...")
-    rag_engine = RAGEngine(data_path="data/shl_products.json")
-    rag_engine.load_data()
-    rag_engine.build_index()
+    engine = RAGEngine(data_path="data/shl_products.jsonl", index_dir="data/index")
+    engine.load_data()
+    # A rebuild drops products tombstoned by catalog refreshes; the index is then refit without them
+    if engine.products.removed.any():
+        compact_catalog(engine.data_path)
+        engine.load_data()
+    # Reuse the persisted index when the source data is unchanged
+    engine.load_or_build_index()
     logger.info("RAG engine initialized successfully.")
+    return engine
+
+def on_index_swap(engine):
+    # Results from a previous index must not be served
+    query_cache.clear()
+    ranked_cache.clear()
+
+# The live RAG engine snapshot; rebuilt in the background and swapped atomically
+index_manager = IndexManager(build_engine, on_swap=on_index_swap)
+
+# Request and cache metrics, exposed at /metrics
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests handled", labelnames=("endpoint", "method", "status"))
+HTTP_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency", labelnames=("endpoint",))
+REGISTRY.counter("rag_cache_hits_total", "Query cache hits").set_function(lambda: query_cache.hits)
+REGISTRY.counter("rag_cache_misses_total", "Query cache misses").set_function(lambda: query_cache.misses)
+REGISTRY.gauge("rag_cache_entries", "Entries in the query cache").set_function(lambda: query_cache.stats()['size'])
+REGISTRY.counter("rag_coalesced_requests_total", "Requests that waited for an identical in-flight computation").set_function(
+    lambda: in_flight.coalesced)
+REGISTRY.counter("rag_shed_requests_total", "Requests answered 503 because no scoring slot was free").set_function(
+    lambda: limiter.shed)
+REGISTRY.gauge("rag_scoring_in_progress", "Scoring computations running").set_function(lambda: limiter.running)
+REGISTRY.gauge("rag_ranked_lists", "Ranked lists kept for pagination cursors").set_function(
+    lambda: ranked_cache.stats()['size'])
+REGISTRY.gauge("rag_index_ready", "Whether an index snapshot is live").set_function(lambda: int(index_manager.ready))
+REGISTRY.gauge("rag_index_chunks", "Chunks in the live index snapshot").set_function(
+    lambda: len(index_manager.current.chunks) if index_manager.current else 0)
+
+def refresh_rag(wait=False):
+    """
+    Incrementally refresh the catalog in the background and swap in the updated engine.
+    Queries keep using the current engine until the swap.
+    """
+    # Imported on first refresh so query-only workers never load the scraper
+    from catalog_refresh import refresh_catalog
+    return index_manager.update(lambda engine: refresh_catalog(engine)[0], wait=wait)
+
+def get_recommendations(engine, user_query, top_k=4, min_score=0.0, filters=None, offset=0):
+    """
+    Serve a page of recommendations from the query cache, computing it on a miss.
+    Keys include the index version, so a rebuilt index never serves stale results.
+    
+    A query is ranked once, RANKED_LIST_SIZE products deep, and the ranked list is
+    kept in ranked_cache; every page, including the first, is a slice of it.
+    Concurrent misses for the same page (or ranked list) wait for one computation,
+    and ranking runs under the admission limiter.
+    
+    Returns:
+        Tuple of (number of recommendations, recommendations as an encoded JSON array,
+        cursor of the next page or None on the last page)
+    
+    Raises:
+        Overloaded: If no scoring slot frees up in time
+    """
+    filters = filters or {}
+    list_key = (normalize_query(user_query), min_score, filters_key(filters), engine.index_version)
+    key = list_key + (top_k, offset)
+    
+    def rank():
+        with limiter.slot():
+            ranked = engine.get_ranked(user_query, RANKED_LIST_SIZE, min_score=min_score, filters=filters)
+        ranked_cache.put(list_key, ranked)
+        return ranked
+    
+    def page():
+        ranked = ranked_cache.get(list_key)
+        if ranked is None:
+            ranked = in_flight.do(list_key, rank)
+        recommendations = engine.get_page_json(ranked, offset, top_k)
+        next_offset = offset + top_k
+        next_cursor = None
+        if top_k > 0 and next_offset < len(ranked[0]):
+            next_cursor = encode_cursor(user_query, min_score, filters, engine.index_version, next_offset)
+        result = (len(recommendations), json_array(recommendations), next_cursor)
+        query_cache.put(key, result)
+        return result
+    
+    cached = query_cache.get(key)
+    if cached is None:
+        cached = in_flight.do(key, page)
+    return cached
+
+def json_response(envelope, name=None, raw=None, status=200):
+    """
+    JSON response of envelope, with raw (already-encoded JSON) spliced in as member name.
+    """
+    body = splice(envelope, name, raw) if name else dumps(envelope)
+    return Response(body, status=status, mimetype='application/json')
+
+def search_etag(engine):
+    """
+    Validator for GET search responses: the query arguments and the index version fully
+    determine the body, so it is known before any scoring happens.
+    """
+    digest = hashlib.sha256(str(engine.index_version).encode('utf-8'))
+    digest.update(dumps(sorted(request.args.items(multi=True))))
+    return digest.hexdigest()[:32]
+
+def not_modified(etag):
+    return cacheable(Response(status=304), etag)
+
+def cacheable(response, etag):
+    # Weak, since the compressed and plain bodies are equivalent but not byte-identical
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = SEARCH_CACHE_MAX_AGE
+    return response
 
-# Initialize data and RAG engine
+def request_filters(data=None):
+    """
+    Structured filters from a JSON body's 'filters' object, or else from query
+    parameters (e.g. ?test_type=P,K&max_duration=30&remote=true).
+    
+    Raises:
+        ValueError: For unknown filters or invalid values
+    """
+    if data is not None and data.get('filters') is not None:
+        if not isinstance(data['filters'], dict):
+            raise ValueError("'filters' must be an object")
+        return parse_filters(data['filters'])
+    return parse_filters({field: request.args.get(field) for field in FILTER_FIELDS})
+
+def request_min_score(data):
+    """
+    'min_score' from a JSON body or query parameters as a float, 0.0 when absent.
+    
+    Raises:
+        ValueError: If it is not a finite number
+    """
+    try:
+        min_score = float(data.get('min_score', 0.0))
+    except (ValueError, TypeError):
+        raise ValueError("'min_score' must be a number")
+    if not math.isfinite(min_score):
+        raise ValueError("'min_score' must be a finite number")
+    return min_score
+
+def invalid_min_score(error):
+    return jsonify({
+        'success': False,
+        'error': str(error)
+    }), 400
+
+def invalid_filters(error):
+    return jsonify({
+        'success': False,
+        'error': f'Invalid filters: {error}'
+    }), 400
+
+def resume_cursor(cursor):
+    """
+    Query, min_score, parsed filters and offset of the page a cursor points to.
+    
+    Raises:
+        ValueError: For malformed cursors
+    """
+    page = decode_cursor(cursor)
+    page['filters'] = parse_filters(page['filters'])
+    return page
+
+def invalid_cursor(error):
+    return jsonify({
+        'success': False,
+        'error': f'Invalid cursor: {error}'
+    }), 400
+
+def cursor_expired():
+    # The ranking the cursor pages through came from an index that has been replaced
+    return jsonify({
+        'success': False,
+        'error': 'Cursor has expired because the index was updated, please run the query again'
+    }), 410
+
+def overloaded(error):
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def index_not_ready():
+    return jsonify({
+        'success': False,
+        'error': 'Index is not ready yet, please retry shortly'
+    }), 503
+
+def preload_index():
+    """
+    Build the index before workers are forked and freeze the heap.
+    
+    NumPy buffers are never written after the build, so their pages stay shared
+    between the master and every worker. gc.freeze() moves the remaining Python
+    objects out of the collector's reach, so collections in the workers do not
+    write to (and thereby copy) the pages holding them. An index rebuilt later in
+    a worker (reindex, refresh, SIGUSR2) is private to that worker.
+    """
+    # Pool processes are not inherited by forked workers; each worker starts its own, and
+    # if this build fails, each worker builds (and retries) on its own instead of the master blocking
+    index_manager.rebuild(wait=True, warm=False, retry=False)
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded index; {gc.get_freeze_count()} objects frozen for sharing with workers")
+
+def watch_rebuild_requests(requested):
+    while True:
+        requested.wait()
+        requested.clear()
+        index_manager.rebuild()
+
+def install_signal_handlers():
+    """
+    SIGUSR2 sent to a worker process triggers a background rebuild.
+    
+    The handler only sets an event that a watcher thread waits on: starting the
+    rebuild takes the index manager's lock, which would deadlock inside a handler
+    that interrupted a thread holding it.
+    """
+    if not hasattr(signal, 'SIGUSR2'):
+        return
+    requested = threading.Event()
+    try:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: requested.set())
+    except ValueError:
+        # Not in the main thread (e.g. imported by a threaded server)
+        return
+    threading.Thread(target=watch_rebuild_requests, args=(requested,), name="rebuild-signal", daemon=True).start()
+
+# Initialize data, then build the index: up front when preloading, otherwise in
+# the background so the worker can start serving readiness checks immediately
 with app.app_context():
     try:
         initialize_data()
-        initialize_rag()
+        if PRELOAD_INDEX:
+            preload_index()
+        else:
+            index_manager.rebuild()
     except Exception as e:
         logger.error(f"Error during initialization: {str(e)}")
 
+install_signal_handlers()
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # Label by route pattern, not raw path, to keep the number of series bounded
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'request_start' in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.after_request
+def compress(response):
+    # Registered after record_request, so it runs first and the timing includes compression
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
 # Routes
 @app.route('/')
 def index():
@@ -70,31 +367,156 @@ def index():
 def query():
     try:
         # Get the query from the request
+        parse_start = time.perf_counter()
         data = request.get_json()
         user_query = data.get('query', '')
-        top_k = data.get('top_k', 4)  # Allow customizing number of results
+        top_k = clamp_top_k(data.get('top_k', 4))  # Allow customizing number of results, up to MAX_TOP_K
+        cursor = data.get('cursor')  # Next page of an earlier query
+        
+        try:
+            min_score = request_min_score(data)  # Drop low-relevance tails
+        except ValueError as e:
+            return invalid_min_score(e)
+        
+        if cursor:
+            try:
+                page = resume_cursor(cursor)
+            except ValueError as e:
+                return invalid_cursor(e)
+            user_query, min_score, filters = page['query'], page['min_score'], page['filters']
+        else:
+            if not user_query.strip():
+                return jsonify({
+                    'success': False,
+                    'error': 'Query cannot be empty'
+                }), 400
+            
+            try:
+                filters = request_filters(data)
+            except ValueError as e:
+                return invalid_filters(e)
+        STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage='parse')
+        
+        # Serve from the current index snapshot
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        if cursor and page['index_version'] != engine.index_version:
+            return cursor_expired()
+        
+        # Get recommendations
+        count, recommendations, next_cursor = get_recommendations(
+            engine, user_query, top_k=top_k, min_score=min_score, filters=filters, offset=page['offset'] if cursor else 0)
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            return json_response({
+                'success': True,
+                'query': user_query,
+                'filters': filters,
+                'count': count,
+                'next_cursor': next_cursor
+            }, 'recommendations', recommendations)
+    
+    except Overloaded as e:
+        return overloaded(e)
+    
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/query/batch', methods=['POST'])
+def query_batch():
+    """
+    Score many queries in one request.
+    Accepts a JSON list of query strings, or an object with 'queries', 'top_k',
+    'min_score', 'filters' (applied to every query) and 'stream'. With streaming
+    enabled (or an NDJSON Accept header) results are sent back as one JSON line per query.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            data = {'queries': data}
+        elif not isinstance(data, dict):
+            data = {}
+        
+        queries = data.get('queries', [])
+        top_k = clamp_top_k(data.get('top_k', 4))
+        stream = data.get('stream', False) or 'application/x-ndjson' in request.headers.get('Accept', '')
         
-        if not user_query.strip():
+        if not isinstance(queries, list) or not queries:
             return jsonify({
                 'success': False,
-                'error': 'Query cannot be empty'
+                'error': 'Body must contain a non-empty list of queries'
             }), 400
         
-        # Ensure RAG engine is initialized
-        if rag_engine is None:
-            initialize_rag()
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_QUERIES} queries are allowed per batch'
+            }), 400
         
-        # Get recommendations
-        recommendations = rag_engine.get_recommendations(user_query, top_k=top_k)
+        try:
+            min_score = request_min_score(data)
+        except ValueError as e:
+            return invalid_min_score(e)
         
-        return jsonify({
-            'success': True,
-            'query': user_query,
-            'recommendations': recommendations
-        })
+        queries = [q if isinstance(q, str) else '' for q in queries]
+        
+        try:
+            filters = request_filters(data)
+        except ValueError as e:
+            return invalid_filters(e)
+        
+        # Serve from the current index snapshot
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        
+        if stream:
+            def generate():
+                for start in range(0, len(queries), BATCH_STREAM_SIZE):
+                    batch = queries[start:start + BATCH_STREAM_SIZE]
+                    try:
+                        with limiter.slot():
+                            batch_recommendations = engine.get_recommendations_batch_json(
+                                batch, top_k=top_k, min_score=min_score, filters=filters)
+                    except Overloaded as e:
+                        # Headers are already sent, so the remaining queries end the stream with an error line
+                        yield dumps({'index': start, 'error': str(e)}) + b"\n"
+                        return
+                    for offset, (user_query, recommendations) in enumerate(zip(batch, batch_recommendations)):
+                        yield splice({
+                            'index': start + offset,
+                            'query': user_query,
+                            'count': len(recommendations)
+                        }, 'recommendations', json_array(recommendations)) + b"\n"
+            
+            return Response(generate(), mimetype='application/x-ndjson')
+        
+        with limiter.slot():
+            batch_recommendations = engine.get_recommendations_batch_json(queries, top_k=top_k, min_score=min_score,
+                                                                          filters=filters)
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            return json_response({
+                'success': True,
+                'count': len(queries)
+            }, 'results', json_array(
+                splice({
+                    'query': user_query,
+                    'count': len(recommendations)
+                }, 'recommendations', json_array(recommendations))
+                for user_query, recommendations in zip(queries, batch_recommendations)
+            ))
+    
+    except Overloaded as e:
+        return overloaded(e)
     
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
+        logger.error(f"Error processing batch query: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -104,35 +526,65 @@ def query():
 def search():
     try:
         # Get query from URL parameters
+        parse_start = time.perf_counter()
         user_query = request.args.get('q', '')
-        top_k = request.args.get('limit', 4)
+        # Convert top_k to integer with error handling, capped at MAX_TOP_K
+        top_k = clamp_top_k(request.args.get('limit', 4))
+        cursor = request.args.get('cursor')
         
-        # Convert top_k to integer with error handling
         try:
-            top_k = int(top_k)
-        except (ValueError, TypeError):
-            top_k = 4
-            
-        if not user_query.strip():
-            return jsonify({
-                'success': False,
-                'error': 'Query parameter q cannot be empty'
-            }), 400
-            
-        # Ensure RAG engine is initialized
-        if rag_engine is None:
-            initialize_rag()
+            min_score = request_min_score(request.args)
+        except ValueError as e:
+            return invalid_min_score(e)
+        
+        if cursor:
+            try:
+                page = resume_cursor(cursor)
+            except ValueError as e:
+                return invalid_cursor(e)
+            user_query, min_score, filters = page['query'], page['min_score'], page['filters']
+        else:
+            if not user_query.strip():
+                return jsonify({
+                    'success': False,
+                    'error': 'Query parameter q cannot be empty'
+                }), 400
             
-        # Get recommendations
-        recommendations = rag_engine.get_recommendations(user_query, top_k=top_k)
+            try:
+                filters = request_filters()
+            except ValueError as e:
+                return invalid_filters(e)
+        STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage='parse')
         
-        return jsonify({
-            'success': True,
-            'query': user_query,
-            'count': len(recommendations),
-            'recommendations': recommendations
-        })
+        # Serve from the current index snapshot
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        if cursor and page['index_version'] != engine.index_version:
+            return cursor_expired()
         
+        # Clients and CDNs revalidating an unchanged result skip scoring entirely
+        etag = search_etag(engine)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
+        # Get recommendations
+        count, recommendations, next_cursor = get_recommendations(
+            engine, user_query, top_k=top_k, min_score=min_score, filters=filters, offset=page['offset'] if cursor else 0)
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            response = json_response({
+                'success': True,
+                'query': user_query,
+                'filters': filters,
+                'count': count,
+                'next_cursor': next_cursor
+            }, 'recommendations', recommendations)
+        return cacheable(response, etag)
+    
+    except Overloaded as e:
+        return overloaded(e)
+    
     except Exception as e:
         logger.error(f"Error processing search query: {str(e)}")
         return jsonify({
@@ -148,6 +600,8 @@ def text_query():
     """
     try:
         # Handle different request types
+        parse_start = time.perf_counter()
+        data = None
         if request.method == 'GET':
             user_query = request.args.get('query', '')
         elif request.content_type and 'application/json' in request.content_type:
@@ -158,41 +612,197 @@ def text_query():
         else:
             # For plain text POST body
             user_query = request.get_data(as_text=True)
+        
+        # Get limit parameter, capped at MAX_TOP_K
+        limit = clamp_top_k(request.args.get('limit', 4))
+        cursor = (data or {}).get('cursor') or request.args.get('cursor')
+        min_score = 0.0
+        
+        if cursor:
+            try:
+                page = resume_cursor(cursor)
+            except ValueError as e:
+                return invalid_cursor(e)
+            user_query, min_score, filters = page['query'], page['min_score'], page['filters']
+        else:
+            if not user_query.strip():
+                return jsonify({
+                    'success': False,
+                    'error': 'Query cannot be empty'
+                }), 400
             
-        # Get limit parameter
+            try:
+                filters = request_filters(data)
+            except ValueError as e:
+                return invalid_filters(e)
+        STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage='parse')
+        
+        # Serve from the current index snapshot
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        if cursor and page['index_version'] != engine.index_version:
+            return cursor_expired()
+        
+        etag = search_etag(engine) if request.method == 'GET' else None
+        if etag and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
+        # Get recommendations
+        count, recommendations, next_cursor = get_recommendations(
+            engine, user_query, top_k=limit, min_score=min_score, filters=filters, offset=page['offset'] if cursor else 0)
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            response = json_response({
+                'success': True,
+                'query': user_query,
+                'count': count,
+                'next_cursor': next_cursor
+            }, 'recommendations', recommendations)
+        return cacheable(response, etag) if etag else response
+    
+    except Overloaded as e:
+        return overloaded(e)
+    
+    except Exception as e:
+        logger.error(f"Error processing text query: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    """
+    Autocomplete: product titles and vocabulary terms completing the typed prefix.
+    Answered from an in-memory prefix index, so it is cheap enough to call on every keystroke.
+    """
+    try:
+        prefix = request.args.get('prefix', '')
         try:
-            limit = request.args.get('limit', 4)
-            limit = int(limit)
+            limit = int(request.args.get('limit', 8))
         except (ValueError, TypeError):
-            limit = 4
-            
-        if not user_query.strip():
-            return jsonify({
-                'success': False,
-                'error': 'Query cannot be empty'
-            }), 400
-            
-        # Ensure RAG engine is initialized
-        if rag_engine is None:
-            initialize_rag()
-            
-        # Get recommendations
-        recommendations = rag_engine.get_recommendations(user_query, top_k=limit)
+            limit = 8
         
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        
+        suggestions = engine.suggest(prefix, limit=limit)
         return jsonify({
             'success': True,
-            'query': user_query,
-            'count': len(recommendations),
-            'recommendations': recommendations
+            'prefix': prefix,
+            'suggestions': suggestions
         })
+    
+    except Exception as e:
+        logger.error(f"Error processing suggest request: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/similar', methods=['GET'])
+def similar():
+    """
+    Assessments similar to a catalog product, read from the precomputed neighbour table.
+    """
+    try:
+        url = request.args.get('url', '').strip()
+        try:
+            limit = int(request.args.get('limit', 4))
+        except (ValueError, TypeError):
+            return jsonify({
+                'success': False,
+                'error': 'Parameter limit must be an integer'
+            }), 400
+        
+        if not url:
+            return jsonify({
+                'success': False,
+                'error': 'Parameter url cannot be empty'
+            }), 400
         
+        engine = index_manager.current
+        if engine is None:
+            return index_not_ready()
+        
+        # The table holds top_n neighbours per product
+        limit = max(0, min(limit, engine.similar_products.top_n))
+        recommendations = engine.get_similar(url, top_k=limit)
+        if recommendations is None:
+            return jsonify({
+                'success': False,
+                'error': 'No product with this URL in the catalog'
+            }), 404
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            return jsonify({
+                'success': True,
+                'url': url,
+                'count': len(recommendations),
+                'recommendations': recommendations
+            })
+    
     except Exception as e:
-        logger.error(f"Error processing text query: {str(e)}")
+        logger.error(f"Error processing similar request: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Expose query cache counters for sizing the cache."""
+    return jsonify(query_cache.stats())
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once the first index is live, 503 until then."""
+    status = index_manager.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/admin/reindex', methods=['POST'])
+def admin_reindex():
+    """
+    Trigger a background index rebuild ('rebuild') or incremental catalog refresh ('refresh').
+    Requires the ADMIN_TOKEN environment variable and a matching X-Admin-Token header.
+    """
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        return jsonify({
+            'success': False,
+            'error': 'Admin endpoints are disabled'
+        }), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid admin token'
+        }), 403
+    
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'rebuild')
+    if mode == 'rebuild':
+        started = index_manager.rebuild()
+    elif mode == 'refresh':
+        started = refresh_rag()
+    else:
+        return jsonify({
+            'success': False,
+            'error': "mode must be 'rebuild' or 'refresh'"
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'started': started,
+        'status': index_manager.status()
+    }), 202
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency histograms and counters in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 # API Documentation endpoint
 @app.route('/api', methods=['GET'])
 def api_documentation():
@@ -204,19 +814,59 @@ def api_documentation():
                 'name': 'GET /api/search',
                 'description': 'Search for SHL assessment recommendations using GET method',
                 'parameters': [
-                    {'name': 'q', 'type': 'string', 'required': True, 'description': 'Search query text'},
-                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 4, 'description': 'Maximum number of results to return'}
+                    {'name': 'q', 'type': 'string', 'required': True, 'description': 'Search query text (not needed with cursor)'},
+                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 4, 'description': f'Maximum number of results to return (at most {MAX_TOP_K})'},
+                    {'name': 'cursor', 'type': 'string', 'required': False, 'description': 'next_cursor of a previous response; returns the next page of that query'},
+                    {'name': 'min_score', 'type': 'float', 'required': False, 'default': 0.0, 'description': 'Minimum similarity score for a result'},
+                    {'name': 'test_type', 'type': 'string', 'required': False, 'description': 'SHL test type codes or names, comma-separated (e.g. P,K); matches any'},
+                    {'name': 'min_duration', 'type': 'integer', 'required': False, 'description': 'Minimum completion time in minutes'},
+                    {'name': 'max_duration', 'type': 'integer', 'required': False, 'description': 'Maximum completion time in minutes'},
+                    {'name': 'remote', 'type': 'boolean', 'required': False, 'description': 'Remote testing support'},
+                    {'name': 'adaptive', 'type': 'boolean', 'required': False, 'description': 'Adaptive/IRT support'}
                 ],
-                'example': '/api/search?q=leadership%20assessment&limit=5'
+                'example': '/api/search?q=leadership%20assessment&limit=5&test_type=P&max_duration=30'
             },
             {
                 'name': 'POST /api/query',
                 'description': 'Search for SHL assessment recommendations using POST method with JSON body',
                 'body_parameters': [
-                    {'name': 'query', 'type': 'string', 'required': True, 'description': 'Search query text'},
-                    {'name': 'top_k', 'type': 'integer', 'required': False, 'default': 4, 'description': 'Maximum number of results to return'}
+                    {'name': 'query', 'type': 'string', 'required': True, 'description': 'Search query text (not needed with cursor)'},
+                    {'name': 'top_k', 'type': 'integer', 'required': False, 'default': 4, 'description': f'Maximum number of results to return (at most {MAX_TOP_K})'},
+                    {'name': 'cursor', 'type': 'string', 'required': False, 'description': 'next_cursor of a previous response; returns the next page of that query'},
+                    {'name': 'min_score', 'type': 'float', 'required': False, 'default': 0.0, 'description': 'Minimum similarity score for a result'},
+                    {'name': 'filters', 'type': 'object', 'required': False, 'description': 'Structured filters: test_type, min_duration, max_duration, remote, adaptive'}
+                ],
+                'example_body': {'query': 'leadership assessment', 'top_k': 5, 'filters': {'test_type': ['P'], 'remote': True}}
+            },
+            {
+                'name': 'POST /api/query/batch',
+                'description': 'Score many queries in one request with a single matrix product',
+                'body_parameters': [
+                    {'name': 'queries', 'type': 'array[string]', 'required': True, 'description': 'Search query texts (a bare JSON list is also accepted)'},
+                    {'name': 'top_k', 'type': 'integer', 'required': False, 'default': 4, 'description': f'Maximum number of results per query (at most {MAX_TOP_K})'},
+                    {'name': 'min_score', 'type': 'float', 'required': False, 'default': 0.0, 'description': 'Minimum similarity score for a result'},
+                    {'name': 'filters', 'type': 'object', 'required': False, 'description': 'Structured filters: test_type, min_duration, max_duration, remote, adaptive (applied to every query)'},
+                    {'name': 'stream', 'type': 'boolean', 'required': False, 'default': False, 'description': 'Stream one NDJSON line per query'}
+                ],
+                'example_body': {'queries': ['leadership assessment', 'graduate sales'], 'top_k': 3}
+            },
+            {
+                'name': 'GET /api/similar',
+                'description': 'Assessments similar to a catalog product, from a precomputed neighbour table',
+                'parameters': [
+                    {'name': 'url', 'type': 'string', 'required': True, 'description': 'URL of a catalog product'},
+                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 4, 'description': 'Maximum number of results (at most SIMILAR_TOP_N)'}
+                ],
+                'example': '/api/similar?url=https%3A%2F%2Fwww.shl.com%2Fsolutions%2Fproducts%2Fassessments%2Fpersonality-assessment-opq%2F'
+            },
+            {
+                'name': 'GET /api/suggest',
+                'description': 'Autocomplete a partially typed query with product titles and catalog terms',
+                'parameters': [
+                    {'name': 'prefix', 'type': 'string', 'required': True, 'description': 'Text typed so far'},
+                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 8, 'description': 'Maximum number of suggestions (at most 20)'}
                 ],
-                'example_body': {'query': 'leadership assessment', 'top_k': 5}
+                'example': '/api/suggest?prefix=lead'
             },
             {
                 'name': 'GET/POST /api/text',
@@ -224,8 +874,14 @@ def api_documentation():
                 'methods': ['GET', 'POST'],
                 'notes': 'This endpoint is versatile and accepts queries in several formats: GET parameter, POST form, JSON body, or raw text body',
                 'parameters': [
-                    {'name': 'query', 'type': 'string', 'required': True, 'description': 'Search query text (GET parameter)'},
-                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 4, 'description': 'Maximum number of results to return'}
+                    {'name': 'query', 'type': 'string', 'required': True, 'description': 'Search query text (GET parameter; not needed with cursor)'},
+                    {'name': 'limit', 'type': 'integer', 'required': False, 'default': 4, 'description': f'Maximum number of results to return (at most {MAX_TOP_K})'},
+                    {'name': 'cursor', 'type': 'string', 'required': False, 'description': 'next_cursor of a previous response; returns the next page of that query'},
+                    {'name': 'test_type', 'type': 'string', 'required': False, 'description': 'SHL test type codes or names, comma-separated (e.g. P,K); matches any'},
+                    {'name': 'min_duration', 'type': 'integer', 'required': False, 'description': 'Minimum completion time in minutes'},
+                    {'name': 'max_duration', 'type': 'integer', 'required': False, 'description': 'Maximum completion time in minutes'},
+                    {'name': 'remote', 'type': 'boolean', 'required': False, 'description': 'Remote testing support'},
+                    {'name': 'adaptive', 'type': 'boolean', 'required': False, 'description': 'Adaptive/IRT support'}
                 ],
                 'post_formats': [
                     {'content_type': 'application/json', 'example': '{"query": "leadership assessment"}'},
@@ -236,6 +892,29 @@ def api_documentation():
                     'GET /api/text?query=leadership%20assessment&limit=3',
                     'POST /api/text with raw text body "leadership assessment"'
                 ]
+            },
+            {
+                'name': 'GET /api/cache/stats',
+                'description': 'Query cache size, hit, miss and eviction counters'
+            },
+            {
+                'name': 'Load shedding',
+                'description': 'Scoring routes answer 503 with Retry-After when no scoring slot frees up in time; identical concurrent queries share one computation'
+            },
+            {
+                'name': 'GET /metrics',
+                'description': 'Per-stage latency histograms and query, cache and index counters in Prometheus text format'
+            },
+            {
+                'name': 'GET /ready',
+                'description': 'Readiness probe; returns 503 until the first index is live'
+            },
+            {
+                'name': 'POST /api/admin/reindex',
+                'description': 'Start a background index rebuild or incremental refresh (requires X-Admin-Token)',
+                'body_parameters': [
+                    {'name': 'mode', 'type': 'string', 'required': False, 'default': 'rebuild', 'description': "'rebuild' or 'refresh'"}
+                ]
             }
         ]
     }
@@ -0,0 +1,235 @@
+import io
+import os
+import sys
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app import app as flask_app
+from metrics import REGISTRY
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Threads that run scoring requests; numpy and scipy release the GIL for the heavy parts
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 4))
+# Scoring requests allowed to run or wait at once; beyond this new ones get 429
+ASGI_MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", 32))
+# Seconds a scoring request may take before it is answered with 504
+ASGI_REQUEST_TIMEOUT = float(os.environ.get("ASGI_REQUEST_TIMEOUT", 10))
+
+# Routes whose handlers score queries and go through the bounded executor
+SCORING_PATHS = ('/api/query', '/api/search', '/api/text')
+
+class BoundedExecutor:
+    """
+    Thread pool that refuses work once max_pending requests are queued or running.
+    
+    Slots are counted on the event loop thread, so no lock is needed; a slot is
+    only released when its thread has actually finished, so requests that timed
+    out keep counting against the limit until their work is done.
+    """
+    
+    def __init__(self, workers: int = ASGI_THREADS, max_pending: int = ASGI_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asgi-scoring")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+    
+    def try_acquire(self) -> bool:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        self.pending += 1
+        return True
+    
+    def release(self, *_) -> None:
+        self.pending -= 1
+
+def _environ(scope, body: bytes):
+    """
+    Build a WSGI environ for an ASGI HTTP scope.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def _start_wsgi(wsgi_app, environ):
+    """
+    Call the WSGI app; returns (status, headers, body iterator). Runs on a worker thread.
+    """
+    response = {}
+    written = []
+    
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return written.append
+    
+    body = wsgi_app(environ, start_response)
+    return response['status'], response['headers'], written, body
+
+_DONE = object()
+
+def _next_chunk(iterator):
+    return next(iterator, _DONE)
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+async def _send_json(send, status: int, payload, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+class AsgiApp:
+    """
+    ASGI entry point serving the Flask app's routes.
+    
+    The event loop only accepts connections and moves bytes; every request runs
+    the shared Flask handlers (and so the same RAGEngine snapshot and query cache)
+    on a thread. Scoring routes go through a bounded executor with a per-request
+    timeout and are rejected with 429 when it is full; other routes use the
+    loop's default executor. Run with e.g. `uvicorn asgi:app --workers 2`.
+    """
+    
+    def __init__(self, wsgi_app, timeout: float = ASGI_REQUEST_TIMEOUT):
+        self.wsgi_app = wsgi_app
+        self.timeout = timeout
+        self.scoring = BoundedExecutor()
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'].startswith(SCORING_PATHS):
+                await self._scoring_request(scope, receive, send)
+            else:
+                await self._run(scope, receive, send, executor=None, deadline=None)
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.scoring.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def _scoring_request(self, scope, receive, send):
+        # Backpressure: refuse instead of queueing without bound
+        if not self.scoring.try_acquire():
+            await _send_json(send, 429, {
+                'success': False,
+                'error': 'Server is busy, please retry shortly'
+            }, headers=[(b'retry-after', b'1')])
+            return
+        
+        last = None
+        try:
+            deadline = asyncio.get_running_loop().time() + self.timeout
+            last = await self._run(scope, receive, send, executor=self.scoring.executor, deadline=deadline)
+        finally:
+            # Hold the slot until the worker thread is really done
+            if last is not None and not last.done():
+                last.add_done_callback(self.scoring.release)
+            else:
+                self.scoring.release()
+    
+    async def _run(self, scope, receive, send, executor, deadline):
+        """
+        Run the WSGI app for one request on executor and stream its response.
+        
+        Returns:
+            The last executor future, which may still be running after a timeout
+        """
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, await _read_body(receive))
+        
+        future = loop.run_in_executor(executor, _start_wsgi, self.wsgi_app, environ)
+        try:
+            status, headers, written, body = await self._wait(future, deadline)
+        except asyncio.TimeoutError:
+            self.scoring.timed_out += 1
+            logger.warning(f"Request to {scope['path']} timed out after {self.timeout}s")
+            await _send_json(send, 504, {'success': False, 'error': 'Request timed out'})
+            return future
+        
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        try:
+            for chunk in written:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            # Pull the body on the executor too; streaming handlers score lazily
+            iterator = iter(body)
+            while True:
+                future = loop.run_in_executor(executor, _next_chunk, iterator)
+                chunk = await self._wait(future, deadline)
+                if chunk is _DONE:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        except asyncio.TimeoutError:
+            # Headers are already sent; cut the stream short, but still end the response
+            self.scoring.timed_out += 1
+            logger.warning(f"Streaming response from {scope['path']} timed out after {self.timeout}s")
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return future
+        
+        if hasattr(body, 'close'):
+            future = loop.run_in_executor(executor, body.close)
+            await future
+        await send({'type': 'http.response.body', 'body': b''})
+        return future
+    
+    async def _wait(self, future, deadline):
+        if deadline is None:
+            return await future
+        # Shield so a timeout does not mark the future done while its thread still runs
+        remaining = max(deadline - asyncio.get_running_loop().time(), 0)
+        return await asyncio.wait_for(asyncio.shield(future), remaining)
+
+app = AsgiApp(flask_app)
+
+REGISTRY.counter("asgi_rejected_total", "Scoring requests rejected with 429").set_function(lambda: app.scoring.rejected)
+REGISTRY.counter("asgi_timeouts_total", "Scoring requests that hit the timeout").set_function(lambda: app.scoring.timed_out)
+REGISTRY.gauge("asgi_pending_requests", "Scoring requests running or queued").set_function(lambda: app.scoring.pending)
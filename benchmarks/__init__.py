@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the SHL recommendation engine.
+Run modules from the repository root, e.g. `python -m benchmarks.batch_queries`,
+or the whole suite with `python -m benchmarks` (JSON results for comparing commits).
+"""
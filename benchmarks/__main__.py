@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+from typing import Any, Dict, List
+import numpy as np
+from benchmarks import engine, http_load, startup
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Latency fields compared between runs; higher is worse for all of them
+COMPARED_FIELDS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def environment() -> Dict[str, Any]:
+    """
+    Where and on what the suite ran, so results from different commits can be matched up.
+    """
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def run_suite(sizes: List[int], n_queries: int, repeats: int, http_products: int, http_requests: int,
+              startup_products: int = 0) -> Dict[str, Any]:
+    results = {'environment': environment(), 'engine': {}, 'http': None, 'startup': None}
+    for size in sizes:
+        logger.warning(f"Benchmarking engine on {size} products")
+        results['engine'][str(size)] = engine.bench_catalog(size, n_queries, repeats)
+    if http_products:
+        logger.warning(f"Benchmarking HTTP routes on {http_products} products")
+        results['http'] = http_load.run_test_client(http_products, http_requests)
+    if startup_products:
+        logger.warning(f"Benchmarking startup on {startup_products} products")
+        results['startup'] = startup.run(startup_products, repeats)
+    return results
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """
+    Maps 'engine.1000.search.p50_ms'-style paths to the latency values they hold.
+    """
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, path + "."))
+        elif key in COMPARED_FIELDS:
+            values[path] = value
+    return values
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Latencies present in both runs, with the relative change and whether it exceeds threshold.
+    """
+    base_values = flatten({key: base[key] for key in ('engine', 'http', 'startup') if base.get(key)})
+    new_values = flatten({key: new[key] for key in ('engine', 'http', 'startup') if new.get(key)})
+    rows = []
+    for path in sorted(base_values.keys() & new_values.keys()):
+        before, after = base_values[path], new_values[path]
+        change = (after - before) / before if before else 0.0
+        rows.append({'metric': path, 'base': before, 'new': after, 'change': change, 'regression': change > threshold})
+    return rows
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the benchmark suite")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    run_parser = subparsers.add_parser("run", help="Run the suite and write a JSON results file (default)")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[6, 1000, 10000])
+    run_parser.add_argument("--queries", type=int, default=200)
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--http-products", type=int, default=1000, help="Catalog size for HTTP routes; 0 skips them")
+    run_parser.add_argument("--http-requests", type=int, default=1000)
+    run_parser.add_argument("--startup-products", type=int, default=1000,
+                            help="Catalog size for the cold-start benchmark; 0 skips it")
+    run_parser.add_argument("--quick", action="store_true", help="Small sizes and few repeats, for a smoke run")
+    run_parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Relative slowdown reported as a regression (default 0.2 = 20%%)")
+    
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ("run", "compare", "-h", "--help"):
+        argv.insert(0, "run")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    
+    if args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare(base, new, args.threshold)
+        print(f"{base['environment']['commit']} -> {new['environment']['commit']}")
+        for row in rows:
+            flag = "  REGRESSION" if row['regression'] else ""
+            print(f"{row['metric']:<48} {row['base']:>10} {row['new']:>10} {row['change']:>+8.1%}{flag}")
+        # Non-zero exit lets CI fail on a regression
+        return 1 if any(row['regression'] for row in rows) else 0
+    
+    if args.quick:
+        args.sizes, args.queries, args.repeats = [6, 1000], 50, 1
+        args.http_products, args.http_requests = min(args.http_products, 1000), 200
+    results = run_suite(args.sizes, args.queries, args.repeats, args.http_products, args.http_requests,
+                        args.startup_products)
+    
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['environment']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import time
+import random
+import logging
+import argparse
+from rag_engine import RAGEngine
+
+logger = logging.getLogger(__name__)
+
+def make_queries(engine: RAGEngine, n_queries: int, seed: int = 42):
+    """
+    Builds random multi-term queries from the engine vocabulary.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted(engine.scorer.vocabulary())
+    return [" ".join(rng.sample(vocabulary, rng.randint(2, 6))) for _ in range(n_queries)]
+
+def run(n_queries: int = 500, top_k: int = 4, repeats: int = 3):
+    """
+    Compares queries-per-second of looping get_recommendations against get_recommendations_batch.
+    """
+    engine = RAGEngine()
+    engine.load_data()
+    engine.load_or_build_index()
+    queries = make_queries(engine, n_queries)
+    
+    loop_times = []
+    batch_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for query in queries:
+            engine.get_recommendations(query, top_k=top_k)
+        loop_times.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        engine.get_recommendations_batch(queries, top_k=top_k)
+        batch_times.append(time.perf_counter() - start)
+    
+    loop_qps = n_queries / min(loop_times)
+    batch_qps = n_queries / min(batch_times)
+    return {
+        'queries': n_queries,
+        'top_k': top_k,
+        'loop_qps': round(loop_qps, 1),
+        'batch_qps': round(batch_qps, 1),
+        'speedup': round(batch_qps / loop_qps, 2)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch vs single-query recommendations")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.queries, args.top_k, args.repeats)
+    print(f"Single-query loop: {result['loop_qps']} queries/s")
+    print(f"Batch path:        {result['batch_qps']} queries/s")
+    print(f"Speedup:           {result['speedup']}x")
@@ -0,0 +1,113 @@
+import os
+import random
+import logging
+import argparse
+from typing import Any, Dict, Iterator, List
+from data_processor import iter_processed, write_jsonl
+
+logger = logging.getLogger(__name__)
+
+# Generated catalogs are cached here, keyed by size and seed
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Topic -> vocabulary that SHL-style product pages draw on
+TOPICS = {
+    'Leadership': "leadership executive strategic vision influence coaching succession team performance decision",
+    'Personality': "personality behaviour traits workplace style preferences motivation values culture fit",
+    'Cognitive Ability': "cognitive numerical verbal inductive deductive reasoning problem solving learning agility",
+    'Sales': "sales negotiation customer pipeline persuasion targets relationship account revenue resilience",
+    'Customer Service': "customer service empathy call centre communication complaints listening patience quality",
+    'Software Engineering': "coding java python javascript sql debugging algorithms software developer technical",
+    'Graduate': "graduate entry level potential early careers trainee internship campus learning development",
+    'Situational Judgement': "situational judgement scenarios workplace dilemmas responses realistic job preview",
+    'Administration': "administrative clerical data entry accuracy attention detail office typing scheduling",
+    'Safety': "safety dependability compliance risk rules hazard manufacturing operations reliability"
+}
+
+PRODUCT_TYPES = ["Assessment", "Test", "Questionnaire", "Simulation", "Solution", "Report"]
+LEVELS = ["Entry Level", "Graduate", "Professional", "Manager", "Executive"]
+GENERIC = ("the assessment measures candidate ability in a role and helps organizations make "
+           "better hiring and development decisions with reliable validated insights").split()
+SENTENCE_TEMPLATES = [
+    "The {title} measures {a}, {b} and {c} for {level} roles.",
+    "Candidates complete realistic tasks that reveal their {a} and {b}.",
+    "Results highlight strengths in {a} and development areas in {b}.",
+    "This {kind} is available in many languages and can be completed remotely in about {minutes} minutes.",
+    "Hiring managers use the report to compare {a} across {level} applicants.",
+    "It supports {a} programs by identifying {b} and {c} early."
+]
+
+def make_product(rng: random.Random, i: int) -> Dict[str, Any]:
+    """
+    One raw, scraper-shaped product with a topical title and a templated description.
+    """
+    topic = rng.choice(list(TOPICS))
+    words = TOPICS[topic].split()
+    kind = rng.choice(PRODUCT_TYPES)
+    level = rng.choice(LEVELS)
+    title = f"{topic} {kind} {i}" if rng.random() < 0.5 else f"{level} {topic} {kind} {i}"
+    
+    sentences = []
+    for _ in range(rng.randint(3, 24)):
+        template = rng.choice(SENTENCE_TEMPLATES)
+        sentence = template.format(
+            title=title, kind=kind.lower(), level=level.lower(), minutes=rng.choice([15, 20, 30, 45, 60]),
+            a=rng.choice(words), b=rng.choice(words), c=rng.choice(words + GENERIC)
+        )
+        sentences.append(sentence)
+    slug = title.lower().replace(' ', '-')
+    return {
+        'title': title,
+        'url': f"https://www.shl.com/solutions/products/assessments/{slug}/",
+        'description': " ".join(sentences),
+        'image_url': f"https://www.shl.com/wp-content/uploads/{slug}.jpg"
+    }
+
+def generate_products(n_products: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily generates n_products raw products; the same seed always gives the same catalog.
+    """
+    rng = random.Random(seed)
+    for i in range(n_products):
+        yield make_product(rng, i)
+
+def make_queries(n_queries: int, seed: int = 7) -> List[str]:
+    """
+    Short user-style queries drawn from the catalog vocabulary.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        topic = rng.choice(list(TOPICS))
+        words = rng.sample(TOPICS[topic].split(), rng.randint(1, 3))
+        if rng.random() < 0.3:
+            words.append(rng.choice(LEVELS).lower())
+        queries.append(" ".join(words))
+    return queries
+
+def write_catalog(n_products: int, seed: int = 42, data_dir: str = CATALOG_DIR, workers: int = 0) -> str:
+    """
+    Writes a processed JSON Lines catalog of n_products (reused if already generated).
+    
+    Returns:
+        Path of the catalog file
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"catalog-{n_products}-{seed}.jsonl")
+    if not os.path.exists(path):
+        tmp_file = f"{path}.tmp"
+        write_jsonl(iter_processed(generate_products(n_products, seed), workers=workers), tmp_file)
+        os.replace(tmp_file, path)
+        logger.info(f"Generated synthetic catalog with {n_products} products at {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SHL-style catalog")
+    parser.add_argument("products", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=CATALOG_DIR)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    print(write_catalog(args.products, args.seed, args.data_dir, args.workers))
@@ -0,0 +1,112 @@
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+from benchmarks.catalog import make_queries, write_catalog
+
+logger = logging.getLogger(__name__)
+
+def burst(client_factory, paths: List[str]) -> Dict[str, Any]:
+    """
+    Send every path at once, one thread each, released together by a barrier.
+    """
+    barrier = threading.Barrier(len(paths))
+    statuses = Counter()
+    retry_after = set()
+    lock = threading.Lock()
+    
+    def send(path):
+        client = client_factory()
+        barrier.wait()
+        response = client.get(path)
+        with lock:
+            statuses[response.status_code] += 1
+            if 'Retry-After' in response.headers:
+                retry_after.add(response.headers['Retry-After'])
+    
+    threads = [threading.Thread(target=send, args=(path,)) for path in paths]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'wall_ms': round((time.perf_counter() - start) * 1000, 1), 'statuses': dict(statuses),
+            'retry_after': sorted(retry_after)}
+
+def run(n_products: int = 30000, concurrency: int = 32, max_concurrent: int = 2, admission_timeout: float = 0.05):
+    """
+    Through the Flask app in-process: a burst of identical queries with and without
+    single-flight (counting how often the engine ranked), then a burst of distinct
+    queries against a small admission limit (counting shed requests).
+    """
+    import app as server
+    from admission import AdmissionLimiter
+    from rag_engine import RAGEngine
+    
+    engine = RAGEngine(data_path=write_catalog(n_products), index_dir=tempfile.mkdtemp(prefix="bench-index-"))
+    engine.load_data()
+    engine.build_index()
+    # Let the startup build of the real catalog finish so it cannot replace the synthetic snapshot
+    while server.index_manager.building:
+        time.sleep(0.1)
+    server.index_manager.swap(engine)
+    
+    rankings = Counter()
+    get_ranked = engine.get_ranked
+    
+    def counted(*args, **kwargs):
+        rankings['calls'] += 1
+        return get_ranked(*args, **kwargs)
+    engine.get_ranked = counted
+    
+    results = {'products': n_products, 'concurrency': concurrency}
+    # A long query touches many postings, so its ranking outlasts the thread start-up spread
+    query = " ".join(make_queries(8))
+    limiter = server.limiter
+    try:
+        for enabled in (False, True):
+            server.in_flight.enabled = enabled
+            server.query_cache.clear()
+            server.ranked_cache.clear()
+            rankings.clear()
+            result = burst(server.app.test_client, [f"/api/search?q={query}"] * concurrency)
+            result['rankings'] = rankings['calls']
+            results['single_flight' if enabled else 'independent'] = result
+        
+        # Distinct queries cannot coalesce; with few slots and a short wait most are shed
+        server.limiter = AdmissionLimiter(max_concurrent, admission_timeout)
+        server.query_cache.clear()
+        server.ranked_cache.clear()
+        rankings.clear()
+        result = burst(server.app.test_client, [f"/api/search?q={q}" for q in make_queries(concurrency)])
+        result['rankings'] = rankings['calls']
+        result['max_concurrent'] = max_concurrent
+        result['admission_timeout'] = admission_timeout
+        results['shedding'] = result
+    finally:
+        server.limiter = limiter
+        server.in_flight.enabled = True
+        shutil.rmtree(engine.index_dir, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark request coalescing and load shedding")
+    parser.add_argument("--products", type=int, default=30000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-concurrent", type=int, default=2)
+    parser.add_argument("--admission-timeout", type=float, default=0.05)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.products, args.concurrency, args.max_concurrent, args.admission_timeout)
+    print(f"{results['concurrency']} concurrent requests, {results['products']} products")
+    for mode in ('independent', 'single_flight'):
+        result = results[mode]
+        print(f"  identical, {mode:<14} {result['rankings']:>3} rankings   {result['wall_ms']:>8} ms   {result['statuses']}")
+    result = results['shedding']
+    print(f"  distinct, {result['max_concurrent']} slots      {result['rankings']:>3} rankings   {result['wall_ms']:>8} ms   "
+          f"{result['statuses']} (Retry-After {', '.join(result['retry_after']) or '-'})")
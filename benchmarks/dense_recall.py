@@ -0,0 +1,96 @@
+import time
+import random
+import logging
+import argparse
+import numpy as np
+from rag_engine import RAGEngine
+from dense_index import DenseRetriever
+
+logger = logging.getLogger(__name__)
+
+def make_chunks(seed_chunks, n_chunks: int, seed: int = 42):
+    """
+    Synthetically scales the catalog: each chunk is a real chunk with about a
+    third of its words swapped for words from other chunks, so the corpus keeps
+    the topical structure an IVF index relies on.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({word for chunk in seed_chunks for word in chunk.split()})
+    chunks = []
+    for _ in range(n_chunks):
+        words = rng.choice(seed_chunks).split()
+        for i in rng.sample(range(len(words)), len(words) // 3):
+            words[i] = rng.choice(vocabulary)
+        chunks.append(" ".join(words))
+    return chunks
+
+def make_queries(chunks, n_queries: int, seed: int = 7):
+    """
+    Short queries cut from random chunks.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(chunks, n_queries):
+        words = chunk.split()
+        start = rng.randrange(max(len(words) - 4, 1))
+        queries.append(" ".join(words[start:start + rng.randint(2, 5)]))
+    return queries
+
+def _timed_search(retriever: DenseRetriever, queries, k: int, exact: bool):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(retriever.search([query], k, exact=exact)[0][0])
+        latencies.append(time.perf_counter() - start)
+    return results, np.asarray(latencies) * 1000
+
+def run(sizes=(10000, 100000), n_queries: int = 200, k: int = 10, probes=(1, 2, 4, 8, 16, 32)):
+    """
+    Reports recall@k and per-query latency of IVF search against exact search.
+    """
+    engine = RAGEngine()
+    engine.load_data()
+    
+    rows = []
+    for size in sizes:
+        chunks = make_chunks(engine.chunks, size)
+        queries = make_queries(chunks, n_queries)
+        retriever = DenseRetriever(index_type='ivf')
+        start = time.perf_counter()
+        retriever.build(chunks)
+        build_seconds = time.perf_counter() - start
+        
+        exact, latencies = _timed_search(retriever, queries, k, exact=True)
+        rows.append({'chunks': size, 'mode': 'exact', 'n_probe': None, 'recall': 1.0,
+                     'mean_ms': round(float(latencies.mean()), 3),
+                     'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+                     'build_s': round(build_seconds, 1)})
+        
+        for n_probe in probes:
+            retriever.n_probe = n_probe
+            approximate, latencies = _timed_search(retriever, queries, k, exact=False)
+            recall = np.mean([
+                len(set(found.tolist()) & set(truth.tolist())) / max(len(truth), 1)
+                for found, truth in zip(approximate, exact)
+            ])
+            rows.append({'chunks': size, 'mode': 'ivf', 'n_probe': n_probe, 'recall': round(float(recall), 3),
+                         'mean_ms': round(float(latencies.mean()), 3),
+                         'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+                         'build_s': round(build_seconds, 1)})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dense IVF recall@k against exact search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{'chunks':>8} {'mode':>6} {'n_probe':>8} {'recall@' + str(args.k):>10} {'mean ms':>9} {'p95 ms':>8}")
+    for row in run(args.sizes, args.queries, args.k, args.probes):
+        n_probe = row['n_probe'] if row['n_probe'] is not None else '-'
+        print(f"{row['chunks']:>8} {row['mode']:>6} {n_probe:>8} {row['recall']:>10} "
+              f"{row['mean_ms']:>9} {row['p95_ms']:>8}")
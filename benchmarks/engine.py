@@ -0,0 +1,120 @@
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, List
+import numpy as np
+from rag_engine import RAGEngine
+from benchmarks.catalog import make_queries, write_catalog
+
+logger = logging.getLogger(__name__)
+
+# Selective structured filters timed against the unfiltered get_recommendations
+FILTERS = {'test_type': ['P'], 'max_duration': 30}
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """
+    Latency summary in milliseconds.
+    """
+    samples = np.asarray(seconds) * 1000
+    return {
+        'n': len(samples),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'min_ms': round(float(samples.min()), 4)
+    }
+
+def time_calls(fn: Callable[[], Any], repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def time_each(fn: Callable[[str], Any], queries: List[str]) -> List[float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_catalog(n_products: int, n_queries: int = 200, repeats: int = 3, top_k: int = 4,
+                  scorer: str = None, retrieval: str = None) -> Dict[str, Any]:
+    """
+    Micro-benchmarks load_data, build_index, index save/load, search and get_recommendations
+    (with and without filters) on one catalog size.
+    """
+    data_path = write_catalog(n_products)
+    index_dir = tempfile.mkdtemp(prefix="bench-index-")
+    try:
+        def new_engine():
+            return RAGEngine(data_path=data_path, index_dir=index_dir, scorer=scorer, retrieval=retrieval)
+        
+        engine = new_engine()
+        load_data = time_calls(engine.load_data, repeats)
+        build_index = time_calls(engine.build_index, repeats)
+        save_index = time_calls(engine.save_index, repeats)
+        
+        def load_index():
+            loaded = new_engine()
+            loaded.load_data()
+            if not loaded.load_index():
+                raise RuntimeError("Saved index artifact did not load")
+        load_data_and_index = time_calls(load_index, repeats)
+        
+        queries = make_queries(n_queries)
+        # One untimed pass warms caches and lazily built structures
+        for query in queries[:10]:
+            engine.get_recommendations(query, top_k=top_k)
+        search = time_each(lambda query: engine.search(query, top_k=top_k), queries)
+        recommendations = time_each(lambda query: engine.get_recommendations(query, top_k=top_k), queries)
+        filtered = time_each(lambda query: engine.get_recommendations(query, top_k=top_k, filters=FILTERS), queries)
+        suggest = time_each(lambda query: engine.suggest(query[:3]), queries)
+        urls = [engine.products[i * len(engine.products) // n_queries]['url'] for i in range(n_queries)]
+        similar = time_each(lambda url: engine.get_similar(url), urls)
+        batch = time_calls(lambda: engine.get_recommendations_batch(queries, top_k=top_k), repeats)
+        
+        return {
+            'products': n_products,
+            'chunks': len(engine.chunks),
+            'scorer': engine.scorer.name,
+            'retrieval': engine.retrieval,
+            'load_data': summarize(load_data),
+            'build_index': summarize(build_index),
+            'save_index': summarize(save_index),
+            'load_data_and_index': summarize(load_data_and_index),
+            'search': summarize(search),
+            'get_recommendations': summarize(recommendations),
+            'get_recommendations_filtered': summarize(filtered),
+            'suggest': summarize(suggest),
+            'get_similar': summarize(similar),
+            'batch_qps': round(n_queries / min(batch), 1)
+        }
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+def run(sizes=(6, 1000, 10000), n_queries: int = 200, repeats: int = 3, scorer: str = None, retrieval: str = None):
+    return [bench_catalog(size, n_queries, repeats, scorer=scorer, retrieval=retrieval) for size in sizes]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark RAGEngine on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scorer")
+    parser.add_argument("--retrieval")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    operations = ('load_data', 'build_index', 'save_index', 'load_data_and_index', 'search', 'get_recommendations',
+                  'get_recommendations_filtered', 'suggest', 'get_similar')
+    for result in run(args.sizes, args.queries, args.repeats, args.scorer, args.retrieval):
+        print(f"{result['products']} products, {result['chunks']} chunks ({result['scorer']}, {result['retrieval']})")
+        for operation in operations:
+            stats = result[operation]
+            print(f"  {operation:<30} p50 {stats['p50_ms']:>10} ms   p95 {stats['p95_ms']:>10} ms")
+        print(f"  {'batch':<30} {result['batch_qps']} queries/s")
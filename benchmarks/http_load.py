@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import signal
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "leadership personality numerical verbal reasoning sales graduate manager customer service "
+    "situational judgement motivation cognitive ability coding java skills remote adaptive"
+).split()
+
+# Server commands compared on the same box; both run two worker processes
+SERVERS = {
+    'gunicorn-sync': ["gunicorn", "--bind", "127.0.0.1:{port}", "--workers", "2", "--timeout", "120",
+                      "--keep-alive", "5", "--log-level", "warning", "main:app"],
+    'asgi': ["uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", "{port}", "--workers", "2",
+             "--log-level", "warning"]
+}
+
+def make_request(rng: random.Random):
+    """
+    A random request against one of the scoring routes.
+    """
+    query = " ".join(rng.sample(WORDS, rng.randint(1, 4)))
+    route = rng.choice(('search', 'query', 'text'))
+    if route == 'search':
+        return 'GET', '/api/search', {'params': {'q': query, 'limit': 4}}
+    if route == 'query':
+        return 'POST', '/api/query', {'json': {'query': query, 'top_k': 4}}
+    return 'GET', '/api/text', {'params': {'query': query}}
+
+def run_load(base_url: str, n_requests: int = 2000, concurrency: int = 32, seed: int = 42):
+    """
+    Sends n_requests from concurrency client threads and reports latency percentiles and throughput.
+    """
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+    
+    def client(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            method, path, kwargs = make_request(rng)
+            start = time.perf_counter()
+            try:
+                status = session.request(method, base_url + path, timeout=30, **kwargs).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'statuses': dict(statuses)
+    }
+
+def run_test_client(n_products: int = 1000, n_requests: int = 2000, seed: int = 42):
+    """
+    Drives the Flask app in-process through its test client, serving a synthetic catalog.
+    Measures routing, caching and serialization without sockets or server processes.
+    """
+    from app import app, index_manager
+    from rag_engine import RAGEngine
+    from benchmarks.catalog import write_catalog
+    
+    engine = RAGEngine(data_path=write_catalog(n_products), index_dir=tempfile.mkdtemp(prefix="bench-index-"))
+    engine.load_data()
+    engine.build_index()
+    # Let the startup build of the real catalog finish so it cannot replace the synthetic snapshot
+    while index_manager.building:
+        time.sleep(0.1)
+    index_manager.swap(engine)
+    
+    client = app.test_client()
+    rng = random.Random(seed)
+    latencies = defaultdict(list)
+    statuses = Counter()
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        method, path, kwargs = make_request(rng)
+        if 'params' in kwargs:
+            kwargs = {'query_string': kwargs['params']}
+        request_start = time.perf_counter()
+        status = client.open(path, method=method, **kwargs).status_code
+        latencies[path].append(time.perf_counter() - request_start)
+        statuses[status] += 1
+    wall = time.perf_counter() - start
+    shutil.rmtree(engine.index_dir, ignore_errors=True)
+    
+    routes = {}
+    for path, samples in sorted(latencies.items()):
+        samples_ms = np.asarray(samples) * 1000
+        routes[path] = {
+            'requests': len(samples),
+            'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+            'p99_ms': round(float(np.percentile(samples_ms, 99)), 3)
+        }
+    return {
+        'products': n_products,
+        'requests': n_requests,
+        'rps': round(n_requests / wall, 1),
+        'routes': routes,
+        'statuses': dict(statuses)
+    }
+
+def wait_ready(base_url: str, timeout: float = 120.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+def compare(n_requests: int, concurrency: int, port: int = 8790):
+    """
+    Starts each server in turn on the same port and runs the same load against it.
+    """
+    results = {}
+    for name, command in SERVERS.items():
+        command = [part.format(port=port) for part in command]
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url)
+            run_load(base_url, n_requests=min(n_requests, 200), concurrency=concurrency)  # Warm up
+            results[name] = run_load(base_url, n_requests, concurrency)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test of the scoring routes")
+    parser.add_argument("--url", help="Load an already running server instead of comparing both modes")
+    parser.add_argument("--test-client", type=int, metavar="PRODUCTS",
+                        help="Run in-process through the Flask test client on a synthetic catalog of this size")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    if args.test_client:
+        result = run_test_client(args.test_client, args.requests)
+        print(f"{result['products']} products: {result['rps']} requests/s, statuses {result['statuses']}")
+        for path, route in result['routes'].items():
+            print(f"  {path:<14} p50 {route['p50_ms']:>8} ms   p99 {route['p99_ms']:>8} ms")
+    else:
+        if args.url:
+            results = {args.url: run_load(args.url.rstrip('/'), args.requests, args.concurrency)}
+        else:
+            results = compare(args.requests, args.concurrency)
+        
+        print(f"{'server':<16} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+        for name, result in results.items():
+            print(f"{name:<16} {result['rps']:>8} {result['p50_ms']:>9} {result['p99_ms']:>9}  {result['statuses']}")
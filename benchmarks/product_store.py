@@ -0,0 +1,88 @@
+import os
+import gc
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from data_processor import iter_jsonl, process_product, write_jsonl
+from rag_engine import RAGEngine
+from benchmarks.text_processing import make_description
+
+logger = logging.getLogger(__name__)
+
+def make_products(n_products: int, n_sentences: int = 40, seed: int = 7):
+    """
+    Synthetic processed products with realistic description lengths.
+    """
+    rng = random.Random(seed)
+    return [
+        process_product({
+            'title': f"Assessment {i}",
+            'url': f"https://example.com/products/{i}",
+            'description': make_description(rng, n_sentences),
+            'image_url': f"https://example.com/images/{i}.png"
+        })
+        for i in range(n_products)
+    ]
+
+def legacy_load(path: str):
+    """
+    The previous RAGEngine.load_data layout: product dicts, a list of chunk strings and a list of ints.
+    """
+    products, chunks, product_indices = [], [], []
+    for i, product in enumerate(iter_jsonl(path)):
+        products.append(product)
+        for chunk in [f"Title: {product['title']}"] + [chunk for chunk in product.get('chunks', []) if chunk.strip()]:
+            chunks.append(chunk)
+            product_indices.append(i)
+    return products, chunks, product_indices
+
+def columnar_load(path: str):
+    engine = RAGEngine(data_path=path)
+    engine.load_data()
+    return engine.products, engine.chunks, engine.snippets, engine.product_indices
+
+def _retained(load, path: str) -> int:
+    """
+    Bytes still allocated after load returns, i.e. what a worker keeps holding.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = load(path)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def run(n_products: int = 5000, n_sentences: int = 40):
+    """
+    Compares the memory a worker holds after loading the catalog with per-product
+    dicts and chunk string lists against the columnar store.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "products.jsonl")
+        write_jsonl(make_products(n_products, n_sentences), path)
+        legacy_bytes = _retained(legacy_load, path)
+        columnar_bytes = _retained(columnar_load, path)
+    
+    return {
+        'products': n_products,
+        'legacy_mb': round(legacy_bytes / 1e6, 2),
+        'columnar_mb': round(columnar_bytes / 1e6, 2),
+        'reduction': round(legacy_bytes / max(columnar_bytes, 1), 2)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory of the columnar product store")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--sentences", type=int, default=40)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.products, args.sentences)
+    print(f"Products:            {result['products']}")
+    print(f"Dicts + str lists:   {result['legacy_mb']} MB")
+    print(f"Columnar store:      {result['columnar_mb']} MB")
+    print(f"Reduction:           {result['reduction']}x")
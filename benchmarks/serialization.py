@@ -0,0 +1,85 @@
+import gzip
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from rag_engine import RAGEngine
+from response_encoding import GZIP_LEVEL, dumps, json_array, orjson, splice
+from benchmarks.catalog import make_queries, write_catalog
+
+logger = logging.getLogger(__name__)
+
+def run(n_products: int = 10000, n_queries: int = 500, top_k: int = 10, repeats: int = 3):
+    """
+    Compares building and encoding response bodies from dicts (as jsonify does) against
+    splicing the precomputed product fragments, on already-ranked results.
+    """
+    index_dir = tempfile.mkdtemp(prefix="bench-index-")
+    try:
+        engine = RAGEngine(data_path=write_catalog(n_products), index_dir=index_dir)
+        engine.load_data()
+        engine.build_index()
+        queries = make_queries(n_queries)
+        ranked = [engine._ranked(query, top_k, 0.0) for query in queries]
+        
+        def dict_bodies():
+            return [
+                json.dumps({'success': True, 'query': query, 'count': len(ranking[0]),
+                            'recommendations': engine._recommendations(*ranking)}, sort_keys=True).encode('utf-8')
+                for query, ranking in zip(queries, ranked)
+            ]
+        
+        def spliced_bodies():
+            return [
+                splice({'success': True, 'query': query, 'count': len(ranking[0])},
+                       'recommendations', json_array(engine._recommendations_json(*ranking)))
+                for query, ranking in zip(queries, ranked)
+            ]
+        
+        dict_times, spliced_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            dict_bodies()
+            dict_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            bodies = spliced_bodies()
+            spliced_times.append(time.perf_counter() - start)
+        
+        # One batch response over all queries, as /api/query/batch would send it
+        batch = dumps([json.loads(body) for body in bodies])
+        start = time.perf_counter()
+        compressed = gzip.compress(batch, compresslevel=GZIP_LEVEL, mtime=0)
+        gzip_ms = (time.perf_counter() - start) * 1000
+        
+        return {
+            'products': n_products,
+            'queries': n_queries,
+            'top_k': top_k,
+            'encoder': 'orjson' if orjson is not None else 'json',
+            'dict_us_per_response': round(min(dict_times) / n_queries * 1e6, 1),
+            'spliced_us_per_response': round(min(spliced_times) / n_queries * 1e6, 1),
+            'speedup': round(min(dict_times) / min(spliced_times), 2),
+            'batch_bytes': len(batch),
+            'batch_gzip_bytes': len(compressed),
+            'batch_gzip_ms': round(gzip_ms, 2)
+        }
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response serialization paths")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.products, args.queries, args.top_k, args.repeats)
+    print(f"Dicts + json.dumps:   {result['dict_us_per_response']} us/response")
+    print(f"Spliced ({result['encoder']}):    {result['spliced_us_per_response']} us/response")
+    print(f"Speedup:              {result['speedup']}x")
+    print(f"Batch of {result['queries']}: {result['batch_bytes']} bytes, "
+          f"{result['batch_gzip_bytes']} gzipped in {result['batch_gzip_ms']} ms")
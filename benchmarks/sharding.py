@@ -0,0 +1,68 @@
+import os
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List
+import numpy as np
+from rag_engine import RAGEngine
+from sharded_index import ShardedPostings
+from benchmarks.catalog import make_queries, write_catalog
+from benchmarks.engine import summarize, time_each
+
+logger = logging.getLogger(__name__)
+
+def run(n_products: int = 100000, shard_counts=(1, 2, 4, 8), n_queries: int = 300, top_k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Single-query latency against the number of index shards on one catalog, checking
+    that every sharded ranking is identical to the unsharded one.
+    """
+    index_dir = tempfile.mkdtemp(prefix="bench-index-")
+    try:
+        engine = RAGEngine(data_path=write_catalog(n_products), index_dir=index_dir, shards=1)
+        engine.load_data()
+        engine.build_index()
+        queries = make_queries(n_queries)
+        expected = [engine._ranked(query, top_k, 0.0) for query in queries]
+
+        results = []
+        for n_shards in shard_counts:
+            engine.shards = None
+            if n_shards > 1:
+                engine.shards = ShardedPostings(engine.embeddings, engine.product_indices, n_shards)
+                engine.shards.warm()
+            for query in queries[:10]:
+                engine._ranked(query, top_k, 0.0)
+            latencies = time_each(lambda query: engine._ranked(query, top_k, 0.0), queries)
+            identical = sum(
+                all(np.array_equal(a, b) for a, b in zip(engine._ranked(query, top_k, 0.0), reference))
+                for query, reference in zip(queries, expected)
+            )
+            results.append({
+                'products': n_products,
+                'chunks': len(engine.chunks),
+                'shards': len(engine.shards) if engine.shards is not None else 1,
+                'cpus': os.cpu_count(),
+                'latency': summarize(latencies),
+                'identical': identical,
+                'queries': n_queries
+            })
+        return results
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-query latency against the number of index shards")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.products, args.shards, args.queries, args.top_k)
+    print(f"{results[0]['products']} products, {results[0]['chunks']} chunks, {results[0]['cpus']} CPUs")
+    for result in results:
+        latency = result['latency']
+        print(f"  {result['shards']:>2} shards   p50 {latency['p50_ms']:>8} ms   p95 {latency['p95_ms']:>8} ms   "
+              f"identical {result['identical']}/{result['queries']}")
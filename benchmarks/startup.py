@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import logging
+import argparse
+import subprocess
+import urllib.request
+from typing import Any, Dict, List
+from benchmarks.engine import summarize
+from benchmarks.worker_memory import REPO_DIR, free_port, prepare_workdir
+
+logger = logging.getLogger(__name__)
+
+# Modules a query-serving process must not import; they belong to the ingestion path
+# (scraper, catalog refresh) or are only needed to fit or weigh chunks (scikit-learn)
+INGESTION_MODULES = ('scraper', 'catalog_refresh', 'requests', 'bs4', 'trafilatura', 'sklearn')
+
+# Default budget for time to the first successful query (interpreter start included)
+STARTUP_BUDGET_MS = 1500
+
+def _env() -> Dict[str, str]:
+    return dict(os.environ, LOG_LEVEL="WARNING", PRELOAD_INDEX="false", PYTHONPATH=REPO_DIR)
+
+def import_breakdown(workdir: str, top_n: int = 12) -> Dict[str, Any]:
+    """
+    `python -X importtime -c "import app"`, parsed into the slowest modules by cumulative
+    time and the ingestion-path modules that were imported.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=workdir, env=_env(),
+                               capture_output=True, text=True, check=True)
+    modules = {}
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1000
+    slowest = sorted(modules.items(), key=lambda item: -item[1])[:top_n]
+    return {
+        'import_app_ms': round(modules.get('app', 0.0), 1),
+        'modules': len(modules),
+        'slowest_ms': {name: round(ms, 1) for name, ms in slowest},
+        'ingestion_modules': [name for name in INGESTION_MODULES if name in modules]
+    }
+
+def time_import(workdir: str) -> float:
+    """
+    Seconds for a fresh interpreter to start and import app.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=workdir, env=_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def first_results(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status == 200 and json.loads(response.read())['count'] > 0
+    except (OSError, ValueError, KeyError):
+        return False
+
+def time_first_query(workdir: str, query: str = "java developer", timeout: float = 120) -> float:
+    """
+    Seconds from spawning a one-worker gunicorn to the first /api/search answered with results.
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/search?q={urllib.request.quote(query)}"
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--config", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+        "--chdir", workdir, "--bind", f"127.0.0.1:{port}",
+        "--workers", "1", "--log-level", "warning"
+    ]
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not first_results(url):
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("No successful query in time")
+            time.sleep(0.01)
+        return time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def run(n_products: int = 1000, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Import-time breakdown, cold `import app` and time to the first successful query on a
+    catalog whose index artifact is already built, as after the deploy build step.
+    """
+    workdir = prepare_workdir(n_products)
+    try:
+        breakdown = import_breakdown(workdir)
+        imports: List[float] = [time_import(workdir) for _ in range(repeats)]
+        first_query: List[float] = [time_first_query(workdir) for _ in range(repeats)]
+        return {
+            'products': n_products,
+            'import_app': summarize(imports),
+            'first_query': summarize(first_query),
+            'importtime': breakdown
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure web process startup: imports and time to first query")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Fail when the median time to first query exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.products, args.repeats)
+    breakdown = result['importtime']
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import app (-X importtime): {breakdown['import_app_ms']} ms over {breakdown['modules']} modules")
+        for name, ms in breakdown['slowest_ms'].items():
+            print(f"  {name:<40} {ms:>10} ms")
+        print(f"Cold import app:    p50 {result['import_app']['p50_ms']:.0f} ms   p95 {result['import_app']['p95_ms']:.0f} ms")
+        print(f"First query:        p50 {result['first_query']['p50_ms']:.0f} ms   p95 {result['first_query']['p95_ms']:.0f} ms "
+              f"(budget {args.budget_ms:.0f} ms)")
+    
+    failures = []
+    if breakdown['ingestion_modules']:
+        failures.append(f"serving path imports {', '.join(breakdown['ingestion_modules'])}")
+    if result['first_query']['p50_ms'] > args.budget_ms:
+        failures.append(f"first query after {result['first_query']['p50_ms']:.0f} ms exceeds {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    # Non-zero exit lets CI fail on a regression
+    sys.exit(1 if failures else 0)
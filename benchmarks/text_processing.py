@@ -0,0 +1,106 @@
+import re
+import time
+import random
+import logging
+import argparse
+from typing import List
+from data_processor import clean_text, chunk_text, iter_processed
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "assessment candidate leadership personality cognitive ability numerical verbal reasoning "
+    "skills behaviour workplace performance potential manager graduate sales customer service "
+    "situational judgement motivation questionnaire remote adaptive minutes report development"
+).split()
+
+def legacy_clean_text(text: str) -> str:
+    """
+    The original clean_text, which compiles its patterns on every call.
+    """
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,?!-]', '', text)
+    return text.strip()
+
+def legacy_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    The original character-window chunker.
+    """
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end >= len(text):
+            chunk = text[start:]
+        else:
+            natural_break = text.rfind('.', start + chunk_size - 200, end)
+            if natural_break != -1:
+                end = natural_break + 1
+            chunk = text[start:end]
+        chunks.append(chunk)
+        start = max(0, end - overlap)
+    return chunks
+
+def make_description(rng: random.Random, n_sentences: int) -> str:
+    """
+    Builds a synthetic product description with messy whitespace and symbols.
+    """
+    sentences = []
+    for _ in range(n_sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 35))]
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", "!", "?"]))
+    return "  \n".join(sentences).replace(" skills", " skills (TM)")
+
+def time_it(fn, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(n_products: int = 2000, n_sentences: int = 80, workers: int = 4, repeats: int = 3, seed: int = 7):
+    """
+    Compares the legacy and current text-processing functions on synthetic long descriptions.
+    """
+    rng = random.Random(seed)
+    descriptions = [make_description(rng, n_sentences) for _ in range(n_products)]
+    cleaned = [clean_text(text) for text in descriptions]
+    products = [
+        {'title': f"Product {i}", 'url': f"https://example.com/{i}", 'description': text, 'image_url': ''}
+        for i, text in enumerate(descriptions)
+    ]
+    
+    legacy_chunks = sum(len(legacy_chunk_text(text)) for text in cleaned)
+    current_chunks = sum(len(chunk_text(text)) for text in cleaned)
+    
+    return {
+        'products': n_products,
+        'sentences_per_product': n_sentences,
+        'clean_text_legacy_s': time_it(lambda: [legacy_clean_text(t) for t in descriptions], repeats),
+        'clean_text_s': time_it(lambda: [clean_text(t) for t in descriptions], repeats),
+        'chunk_text_legacy_s': time_it(lambda: [legacy_chunk_text(t) for t in cleaned], repeats),
+        'chunk_text_s': time_it(lambda: [chunk_text(t) for t in cleaned], repeats),
+        'chunks_legacy': legacy_chunks,
+        'chunks': current_chunks,
+        'process_serial_s': time_it(lambda: list(iter_processed(products, workers=1)), repeats),
+        'process_parallel_s': time_it(lambda: list(iter_processed(products, workers=workers)), repeats),
+        'workers': workers
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_text / chunk_text")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--sentences", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.products, args.sentences, args.workers, args.repeats)
+    for key, value in result.items():
+        print(f"{key:24s} {value:.4f}" if isinstance(value, float) else f"{key:24s} {value}")
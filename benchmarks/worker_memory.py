@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List
+from rag_engine import RAGEngine
+from data_processor import write_csv
+from benchmarks.catalog import make_queries, write_catalog
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def prepare_workdir(n_products: int) -> str:
+    """
+    A working directory laid out like the app expects (data/ with products, CSV and a built
+    index artifact), so workers start from the same state as after the deploy build step.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-workers-")
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir)
+    jsonl_file = os.path.join(data_dir, "shl_products.jsonl")
+    shutil.copyfile(write_catalog(n_products), jsonl_file)
+    write_csv(jsonl_file, os.path.join(data_dir, "shl_products.csv"))
+    
+    engine = RAGEngine(data_path=jsonl_file, index_dir=os.path.join(data_dir, "index"))
+    engine.load_data()
+    engine.load_or_build_index()
+    return workdir
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def get(url: str, timeout: float = 10) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+def memory(pid: int) -> Dict[str, int]:
+    """
+    Resident, proportional (shared pages split between their users) and private set size in bytes.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+def children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def measure_mode(workdir: str, n_workers: int, preload: bool, n_requests: int, timeout: float = 600) -> Dict[str, Any]:
+    """
+    Start gunicorn with n_workers, wait until every worker serves, send queries, and sum memory.
+    """
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PRELOAD_INDEX="true" if preload else "false", LOG_LEVEL="WARNING",
+               PYTHONPATH=REPO_DIR)
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--config", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+        "--chdir", workdir, "--bind", f"127.0.0.1:{port}",
+        "--workers", str(n_workers), "--log-level", "warning"
+    ]
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Connections are spread over workers, so a run of ready answers means all of them are up
+        ready_streak = 0
+        while ready_streak < 4 * n_workers:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("Workers did not become ready in time")
+            if get(f"{base}/ready") == 200:
+                ready_streak += 1
+            else:
+                ready_streak = 0
+                time.sleep(0.2)
+        ready_seconds = time.perf_counter() - started
+        
+        # Serve traffic so every worker touches the index as it would in production
+        queries = make_queries(n_requests)
+        for query in queries:
+            get(f"{base}/api/search?q={urllib.request.quote(query)}&limit=5")
+        
+        workers = children(server.pid)
+        per_process = [memory(pid) for pid in [server.pid] + workers]
+        totals = {field: sum(process[field] for process in per_process) for field in ('rss', 'pss', 'private')}
+        return {
+            'preload': preload,
+            'workers': len(workers),
+            'ready_seconds': round(ready_seconds, 2),
+            'total_rss_mb': round(totals['rss'] / 2 ** 20, 1),
+            'total_pss_mb': round(totals['pss'] / 2 ** 20, 1),
+            'total_private_mb': round(totals['private'] / 2 ** 20, 1),
+            'worker_private_mb': [round(process['private'] / 2 ** 20, 1) for process in per_process[1:]]
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def run(n_products: int = 10000, n_workers: int = 8, n_requests: int = 400) -> List[Dict[str, Any]]:
+    workdir = prepare_workdir(n_products)
+    try:
+        results = []
+        for preload in (False, True):
+            result = measure_mode(workdir, n_workers, preload, n_requests)
+            result['products'] = n_products
+            results.append(result)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gunicorn memory with and without a preloaded, shared index")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("Memory accounting needs Linux /proc/<pid>/smaps_rollup")
+    results = run(args.products, args.workers, args.requests)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            mode = "preload" if result['preload'] else "private"
+            print(f"{mode:<8} {result['workers']} workers, {result['products']} products: "
+                  f"RSS {result['total_rss_mb']} MB, PSS {result['total_pss_mb']} MB, "
+                  f"private {result['total_private_mb']} MB (ready after {result['ready_seconds']} s)")
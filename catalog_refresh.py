@@ -0,0 +1,69 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from rag_engine import RAGEngine
+from scraper import scrape_shl_catalog
+from data_processor import diff_products, iter_products, process_product, save_processed_data, updated_catalog
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+def refresh_catalog(engine: RAGEngine, scraped: Optional[List[Dict[str, Any]]] = None,
+                    listed: Optional[List[str]] = None) -> Tuple[RAGEngine, Dict[str, int]]:
+    """
+    Incrementally refreshes the catalog and index from a new scrape.
+    
+    Products are diffed by URL and content hash; only new or changed products are
+    cleaned, chunked and vectorized. Products no longer on the catalog listing are
+    tombstoned; listed products whose page failed to fetch are kept as they are. The
+    given engine is not modified and can keep serving until the caller swaps in
+    the returned one.
+    
+    Args:
+        engine: Engine holding the currently indexed products
+        scraped: Raw products from a fresh scrape; scrapes the live catalog when omitted
+        listed: Product URLs on the catalog listing of that scrape; nothing is removed without it
+    
+    Returns:
+        Tuple of (updated engine, counts of added/changed/removed/unchanged products)
+    """
+    if scraped is None:
+        listed, scraped = scrape_shl_catalog()
+    
+    # An empty scrape is far more likely a crawl failure than an empty catalog
+    if not scraped and not listed:
+        logger.warning("Scrape returned no products; keeping the current catalog")
+        return engine, {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    
+    diff = diff_products(engine.products, scraped, listed)
+    stats = {
+        'added': len(diff['added']),
+        'changed': len(diff['changed']),
+        'removed': len(diff['removed']),
+        'unchanged': diff['unchanged']
+    }
+    logger.info(f"Catalog diff: {stats}")
+    
+    if not (diff['added'] or diff['changed'] or diff['removed']):
+        return engine, stats
+    
+    new_products = [process_product(product) for product in diff['added'] + diff['changed']]
+    updated = engine.apply_update(new_products, diff['removed'])
+    
+    # Persist the products first so the index fingerprint matches the data file; the
+    # engine only keeps query-time columns, so full records are streamed from the old file
+    catalog = updated_catalog(iter_products(engine.data_path), new_products, diff['removed'])
+    save_processed_data(catalog, data_dir=os.path.dirname(updated.data_path) or ".")
+    updated.index_version = updated._source_fingerprint()
+    updated.save_index()
+    
+    return updated, stats
+
+if __name__ == "__main__":
+    # Nightly refresh: update the stored catalog and index artifact in place
+    engine = RAGEngine()
+    engine.load_data()
+    engine.load_or_build_index()
+    _, stats = refresh_catalog(engine)
+    logger.info(f"Catalog refresh finished: {stats}")
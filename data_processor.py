@@ -3,12 +3,50 @@ import json
 import csv
 import logging
 import re
-from typing import List, Dict, Any
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
 logger = logging.getLogger(__name__)
 
+# Processed catalog: one JSON product per line, written incrementally
+PRODUCTS_FILE = "shl_products.jsonl"
+PRODUCTS_CSV = "shl_products.csv"
+CSV_FIELDS = ['title', 'url', 'description', 'image_url', 'test_types', 'duration_minutes', 'remote', 'adaptive']
+
+# SHL test type codes as shown on product pages, with the description keywords that imply them
+TEST_TYPES = {
+    'A': ('Ability & Aptitude', r'\b(?:abilit(?:y|ies)|aptitude|reasoning|numerical|verbal|cognitive|inductive|deductive)\b'),
+    'B': ('Biodata & Situational Judgement', r'\b(?:biodata|situational judge?ment|sjt)\b'),
+    'C': ('Competencies', r'\bcompetenc(?:y|ies)\b'),
+    'D': ('Development & 360', r'\b(?:360|development report|development planning)\b'),
+    'E': ('Assessment Exercises', r'\b(?:assessment cent(?:er|re)s?|in-tray|role-?play|group exercise)\b'),
+    'K': ('Knowledge & Skills', r'\b(?:knowledge|coding|programming|java|python|javascript|sql|technical skills?)\b'),
+    'P': ('Personality & Behaviour', r'\b(?:personality|behaviou?r(?:al)?|motivation|traits?)\b'),
+    'S': ('Simulations', r'\bsimulations?\b')
+}
+# Structured attributes kept per product; typed columns in the engine's product store
+ATTRIBUTE_FIELDS = ('test_types', 'duration_minutes', 'remote', 'adaptive')
+
+# Chunking limits, in whitespace-separated tokens
+CHUNK_MAX_TOKENS = 160
+CHUNK_OVERLAP_TOKENS = 30
+
+# Worker processes for cleaning and chunking; 0 or 1 processes in-line
+PROCESS_WORKERS = int(os.environ.get("PROCESS_WORKERS", 0))
+
+# Patterns compiled once at import instead of on every call
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s.,?!-]')
+_SENTENCE_END_RE = re.compile(r'[.!?] ')  # Sentence end in single-spaced text
+_TEST_TYPE_RES = {code: re.compile(pattern, re.IGNORECASE) for code, (_, pattern) in TEST_TYPES.items()}
+_DURATION_RE = re.compile(
+    r'(?:minutes\s*=\s*(\d{1,3}))|(?:\b(\d{1,3})\s*(?:-|to)?\s*(?:\d{1,3}\s*)?(?:minutes|mins?)\b)', re.IGNORECASE)
+_REMOTE_RE = re.compile(r'\b(?:remote(?:ly)?|online|unproctored|unsupervised)\b', re.IGNORECASE)
+_ADAPTIVE_RE = re.compile(r'\b(?:adaptive|irt|computer adaptive)\b', re.IGNORECASE)
+
 def clean_text(text: str) -> str:
     """
     Cleans text by removing extra whitespace, special characters, etc.
@@ -16,86 +54,390 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
+    # Remove extra whitespace (str.split is much cheaper than a regex here)
+    text = ' '.join(text.split())
     # Remove special characters
-    text = re.sub(r'[^\w\s.,?!-]', '', text)
+    text = _SPECIAL_CHARS_RE.sub('', text)
     return text.strip()
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+def _sentence_spans(text: str, max_tokens: int) -> List[tuple]:
+    """
+    Returns (start, end, tokens) spans for each sentence of single-spaced text,
+    splitting sentences longer than max_tokens on token boundaries.
+    """
+    spans = []
+    start = 0
+    # Each sentence ends after its punctuation mark; the next starts after the space
+    ends = [match.end() for match in _SENTENCE_END_RE.finditer(text)]
+    ends.append(len(text) + 1)
+    for next_start in ends:
+        end = next_start - 1
+        if end > start:
+            tokens = text.count(' ', start, end) + 1
+            if tokens <= max_tokens:
+                spans.append((start, end, tokens))
+            else:
+                # Rare: cut an over-long sentence every max_tokens tokens
+                piece_start = start
+                while tokens > max_tokens:
+                    cut = piece_start
+                    for _ in range(max_tokens):
+                        cut = text.index(' ', cut) + 1
+                    spans.append((piece_start, cut - 1, max_tokens))
+                    piece_start = cut
+                    tokens -= max_tokens
+                spans.append((piece_start, end, tokens))
+        start = next_start
+    return spans
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
     """
-    Splits long text into chunks with some overlap to maintain context.
+    Splits long text into sentence-aligned chunks of at most max_tokens tokens.
+    
+    Expects text normalized by clean_text (single spaces). Consecutive chunks
+    share whole trailing sentences totalling at most overlap_tokens, and every
+    chunk advances by at least one sentence, so no near-duplicate chunks are
+    produced. Chunks are slices of the input, built in a single pass.
     """
-    if len(text) <= chunk_size:
+    if text.count(' ') < max_tokens:
         return [text]
     
     chunks = []
-    start = 0
-    while start < len(text):
-        # Get chunk of text
-        end = start + chunk_size
-        if end >= len(text):
-            chunk = text[start:]
-        else:
-            # Try to find a natural break point (period, paragraph, etc.)
-            natural_break = text.rfind('.', start + chunk_size - 200, end)
-            if natural_break != -1:
-                end = natural_break + 1
-            chunk = text[start:end]
+    current = deque()  # Sentence spans in the chunk being built
+    current_tokens = 0
+    fresh = False  # Whether current holds a sentence not yet emitted
+    
+    for span in _sentence_spans(text, max_tokens):
+        tokens = span[2]
+        if current_tokens + tokens > max_tokens and fresh:
+            chunks.append(text[current[0][0]:current[-1][1]])
+            # Carry trailing sentences over as overlap
+            carried = deque()
+            carried_tokens = 0
+            while current and carried_tokens + current[-1][2] <= overlap_tokens:
+                sentence = current.pop()
+                carried.appendleft(sentence)
+                carried_tokens += sentence[2]
+            current, current_tokens, fresh = carried, carried_tokens, False
+        
+        # Drop overlap that would not leave room for the next sentence
+        while current and current_tokens + tokens > max_tokens:
+            current_tokens -= current.popleft()[2]
         
-        chunks.append(chunk)
-        # Next chunk starts with some overlap
-        start = max(0, end - overlap)
+        current.append(span)
+        current_tokens += tokens
+        fresh = True
+    
+    if fresh:
+        chunks.append(text[current[0][0]:current[-1][1]])
     
     return chunks
 
-def process_data(products: List[Dict[str, Any]]) -> None:
+def content_hash(product: Dict[str, Any]) -> str:
+    """
+    Hashes the scraped fields of a product so unchanged pages can be detected.
+    """
+    digest = hashlib.sha256()
+    for field in ('title', 'description', 'image_url'):
+        digest.update((product.get(field) or '').encode('utf-8'))
+        digest.update(b'\0')
+    # Attributes read from the page itself; ones derived from the description are covered above
+    for field in ATTRIBUTE_FIELDS:
+        if product.get(field) is not None:
+            digest.update(f"{field}={json.dumps(product[field])}".encode('utf-8'))
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+def extract_attributes(text: str) -> Dict[str, Any]:
+    """
+    Derives structured attributes from free product text.
+    
+    Returns:
+        Dict with 'test_types' (sorted SHL type codes), 'duration_minutes' (first
+        stated completion time, or None), and 'remote' and 'adaptive' flags
+    """
+    duration = _DURATION_RE.search(text)
+    return {
+        'test_types': [code for code, pattern in _TEST_TYPE_RES.items() if pattern.search(text)],
+        'duration_minutes': int(duration.group(1) or duration.group(2)) if duration else None,
+        'remote': bool(_REMOTE_RE.search(text)),
+        'adaptive': bool(_ADAPTIVE_RE.search(text))
+    }
+
+def product_attributes(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Structured attributes of a product: values scraped from its page win, the rest
+    are derived from its title and description.
+    """
+    attributes = extract_attributes(f"{product.get('title', '')}. {product.get('description', '')}")
+    for field in ATTRIBUTE_FIELDS:
+        if product.get(field) is not None:
+            attributes[field] = product[field]
+    return attributes
+
+def process_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cleans and chunks a single scraped product.
+    """
+    clean_product = {
+        'title': clean_text(product.get('title', '')),
+        'url': product.get('url', ''),
+        'description': clean_text(product.get('description', '')),
+        'image_url': product.get('image_url', ''),
+        'content_hash': content_hash(product)
+    }
+    clean_product.update(product_attributes(product))
+    
+    # Chunk long descriptions
+    clean_product['chunks'] = chunk_text(clean_product['description'])
+    
+    return clean_product
+
+def iter_processed(products: Iterable[Dict[str, Any]], skip_urls: Optional[Set[str]] = None,
+                   workers: int = PROCESS_WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily cleans and chunks products, skipping URLs that were already processed.
+    
+    Args:
+        products: Raw products, consumed lazily
+        skip_urls: URLs to leave out
+        workers: Process pool size; values above 1 process products in parallel,
+            keeping only a bounded window in flight and preserving input order
+    """
+    if skip_urls:
+        products = (product for product in products if product.get('url', '') not in skip_urls)
+    
+    if workers <= 1:
+        for product in products:
+            yield process_product(product)
+        return
+    
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for product in products:
+            pending.append(executor.submit(process_product, product))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams records from a JSON Lines file, one line at a time.
+    A truncated final line (e.g. from a crash mid-write) is skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                logger.warning(f"Skipping truncated record at end of {path}")
+                break
+            if line.strip():
+                yield json.loads(line)
+
+def iter_products(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams processed products from a JSON Lines catalog (or a legacy JSON array).
+    """
+    if path.endswith('.jsonl'):
+        return iter_jsonl(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return iter(json.load(f))
+
+def write_jsonl(records: Iterable[Dict[str, Any]], path: str, append: bool = False) -> int:
+    """
+    Streams records to a JSON Lines file, flushing each line so a crash loses at most one record.
+    
+    Returns:
+        Number of records written
+    """
+    count = 0
+    with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            count += 1
+    return count
+
+def _repair_jsonl(path: str) -> None:
+    """
+    Truncates a partially written final line so appends start on a clean line.
+    """
+    with open(path, 'rb+') as f:
+        data_end = f.seek(0, os.SEEK_END)
+        # Walk back to the last newline
+        position = data_end
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b'\n')
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != data_end:
+            logger.warning(f"Truncating partial record at end of {path}")
+            f.truncate(position)
+
+def write_csv(jsonl_path: str, csv_path: str) -> None:
+    """
+    Streams live products from a JSON Lines file into a CSV (main info only, not chunks).
+    """
+    tmp_file = f"{csv_path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for product in iter_jsonl(jsonl_path):
+            if product.get('removed'):
+                continue
+            row = {field: product.get(field, '') for field in CSV_FIELDS}
+            row['test_types'] = ' '.join(product.get('test_types') or [])
+            writer.writerow(row)
+    os.replace(tmp_file, csv_path)
+
+def partial_path(data_dir: str = "data") -> str:
+    """
+    Path of the in-progress ingestion file; it only becomes the catalog once complete.
+    """
+    return os.path.join(data_dir, f"{PRODUCTS_FILE}.partial")
+
+def completed_urls(data_dir: str = "data") -> Set[str]:
+    """
+    URLs already written by an interrupted ingestion run, so they need not be fetched again.
+    """
+    path = partial_path(data_dir)
+    if not os.path.exists(path):
+        return set()
+    return {record.get('url', '') for record in iter_jsonl(path)}
+
+def process_data(products: Iterable[Dict[str, Any]], data_dir: str = "data", workers: int = PROCESS_WORKERS) -> int:
     """
     Processes scraped SHL product data and stores it in structured formats.
+    
+    Products are consumed lazily and appended to a JSON Lines file one at a time,
+    so memory stays flat regardless of catalog size. If a previous run crashed,
+    its partial output is kept and already processed URLs are skipped. With
+    workers > 1, cleaning and chunking run in a process pool.
+    
+    Returns:
+        Number of products in the catalog
     """
-    logger.info(f"Processing {len(products)} SHL products...")
+    # Create data directory if it doesn't exist
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    
+    partial_file = partial_path(data_dir)
+    done = set()
+    if os.path.exists(partial_file):
+        _repair_jsonl(partial_file)
+        done = completed_urls(data_dir)
+        logger.info(f"Resuming ingestion after {len(done)} processed products")
     
+    written = write_jsonl(iter_processed(products, skip_urls=done, workers=workers), partial_file, append=True)
+    logger.info(f"Processed {written} SHL products")
+    
+    # Publish the completed catalog
+    jsonl_file = os.path.join(data_dir, PRODUCTS_FILE)
+    csv_file = os.path.join(data_dir, PRODUCTS_CSV)
+    os.replace(partial_file, jsonl_file)
+    write_csv(jsonl_file, csv_file)
+    
+    logger.info(f"Processed data saved to {jsonl_file} and {csv_file}")
+    return written + len(done)
+
+def save_processed_data(processed_products: Iterable[Dict[str, Any]], data_dir: str = "data") -> None:
+    """
+    Writes already processed products to JSON Lines (with chunks) and CSV (main info only).
+    Files are replaced atomically so readers never see a partial write.
+    """
     # Create data directory if it doesn't exist
-    data_dir = "data"
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
     
-    # Process each product
-    processed_products = []
-    for product in products:
-        # Clean the product data
-        clean_product = {
-            'title': clean_text(product.get('title', '')),
-            'url': product.get('url', ''),
-            'description': clean_text(product.get('description', '')),
-            'image_url': product.get('image_url', '')
-        }
-        
-        # Chunk long descriptions
-        if len(clean_product['description']) > 1000:
-            chunks = chunk_text(clean_product['description'])
-            clean_product['chunks'] = chunks
-        else:
-            clean_product['chunks'] = [clean_product['description']]
-        
-        processed_products.append(clean_product)
+    jsonl_file = os.path.join(data_dir, PRODUCTS_FILE)
+    tmp_file = f"{jsonl_file}.tmp"
+    write_jsonl(processed_products, tmp_file)
+    os.replace(tmp_file, jsonl_file)
     
-    # Save processed data as JSON
-    json_file = os.path.join(data_dir, "shl_products.json")
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(processed_products, f, ensure_ascii=False, indent=4)
+    csv_file = os.path.join(data_dir, PRODUCTS_CSV)
+    write_csv(jsonl_file, csv_file)
     
-    # Save processed data as CSV (main info only, not chunks)
-    csv_file = os.path.join(data_dir, "shl_products.csv")
-    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['title', 'url', 'description', 'image_url'])
-        writer.writeheader()
-        for product in processed_products:
-            # Create a copy without the chunks for CSV
-            csv_product = {k: v for k, v in product.items() if k != 'chunks'}
-            writer.writerow(csv_product)
+    logger.info(f"Processed data saved to {jsonl_file} and {csv_file}")
+
+def compact_catalog(path: str) -> int:
+    """
+    Rewrites a JSON Lines catalog without its tombstoned products.
+    Product positions shift, so the index has to be rebuilt from scratch afterwards.
+    
+    Returns:
+        Number of tombstoned products dropped
+    """
+    dropped = sum(1 for product in iter_jsonl(path) if product.get('removed'))
+    if not dropped:
+        return 0
     
-    logger.info(f"Processed data saved to {json_file} and {csv_file}")
+    # Per-process temp file: workers starting together may compact the same catalog
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    write_jsonl((product for product in iter_jsonl(path) if not product.get('removed')), tmp_file)
+    os.replace(tmp_file, path)
+    write_csv(path, os.path.join(os.path.dirname(path), PRODUCTS_CSV))
+    
+    logger.info(f"Dropped {dropped} tombstoned products from {path}")
+    return dropped
+
+def diff_products(stored: List[Dict[str, Any]], scraped: List[Dict[str, Any]],
+                  listed: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Compares a fresh scrape against stored products by URL and content hash.
+    
+    A stored product is removed only when the catalog listing no longer links to it.
+    Listed products missing from the scrape had a failed fetch and count as unchanged.
+    
+    Args:
+        stored: Processed products currently indexed (tombstoned entries are ignored)
+        scraped: Raw products from the latest scrape
+        listed: Product URLs on the catalog listing; without it nothing is removed,
+            since a missing product cannot be told apart from a failed fetch
+    
+    Returns:
+        Dict with 'added' and 'changed' raw products, 'removed' URLs and an 'unchanged' count
+    """
+    live = {product['url']: product for product in stored if not product.get('removed')}
+    scraped_urls = set()
+    added, changed = [], []
+    unchanged = 0
+    
+    for product in scraped:
+        url = product.get('url', '')
+        if url in scraped_urls:
+            continue
+        scraped_urls.add(url)
+        
+        current = live.get(url)
+        if current is None:
+            added.append(product)
+        elif current.get('content_hash') != content_hash(product):
+            changed.append(product)
+        else:
+            unchanged += 1
+    
+    listed = set(listed) if listed is not None else set(live)
+    removed = [url for url in live if url not in listed]
+    unchanged += sum(1 for url in live if url in listed and url not in scraped_urls)
+    return {'added': added, 'changed': changed, 'removed': removed, 'unchanged': unchanged}
+
+def updated_catalog(stored: Iterable[Dict[str, Any]], new_products: List[Dict[str, Any]],
+                    removed_urls: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Streams the stored catalog with replaced or removed products tombstoned, followed by the new products.
+    Yields products in the same order as RAGEngine.apply_update numbers them.
+    """
+    replaced = {product['url'] for product in new_products} | set(removed_urls)
+    for product in stored:
+        if not product.get('removed') and product.get('url') in replaced:
+            product = dict(product, removed=True)
+        yield product
+    yield from new_products
 
 if __name__ == "__main__":
     # Test with sample data
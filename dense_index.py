@@ -0,0 +1,271 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Retrieval backend: 'sparse' (inverted index) or 'dense' (embeddings + ANN)
+DEFAULT_RETRIEVAL = os.environ.get("RAG_RETRIEVAL", "sparse")
+
+# Dense index settings
+DENSE_DIM = int(os.environ.get("DENSE_DIM", 256))
+DENSE_INDEX = os.environ.get("DENSE_INDEX", "ivf")  # 'ivf' or 'exact'
+DENSE_NPROBE = int(os.environ.get("DENSE_NPROBE", 16))
+DENSE_DTYPE = os.environ.get("DENSE_DTYPE", "float32")  # 'float32' or 'float16'
+
+# Below this many chunks an IVF index costs more than it saves; search exactly
+MIN_IVF_CHUNKS = 2048
+
+class HashedNgramEmbedder:
+    """
+    Deterministic, model-free text embedder.
+    
+    Character n-grams are hashed straight into a small signed feature space,
+    which acts as a random projection of the n-gram counts, then L2-normalized.
+    It needs no downloads, runs on CPU and gives the same vectors on every machine.
+    """
+    
+    def __init__(self, dim: int = DENSE_DIM, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        # Imported here so sparse-only processes never load scikit-learn
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=self.ngram_range,
+            n_features=dim, alternate_sign=True, norm='l2', lowercase=True
+        )
+    
+    def params(self) -> Dict[str, Any]:
+        return {'embedder': 'hashed_char_ngrams', 'dim': self.dim, 'ngram_range': list(self.ngram_range)}
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts as a contiguous (n, dim) float32 array of unit vectors.
+        """
+        return np.ascontiguousarray(self.vectorizer.transform(texts).toarray(), dtype=np.float32)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+class DenseRetriever:
+    """
+    Dense chunk retrieval with exact (brute-force) or IVF approximate search.
+    
+    Vectors are stored as one contiguous float32/float16 array. The IVF index
+    clusters them with spherical k-means and stores each cluster's vectors
+    contiguously, so a query scans only the n_probe closest clusters.
+    """
+    
+    def __init__(self, dim: int = DENSE_DIM, index_type: str = DENSE_INDEX, n_lists: Optional[int] = None,
+                 n_probe: int = DENSE_NPROBE, dtype: str = DENSE_DTYPE, seed: int = 0):
+        """
+        Args:
+            dim: Embedding dimension
+            index_type: 'ivf' for approximate search, 'exact' for brute force
+            n_lists: Number of IVF clusters; defaults to about sqrt(n_chunks)
+            n_probe: Clusters scanned per query; higher means better recall and more latency
+            dtype: Storage dtype for vectors, 'float32' or 'float16'
+            seed: Seed for k-means initialization
+        """
+        self.embedder = HashedNgramEmbedder(dim)
+        self.index_type = index_type
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.dtype = np.dtype(dtype)
+        self.seed = seed
+        self.vectors = None  # (n_chunks, dim), rows in chunk order
+        self.centroids = None  # (n_lists, dim)
+        self.list_order = None  # Chunk rows grouped by cluster
+        self.list_offsets = None  # CSR-style offsets into list_order per cluster
+        self.list_vectors = None  # vectors[list_order], contiguous per cluster
+    
+    def params(self) -> Dict[str, Any]:
+        """
+        Settings that shape the stored index; n_probe is a query-time knob and excluded.
+        """
+        return {**self.embedder.params(), 'index_type': self.index_type,
+                'n_lists': self.n_lists, 'dtype': self.dtype.name, 'seed': self.seed}
+    
+    @property
+    def uses_ivf(self) -> bool:
+        return self.index_type == 'ivf' and self.centroids is not None
+    
+    def build(self, chunks: List[str]) -> None:
+        """
+        Embed all chunks and build the ANN structure.
+        """
+        vectors = self.embedder.encode(chunks)
+        self.vectors = vectors.astype(self.dtype, copy=False)
+        self.centroids = None
+        if self.index_type == 'ivf' and len(chunks) >= MIN_IVF_CHUNKS:
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(chunks))))
+            self.centroids = self._train_centroids(vectors, n_lists)
+            self._build_lists(vectors)
+        logger.info(f"Built dense index for {len(chunks)} chunks "
+                    f"({'IVF' if self.uses_ivf else 'exact'}, dim {self.embedder.dim})")
+    
+    def _train_centroids(self, vectors: np.ndarray, n_lists: int, iterations: int = 10) -> np.ndarray:
+        """
+        Spherical k-means on a sample of the vectors.
+        """
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), n_lists * 256)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            # Re-seed empty clusters from random sample points
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+    
+    def _build_lists(self, vectors: np.ndarray) -> None:
+        assignment = self._assign(vectors)
+        self.list_order = np.argsort(assignment, kind='stable').astype(np.int32)
+        counts = np.bincount(assignment, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.list_vectors = np.ascontiguousarray(self.vectors[self.list_order])
+    
+    def _assign(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            assignment[start:start + block] = np.argmax(
+                vectors[start:start + block].astype(np.float32) @ self.centroids.T, axis=1)
+        return assignment
+    
+    def search(self, queries: List[str], k: int, exact: bool = False,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the k nearest chunks for each query.
+        
+        Args:
+            queries: Query texts
+            k: Chunks to return per query
+            exact: Force brute-force search even when an IVF index exists
+            rows: Restrict the search to these chunk rows (sorted), e.g. from structured filters
+        
+        Returns:
+            One (chunk rows, cosine scores) pair per query, best first
+        """
+        return self.search_vectors(self.embedder.encode(queries), k, exact, rows)
+    
+    def search_vectors(self, query_vectors: np.ndarray, k: int, exact: bool = False,
+                       rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Like search, for queries already embedded with embedder.encode.
+        
+        A restricted search never scans more than the unrestricted one: small row
+        sets are gathered and scored exactly, larger ones go through the IVF index
+        and skip rows outside the set. Gathered rows cost a few times more than the
+        contiguous IVF lists, so exact search is used up to a quarter of the IVF scan.
+        """
+        if rows is not None and (exact or not self.uses_ivf or len(rows) <= self._ivf_scan_size() // 4):
+            return self._search_exact(query_vectors, k, rows)
+        if exact or not self.uses_ivf:
+            return self._search_exact(query_vectors, k)
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(len(self.vectors), dtype=bool)
+            allowed[rows] = True
+        return [self._search_ivf(query_vector, k, allowed) for query_vector in query_vectors]
+    
+    def _ivf_scan_size(self) -> int:
+        # Expected number of vectors scanned by one IVF query
+        return len(self.vectors) * min(self.n_probe, len(self.centroids)) // max(len(self.centroids), 1)
+    
+    def _search_exact(self, query_vectors: np.ndarray, k: int, rows: Optional[np.ndarray] = None, block: int = 65536):
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        n_chunks = len(vectors)
+        scores = np.empty((len(query_vectors), n_chunks), dtype=np.float32)
+        for start in range(0, n_chunks, block):
+            scores[:, start:start + block] = query_vectors @ vectors[start:start + block].astype(np.float32).T
+        results = []
+        for row_scores, query_vector in zip(scores, query_vectors):
+            if not query_vector.any() or n_chunks == 0:
+                results.append((np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)))
+                continue
+            top = _top_k(row_scores, k)
+            top_rows = top if rows is None else rows[top]
+            results.append((top_rows.astype(np.int32), row_scores[top]))
+        return results
+    
+    def _search_ivf(self, query_vector: np.ndarray, k: int, allowed: Optional[np.ndarray] = None):
+        if not query_vector.any():
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        probes = _top_k(self.centroids @ query_vector, self.n_probe)
+        # Scan each probed cluster's contiguous block
+        row_parts, score_parts = [], []
+        for cluster in probes:
+            start, end = self.list_offsets[cluster], self.list_offsets[cluster + 1]
+            if start == end:
+                continue
+            list_rows = self.list_order[start:end]
+            list_vectors = self.list_vectors[start:end]
+            if allowed is not None:
+                keep = allowed[list_rows]
+                list_rows, list_vectors = list_rows[keep], list_vectors[keep]
+            score_parts.append(list_vectors.astype(np.float32) @ query_vector)
+            row_parts.append(list_rows)
+        if not row_parts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        rows = np.concatenate(row_parts)
+        scores = np.concatenate(score_parts)
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+    
+    def updated(self, keep: np.ndarray, new_chunks: List[str]) -> "DenseRetriever":
+        """
+        Return a retriever with rows outside keep dropped and new chunks appended.
+        Existing centroids are reused; new vectors join their nearest cluster.
+        """
+        retriever = DenseRetriever.__new__(DenseRetriever)
+        retriever.__dict__.update(self.__dict__)
+        new_vectors = self.embedder.encode(new_chunks).astype(self.dtype) if new_chunks else \
+            np.empty((0, self.embedder.dim), dtype=self.dtype)
+        retriever.vectors = np.ascontiguousarray(np.concatenate([self.vectors[keep], new_vectors]))
+        if self.uses_ivf:
+            retriever._build_lists(retriever.vectors)
+        return retriever
+    
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "vectors.npy"), self.vectors)
+        if self.uses_ivf:
+            np.save(os.path.join(index_dir, "centroids.npy"), self.centroids)
+            np.save(os.path.join(index_dir, "list_order.npy"), self.list_order)
+            np.save(os.path.join(index_dir, "list_offsets.npy"), self.list_offsets)
+            np.save(os.path.join(index_dir, "list_vectors.npy"), self.list_vectors)
+        with open(os.path.join(index_dir, "dense.json"), 'w', encoding='utf-8') as f:
+            json.dump({'ivf': self.uses_ivf, 'params': self.params()}, f, indent=4)
+    
+    def load(self, index_dir: str) -> None:
+        """
+        Memory-map a saved dense index read-only.
+        """
+        with open(os.path.join(index_dir, "dense.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode='r')
+        self.centroids = None
+        if meta['ivf']:
+            self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+            self.list_order = np.load(os.path.join(index_dir, "list_order.npy"), mmap_mode='r')
+            self.list_offsets = np.load(os.path.join(index_dir, "list_offsets.npy"))
+            self.list_vectors = np.load(os.path.join(index_dir, "list_vectors.npy"), mmap_mode='r')
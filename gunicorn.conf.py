@@ -0,0 +1,18 @@
+import os
+
+# Gunicorn reads this file from the working directory; command-line flags override it.
+# With PRELOAD_INDEX the master imports the app and builds the index once before forking,
+# and all workers share the index memory instead of each holding a private copy.
+preload_app = os.environ.get("PRELOAD_INDEX", "false").lower() in ("1", "true", "yes")
+
+def post_worker_init(worker):
+    # Workers reset inherited signal handlers on start; with a preloaded app the
+    # app's own handlers were installed in the master, so put them back. The worker's
+    # config also reflects --preload given on the command line, unlike preload_app above
+    if worker.cfg.preload_app:
+        from app import index_manager, install_signal_handlers
+        install_signal_handlers()
+        # Start this worker's shard pool before it accepts requests
+        engine = index_manager.current
+        if engine is not None and engine.shards is not None:
+            engine.shards.warm()
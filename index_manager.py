@@ -0,0 +1,190 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+from rag_engine import RAGEngine
+from metrics import INDEX_BUILD_SECONDS, INDEX_BUILDS
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Query used to smoke-test a freshly built engine before it goes live
+PROBE_QUERY = "assessment"
+# Seconds before a failed build is retried while no snapshot is live, doubling up to the maximum
+INDEX_RETRY_DELAY = float(os.environ.get("INDEX_RETRY_DELAY", 1.0))
+INDEX_RETRY_MAX_DELAY = float(os.environ.get("INDEX_RETRY_MAX_DELAY", 60.0))
+
+class IndexManager:
+    """
+    Owns the live RAGEngine snapshot and replaces it atomically.
+    
+    New engines are built on a background thread, validated, and then swapped in
+    with a single reference assignment. Request handlers read `current` once and
+    keep using that snapshot, so in-flight queries are never affected by a swap.
+    """
+    
+    def __init__(self, factory: Callable[[], RAGEngine],
+                 on_swap: Optional[Callable[[RAGEngine], None]] = None):
+        """
+        Initialize the index manager.
+        
+        Args:
+            factory: Builds and returns a fully indexed RAGEngine
+            on_swap: Called with the new engine after it goes live
+        """
+        self.factory = factory
+        self.on_swap = on_swap
+        self._engine: Optional[RAGEngine] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self.last_error: Optional[str] = None
+        self.last_swap: Optional[float] = None
+        self.last_build_seconds: Optional[float] = None
+    
+    @property
+    def current(self) -> Optional[RAGEngine]:
+        """
+        The live engine snapshot, or None until the first index is ready.
+        """
+        self._check_fork()
+        return self._engine
+    
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+    
+    @property
+    def building(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _check_fork(self) -> None:
+        """
+        Build threads do not survive fork (e.g. gunicorn --preload); if this process
+        inherited no engine, start a build of its own.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+        if self._engine is None:
+            self.rebuild()
+    
+    def rebuild(self, wait: bool = False, warm: bool = True, retry: bool = True) -> bool:
+        """
+        Build a new engine snapshot in the background and swap it in when valid.
+        
+        A failed build keeps the current snapshot. While there is none, the build is
+        retried with exponential backoff (capped at INDEX_RETRY_MAX_DELAY) until one
+        succeeds, so a transient failure at startup does not leave the process unready.
+        
+        Args:
+            wait: Block until the build has finished
+            warm: Start the shard pool processes before the swap; a process about to
+                fork (gunicorn --preload) leaves this to its workers
+            retry: Retry failed builds while no snapshot is live; a process about to
+                fork disables this so its workers retry on their own instead
+        
+        Returns:
+            True if a build was started, False if one is already running (with wait,
+            after that build has finished)
+        """
+        return self._start(self.factory, wait, warm, retry)
+    
+    def update(self, updater: Callable[[RAGEngine], RAGEngine], wait: bool = False) -> bool:
+        """
+        Derive a new snapshot from the live engine (e.g. an incremental refresh) in the background.
+        
+        Args:
+            updater: Takes the live engine and returns the updated one
+            wait: Block until the update has finished
+        
+        Returns:
+            True if an update was started, False if a build is already running or no index is live
+        """
+        engine = self.current
+        if engine is None:
+            return False
+        return self._start(lambda: updater(engine), wait)
+    
+    def _start(self, build: Callable[[], RAGEngine], wait: bool, warm: bool = True, retry: bool = False) -> bool:
+        with self._lock:
+            started = not self.building
+            if started:
+                self._thread = threading.Thread(target=self._run, args=(build, warm, retry), name="index-build", daemon=True)
+                self._thread.start()
+            else:
+                logger.info("Index build already in progress")
+            thread = self._thread
+        # Concurrent waiters (e.g. preloading while a signalled rebuild runs) all wait on the one running build
+        if wait:
+            thread.join()
+        return started
+    
+    def _run(self, build: Callable[[], RAGEngine], warm: bool, retry: bool) -> None:
+        delay = INDEX_RETRY_DELAY
+        while not self._build(build, warm) and retry and self._engine is None:
+            logger.warning(f"No index snapshot is live; retrying the build in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, INDEX_RETRY_MAX_DELAY)
+    
+    def _build(self, build: Callable[[], RAGEngine], warm: bool) -> bool:
+        start = time.perf_counter()
+        try:
+            logger.info("Building new index snapshot...")
+            engine = build()
+            self.validate(engine)
+            # Spawn the shard pool here rather than inside the first query that needs it
+            if warm and engine.shards is not None:
+                engine.shards.warm()
+            self.swap(engine)
+            self.last_build_seconds = time.perf_counter() - start
+            self.last_error = None
+            INDEX_BUILDS.inc(result='success')
+            INDEX_BUILD_SECONDS.observe(self.last_build_seconds)
+            logger.info(f"Index snapshot {engine.index_version} live after {self.last_build_seconds:.2f}s")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            INDEX_BUILDS.inc(result='failure')
+            logger.error(f"Index build failed, keeping the current snapshot: {str(e)}")
+            return False
+    
+    def validate(self, engine: RAGEngine) -> None:
+        """
+        Raise if an engine is not fit to serve queries.
+        """
+        if not engine.chunks or engine.embeddings is None:
+            raise ValueError("Engine has no indexed chunks")
+        if engine.embeddings.shape[0] != len(engine.chunks):
+            raise ValueError(f"Index has {engine.embeddings.shape[0]} rows for {len(engine.chunks)} chunks")
+        if engine.index_version is None:
+            raise ValueError("Engine has no index version")
+        # search() swallows errors, so probe the scoring path directly
+        query_vector = engine.scorer.transform_queries([PROBE_QUERY])
+        engine._score_chunks(query_vector.indices, query_vector.data)
+    
+    def swap(self, engine: RAGEngine) -> None:
+        """
+        Make engine the live snapshot.
+        """
+        self._engine = engine
+        self.last_swap = time.time()
+        if self.on_swap:
+            self.on_swap(engine)
+    
+    def status(self) -> Dict[str, Any]:
+        engine = self.current
+        return {
+            'ready': engine is not None,
+            'building': self.building,
+            'index_version': engine.index_version if engine else None,
+            'products': len(engine.products) if engine else 0,
+            'chunks': len(engine.chunks) if engine else 0,
+            'last_swap': self.last_swap,
+            'last_build_seconds': self.last_build_seconds,
+            'last_error': self.last_error
+        }
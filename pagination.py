@@ -0,0 +1,67 @@
+import os
+import base64
+import binascii
+import json
+import math
+import logging
+from typing import Any, Dict, Optional
+from response_encoding import dumps
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Most results returned in one response (top_k / limit are clamped to this)
+MAX_TOP_K = int(os.environ.get("MAX_TOP_K", 50))
+# Depth of the ranked list stored for a query; cursors page through at most this many results
+RANKED_LIST_SIZE = int(os.environ.get("RANKED_LIST_SIZE", 200))
+# Stored ranked lists, and seconds one stays valid after it is computed
+RANKED_CACHE_SIZE = int(os.environ.get("RANKED_CACHE_SIZE", 1024))
+CURSOR_TTL = float(os.environ.get("CURSOR_TTL", 600))
+
+def clamp_top_k(value: Any, default: int = 4) -> int:
+    """
+    Page size from a client value: non-integers fall back to default, and the
+    result is kept between 0 and MAX_TOP_K.
+    """
+    try:
+        top_k = int(value)
+    except (ValueError, TypeError):
+        top_k = default
+    return max(0, min(top_k, MAX_TOP_K))
+
+def encode_cursor(query: str, min_score: float, filters: Dict[str, Any], index_version: Optional[str],
+                  offset: int) -> str:
+    """
+    Opaque, URL-safe cursor for the page starting at offset.
+    
+    The cursor carries the query itself, so any worker can serve the next page:
+    from its stored ranked list when it has one, otherwise by ranking the query once.
+    """
+    state = {'q': query, 'm': min_score, 'f': filters, 'v': index_version, 'o': offset}
+    return base64.urlsafe_b64encode(dumps(state)).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    State of a cursor made by encode_cursor, as a dict with 'query', 'min_score',
+    'filters', 'index_version' and 'offset'. Filters still need parse_filters.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        decoded = {
+            'query': state['q'],
+            'min_score': float(state['m']),
+            'filters': state['f'],
+            'index_version': state['v'],
+            'offset': int(state['o'])
+        }
+    except (UnicodeEncodeError, binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError("Malformed cursor") from e
+    if (not isinstance(decoded['query'], str) or not isinstance(decoded['filters'], dict)
+            or not math.isfinite(decoded['min_score']) or not 0 <= decoded['offset'] < RANKED_LIST_SIZE):
+        raise ValueError("Malformed cursor")
+    return decoded
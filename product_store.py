@@ -0,0 +1,335 @@
+import os
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from data_processor import ATTRIBUTE_FIELDS, TEST_TYPES, product_attributes
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Response snippet lengths, applied once at index time
+DESCRIPTION_SNIPPET_CHARS = 300
+CHUNK_SNIPPET_CHARS = 150
+
+# Bit of each test type code in the test_types bitmask column
+TEST_TYPE_BITS = {code: np.uint8(1 << i) for i, code in enumerate(TEST_TYPES)}
+TEST_TYPE_NAMES = {name.lower(): code for code, (name, _) in TEST_TYPES.items()}
+# Codes set in each possible bitmask, so decoding is a table lookup
+_TEST_TYPE_CODES = [tuple(code for code, bit in TEST_TYPE_BITS.items() if bits & int(bit)) for bits in range(256)]
+# Marks an unknown duration in the duration_minutes column
+UNKNOWN_DURATION = -1
+
+FILTER_FIELDS = ('test_type', 'min_duration', 'max_duration', 'remote', 'adaptive')
+
+def truncate(text: str, limit: int) -> str:
+    """
+    Cut text to limit characters, marking the cut with an ellipsis.
+    """
+    return text[:limit] + "..." if len(text) > limit else text
+
+class TextColumn:
+    """
+    Immutable sequence of strings packed into one UTF-8 buffer with int64 offsets.
+    
+    Compared to a list of str this drops the per-object header and pointer of
+    every string, and the whole column is two NumPy arrays that can be sliced,
+    gathered and saved without touching individual Python objects.
+    """
+    
+    __slots__ = ('buffer', 'offsets')
+    
+    def __init__(self, buffer: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None):
+        self.buffer = buffer if buffer is not None else np.empty(0, dtype=np.uint8)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+    
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "TextColumn":
+        builder = TextColumnBuilder()
+        for text in strings:
+            builder.append(text)
+        return builder.build()
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+    
+    def raw(self, i: int) -> bytes:
+        """
+        UTF-8 bytes of row i, without decoding.
+        """
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes()
+    
+    def __iter__(self) -> Iterator[str]:
+        # Decode the whole buffer once and slice by character offsets
+        text = self.buffer.tobytes().decode('utf-8')
+        if len(text) == len(self.buffer):
+            # Pure ASCII: byte offsets are character offsets
+            offsets = self.offsets.tolist()
+            for start, end in zip(offsets, offsets[1:]):
+                yield text[start:end]
+        else:
+            for i in range(len(self)):
+                yield self[i]
+    
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes + self.offsets.nbytes
+    
+    def take(self, indices: np.ndarray) -> "TextColumn":
+        """
+        Gather the given rows into a new column with one vectorized copy.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return TextColumn(self.buffer[positions], offsets)
+    
+    def concat(self, other: "TextColumn") -> "TextColumn":
+        return TextColumn(
+            np.concatenate([self.buffer, other.buffer]),
+            np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]])
+        )
+
+class TextColumnBuilder:
+    """
+    Accumulates strings for a TextColumn without keeping the str objects alive.
+    """
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = [0]
+    
+    def append(self, text: str) -> None:
+        self.append_bytes(text.encode('utf-8'))
+    
+    def append_bytes(self, data: bytes) -> None:
+        self._buffer += data
+        self._offsets.append(len(self._buffer))
+    
+    def build(self) -> TextColumn:
+        return TextColumn(
+            np.frombuffer(bytes(self._buffer), dtype=np.uint8),
+            np.asarray(self._offsets, dtype=np.int64)
+        )
+
+class ProductStore:
+    """
+    Columnar store of the product fields needed at query time.
+    
+    Full descriptions and chunk lists stay in the data file; only the fields a
+    response needs (with the description already truncated) and the fields used
+    to diff a fresh scrape are kept, one TextColumn per field. Structured
+    attributes are typed NumPy columns so filters evaluate as vectorized masks.
+    """
+    
+    TEXT_FIELDS = ('title', 'url', 'image_url', 'description', 'content_hash')
+    ATTRIBUTE_DTYPES = {
+        'test_types': np.uint8,  # Bitmask of TEST_TYPE_BITS
+        'duration_minutes': np.int16,  # UNKNOWN_DURATION when not stated
+        'remote': bool,
+        'adaptive': bool
+    }
+    
+    def __init__(self, columns: Optional[Dict[str, TextColumn]] = None, removed: Optional[np.ndarray] = None,
+                 attributes: Optional[Dict[str, np.ndarray]] = None):
+        self.columns = columns or {field: TextColumn() for field in self.TEXT_FIELDS}
+        self.removed = removed if removed is not None else np.zeros(0, dtype=bool)  # Tombstones
+        self.attributes = attributes or {
+            field: np.zeros(0, dtype=dtype) for field, dtype in self.ATTRIBUTE_DTYPES.items()
+        }
+    
+    @classmethod
+    def from_products(cls, products: Iterable[Dict[str, Any]]) -> "ProductStore":
+        builder = ProductStoreBuilder()
+        for product in products:
+            builder.add(product)
+        return builder.build()
+    
+    def __len__(self) -> int:
+        return len(self.removed)
+    
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        record = {field: column[i] for field, column in self.columns.items()}
+        record.update(self.attributes_of(i))
+        record['removed'] = bool(self.removed[i])
+        return record
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = [iter(column) for column in self.columns.values()]
+        for values, attributes, removed in zip(zip(*columns), self.iter_attributes(), self.removed.tolist()):
+            record = dict(zip(self.columns, values))
+            record.update(attributes)
+            record['removed'] = removed
+            yield record
+    
+    def attributes_of(self, i: int) -> Dict[str, Any]:
+        """
+        Structured attributes of product i, decoded from the typed columns.
+        """
+        return _decode_attributes(*(self.attributes[field][i].item() for field in ATTRIBUTE_FIELDS))
+    
+    def iter_attributes(self) -> Iterator[Dict[str, Any]]:
+        """
+        Structured attributes of every product in order, as from attributes_of.
+        """
+        for values in zip(*(self.attributes[field].tolist() for field in ATTRIBUTE_FIELDS)):
+            yield _decode_attributes(*values)
+    
+    @property
+    def nbytes(self) -> int:
+        return (sum(column.nbytes for column in self.columns.values()) + self.removed.nbytes
+                + sum(column.nbytes for column in self.attributes.values()))
+    
+    def mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Boolean mask of the searchable products matching every filter.
+        
+        Args:
+            filters: Normalized filters as returned by parse_filters
+        """
+        mask = ~self.removed
+        attributes = self.attributes
+        if 'test_type' in filters:
+            bits = np.uint8(0)
+            for code in filters['test_type']:
+                bits |= TEST_TYPE_BITS[code]
+            mask &= (attributes['test_types'] & bits) != 0
+        if 'min_duration' in filters or 'max_duration' in filters:
+            durations = attributes['duration_minutes']
+            mask &= durations != UNKNOWN_DURATION
+            if 'min_duration' in filters:
+                mask &= durations >= filters['min_duration']
+            if 'max_duration' in filters:
+                mask &= durations <= filters['max_duration']
+        for field in ('remote', 'adaptive'):
+            if field in filters:
+                mask &= attributes[field] == filters[field]
+        return mask
+    
+    def updated(self, tombstoned: List[int], new_products: List[Dict[str, Any]]) -> "ProductStore":
+        """
+        Return a store with the given rows tombstoned and new products appended.
+        """
+        new = ProductStore.from_products(new_products)
+        removed = np.concatenate([self.removed, new.removed])
+        removed[tombstoned] = True
+        columns = {field: column.concat(new.columns[field]) for field, column in self.columns.items()}
+        attributes = {field: np.concatenate([column, new.attributes[field]]) for field, column in self.attributes.items()}
+        return ProductStore(columns, removed, attributes)
+
+class ProductStoreBuilder:
+    """
+    Streams product dicts into a ProductStore.
+    """
+    
+    def __init__(self):
+        self._columns = {field: TextColumnBuilder() for field in ProductStore.TEXT_FIELDS}
+        self._removed = []
+        self._attributes = {field: [] for field in ProductStore.ATTRIBUTE_DTYPES}
+    
+    def add(self, product: Dict[str, Any]) -> None:
+        columns = self._columns
+        columns['title'].append(product.get('title', ''))
+        columns['url'].append(product.get('url', ''))
+        columns['image_url'].append(product.get('image_url') or '')
+        columns['description'].append(truncate(product.get('description', ''), DESCRIPTION_SNIPPET_CHARS))
+        columns['content_hash'].append(product.get('content_hash') or '')
+        self._removed.append(bool(product.get('removed')))
+        
+        # Catalogs written before attributes were extracted get them derived here
+        if any(field not in product for field in ATTRIBUTE_FIELDS):
+            product = dict(product, **product_attributes(product))
+        attributes = self._attributes
+        attributes['test_types'].append(sum(int(TEST_TYPE_BITS[code]) for code in set(product['test_types'] or [])
+                                            if code in TEST_TYPE_BITS))
+        duration = product['duration_minutes']
+        attributes['duration_minutes'].append(UNKNOWN_DURATION if duration is None else min(int(duration), 32767))
+        attributes['remote'].append(bool(product['remote']))
+        attributes['adaptive'].append(bool(product['adaptive']))
+    
+    def build(self) -> ProductStore:
+        columns = {field: builder.build() for field, builder in self._columns.items()}
+        attributes = {
+            field: np.asarray(self._attributes[field], dtype=dtype)
+            for field, dtype in ProductStore.ATTRIBUTE_DTYPES.items()
+        }
+        return ProductStore(columns, np.asarray(self._removed, dtype=bool), attributes)
+
+def _decode_attributes(test_types: int, duration: int, remote: bool, adaptive: bool) -> Dict[str, Any]:
+    return {
+        'test_types': list(_TEST_TYPE_CODES[test_types]),
+        'duration_minutes': None if duration == UNKNOWN_DURATION else duration,
+        'remote': remote,
+        'adaptive': adaptive
+    }
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if str(value).strip().lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"Expected a boolean, got '{value}'")
+
+def _parse_minutes(value: Any) -> int:
+    try:
+        minutes = int(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Expected a number of minutes, got '{value}'")
+    if minutes < 0:
+        raise ValueError("Durations cannot be negative")
+    return minutes
+
+def parse_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate and normalize structured filters from a request.
+    
+    Args:
+        filters: Any of 'test_type' (SHL code or name, or a list or comma-separated
+            string of them; matches products with any of the types), 'min_duration'
+            and 'max_duration' (minutes; products without a stated duration never
+            match), 'remote' and 'adaptive' (booleans). Empty values are ignored.
+    
+    Returns:
+        Normalized filters, empty if none were given
+    
+    Raises:
+        ValueError: For unknown filter names or invalid values
+    """
+    normalized = {}
+    for field, value in (filters or {}).items():
+        if value is None or value == '' or value == []:
+            continue
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter '{field}'; expected one of {list(FILTER_FIELDS)}")
+        if field == 'test_type':
+            values = value.split(',') if isinstance(value, str) else list(value)
+            codes = set()
+            for item in values:
+                item = str(item).strip()
+                code = item.upper() if item.upper() in TEST_TYPE_BITS else TEST_TYPE_NAMES.get(item.lower())
+                if code is None:
+                    raise ValueError(f"Unknown test type '{item}'; expected one of {list(TEST_TYPE_BITS)}")
+                codes.add(code)
+            normalized[field] = sorted(codes)
+        elif field in ('min_duration', 'max_duration'):
+            normalized[field] = _parse_minutes(value)
+        else:
+            normalized[field] = _parse_bool(value)
+    return normalized
+
+def filters_key(filters: Dict[str, Any]) -> tuple:
+    """
+    Hashable form of normalized filters, e.g. for cache keys.
+    """
+    return tuple(sorted((field, tuple(value) if isinstance(value, list) else value)
+                        for field, value in filters.items()))
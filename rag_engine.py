@@ -1,76 +1,157 @@
 import os
+import copy
+import time
 import json
+import shutil
+import hashlib
 import logging
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from data_processor import compact_catalog, iter_products
+from scorers import Scorer, make_scorer
+from dense_index import DEFAULT_RETRIEVAL, DenseRetriever
+from suggest_index import PrefixIndex
+from similar_index import SimilarityTable
+from sharded_index import INDEX_SHARDS, BrokenProcessPool, ShardedPostings, pool_products, score_postings
+from metrics import EMPTY_RESULTS, QUERIES, STAGE_SECONDS
+from response_encoding import dumps, float_json
+# fcntl is POSIX-only; without it index saves are not serialized across processes
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from product_store import (CHUNK_SNIPPET_CHARS, ProductStore, ProductStoreBuilder, TextColumn, TextColumnBuilder,
+                           parse_filters, truncate)
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
 logger = logging.getLogger(__name__)
 
+# Bump whenever the on-disk index layout changes so stale artifacts are rebuilt
+INDEX_FORMAT_VERSION = 5
+
+# Prefix marking the title chunk of each product
+TITLE_PREFIX = "Title: "
+
+# Dense retrieval fetches this many nearest chunks per requested product before pooling
+DENSE_CANDIDATES_PER_RESULT = 8
+
+def fingerprint_file(path: str, extra: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Computes a SHA-256 fingerprint of a file's contents plus optional build settings.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    if extra:
+        digest.update(json.dumps(extra, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+@contextmanager
+def _exclusive_lock(path: str):
+    """
+    Hold an exclusive advisory lock on path for the duration of the block.
+    """
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
 class RAGEngine:
     """
     Retrieval-Augmented Generation engine for SHL product recommendations.
-    Uses TF-IDF vectorization and cosine similarity for semantic search to find relevant assessments.
+    Scores chunks with a pluggable sparse scorer (TF-IDF cosine or BM25) to find relevant assessments,
+    or retrieves them from a dense embedding index with approximate nearest-neighbour search.
     """
     
-    def __init__(self, data_path: str = "data/shl_products.json"):
+    def __init__(self, data_path: str = "data/shl_products.jsonl", index_dir: str = "data/index",
+                 scorer: Optional[Any] = None, retrieval: Optional[str] = None, shards: Optional[int] = None):
         """
-        Initialize the RAG engine with TF-IDF vectorization.
+        Initialize the RAG engine with a relevance scorer.
         
         Args:
-            data_path: Path to the JSON file containing SHL product data
+            data_path: Path to the JSON Lines (or legacy JSON) file containing SHL product data
+            index_dir: Directory holding the persisted index artifact
+            scorer: Scorer instance or name ('tfidf', 'bm25'); defaults to the RAG_SCORER setting
+            retrieval: 'sparse' (inverted index) or 'dense' (embeddings + ANN index);
+                defaults to the RAG_RETRIEVAL setting
+            shards: Number of index shards scored in parallel by a process pool (sparse
+                retrieval only); defaults to the INDEX_SHARDS setting, 1 scores in-process
         """
         self.data_path = data_path
-        self.products = []
-        self.chunks = []
-        self.product_indices = []  # Maps chunk index back to product index
-        self.vectorizer = None
+        self.index_dir = index_dir
+        self.index_version = None  # Fingerprint of the data the index was built from
+        self.products = ProductStore()  # Columnar product fields needed at query time
+        self.chunks = TextColumn()
+        self.snippets = TextColumn()  # Truncated chunks for responses, parallel to chunks
+        self.product_indices = np.zeros(0, dtype=np.int32)  # Maps chunk index back to product index
+        self.title_mask = np.zeros(0, dtype=bool)  # Marks title chunks for field weighting
+        self.scorer = None
         self.embeddings = None
+        self.postings = None  # Inverted index: CSC view of embeddings (term -> chunks)
+        self.n_shards = shards or INDEX_SHARDS
+        self.shards = None  # Sharded copy of the inverted index, scored by a process pool
+        self.retrieval = (retrieval or DEFAULT_RETRIEVAL).lower()
+        self.dense = None  # Dense retriever, only in 'dense' retrieval mode
+        self.suggestions = PrefixIndex()  # Title and term completions for autocomplete
+        self.similar_products = SimilarityTable()  # Precomputed product -> similar products
+        self.url_ids = {}  # Product URL -> index of its searchable entry
+        self.fragments = TextColumn()  # Pre-serialized static JSON members of each product's response
         
-        logger.info("Initializing RAG engine with TF-IDF vectorization")
         try:
-            self.vectorizer = TfidfVectorizer(
-                min_df=2, max_df=0.95, 
-                max_features=200, 
-                stop_words='english'
-            )
-            logger.info("TF-IDF vectorizer initialized successfully")
+            if self.retrieval not in ('sparse', 'dense'):
+                raise ValueError(f"Unknown retrieval mode '{self.retrieval}'; expected 'sparse' or 'dense'")
+            self.scorer = scorer if isinstance(scorer, Scorer) else make_scorer(scorer)
+            if self.retrieval == 'dense':
+                self.dense = DenseRetriever()
+            logger.info(f"Initialized RAG engine with the {self.scorer.name} scorer ({self.retrieval} retrieval)")
         except Exception as e:
-            logger.error(f"Error initializing vectorizer: {str(e)}")
+            logger.error(f"Error initializing scorer: {str(e)}")
             raise
     
     def load_data(self) -> None:
         """
-        Load SHL product data from the JSON file.
-        Extracts chunks for semantic search.
+        Load SHL product data from the data file.
+        
+        JSON Lines files are consumed one product at a time, straight into columnar
+        buffers: product fields, chunk texts and response snippets are packed into
+        TextColumns, so no per-product dicts or per-chunk strings stay alive.
         """
         try:
             if not os.path.exists(self.data_path):
                 logger.error(f"Data file not found: {self.data_path}")
                 raise FileNotFoundError(f"Data file not found: {self.data_path}")
             
-            with open(self.data_path, 'r', encoding='utf-8') as f:
-                self.products = json.load(f)
-            
-            logger.info(f"Loaded {len(self.products)} products from {self.data_path}")
-            
             # Extract chunks for embedding
-            self.chunks = []
-            self.product_indices = []
+            products = ProductStoreBuilder()
+            chunks = TextColumnBuilder()
+            snippets = TextColumnBuilder()
+            product_indices = []
+            title_flags = []
             
-            for i, product in enumerate(self.products):
-                # Add title as a chunk with high importance
-                self.chunks.append(f"Title: {product['title']}")
-                self.product_indices.append(i)
+            for i, product in enumerate(iter_products(self.data_path)):
+                products.add(product)
                 
-                # Add each text chunk
-                for chunk in product.get('chunks', []):
-                    if chunk.strip():
-                        self.chunks.append(chunk)
-                        self.product_indices.append(i)
+                # Tombstoned products keep their index but are not searchable
+                if product.get('removed'):
+                    continue
+                for position, chunk in enumerate(self._product_chunks(product)):
+                    chunks.append(chunk)
+                    snippets.append(truncate(chunk, CHUNK_SNIPPET_CHARS))
+                    product_indices.append(i)
+                    title_flags.append(position == 0)
+            
+            self.products = products.build()
+            self.chunks = chunks.build()
+            self.snippets = snippets.build()
+            logger.info(f"Loaded {len(self.products)} products from {self.data_path}")
+            
+            # Compact chunk -> product mapping for vectorized per-product reductions
+            self.product_indices = np.asarray(product_indices, dtype=np.int32)
+            self.title_mask = np.asarray(title_flags, dtype=bool)
             
             logger.info(f"Extracted {len(self.chunks)} chunks from {len(self.products)} products")
         
@@ -78,107 +159,715 @@ class RAGEngine:
             logger.error(f"Error loading data: {str(e)}")
             raise
     
+    @staticmethod
+    def _product_chunks(product: Dict[str, Any]) -> List[str]:
+        """
+        Searchable chunks of a product: its title followed by each non-empty text chunk.
+        """
+        # Add title as a chunk with high importance
+        chunks = [f"{TITLE_PREFIX}{product['title']}"]
+        
+        # Add each text chunk
+        chunks.extend(chunk for chunk in product.get('chunks', []) if chunk.strip())
+        return chunks
+    
+    @staticmethod
+    def _title_mask(chunks: List[str]) -> np.ndarray:
+        return np.fromiter((chunk.startswith(TITLE_PREFIX) for chunk in chunks), dtype=bool, count=len(chunks))
+    
+    def apply_update(self, new_products: List[Dict[str, Any]], removed_urls: List[str]) -> "RAGEngine":
+        """
+        Build an updated engine that embeds only new or changed products.
+        
+        The fitted vocabulary and term weights are kept fixed so existing rows stay
+        valid; terms unseen at fit time are ignored until the next full rebuild.
+        The current engine is left untouched and keeps serving queries, so callers
+        can swap the returned engine in without downtime. The returned engine has no
+        index_version until the caller has written its products to the data file.
+        
+        Args:
+            new_products: Processed products to add; a product whose URL is already
+                indexed replaces (and tombstones) the existing entry
+            removed_urls: URLs of products to tombstone
+        
+        Returns:
+            A new RAGEngine sharing unchanged state with this one
+        """
+        try:
+            if self.embeddings is None:
+                raise RuntimeError("No index to update. Build the index first.")
+            
+            replaced = {product['url'] for product in new_products} | set(removed_urls)
+            tombstoned = [
+                i for i, (url, removed) in enumerate(zip(self.products.columns['url'], self.products.removed.tolist()))
+                if not removed and url in replaced
+            ]
+            
+            # Vectorize only the new chunks against the fixed vocabulary
+            new_chunks = []
+            new_indices = []
+            for i, product in enumerate(new_products, start=len(self.products)):
+                for chunk in self._product_chunks(product):
+                    new_chunks.append(chunk)
+                    new_indices.append(i)
+            
+            keep = ~np.isin(self.product_indices, tombstoned)
+            kept_rows = np.flatnonzero(keep)
+            blocks = [self.embeddings[kept_rows]]
+            new_title_mask = self._title_mask(new_chunks)
+            if new_chunks:
+                blocks.append(self.scorer.transform_chunks(new_chunks, new_title_mask))
+            
+            engine = copy.copy(self)
+            engine.products = self.products.updated(tombstoned, new_products)
+            engine.chunks = self.chunks.take(kept_rows).concat(TextColumn.from_strings(new_chunks))
+            engine.snippets = self.snippets.take(kept_rows).concat(
+                TextColumn.from_strings(truncate(chunk, CHUNK_SNIPPET_CHARS) for chunk in new_chunks)
+            )
+            engine.product_indices = np.concatenate([
+                self.product_indices[keep],
+                np.asarray(new_indices, dtype=np.int32)
+            ])
+            engine.title_mask = np.concatenate([self.title_mask[keep], new_title_mask])
+            engine.embeddings = sparse.vstack(blocks, format='csr')
+            engine.postings = engine.embeddings.tocsc()
+            engine.postings.sort_indices()
+            if self.dense is not None:
+                engine.dense = self.dense.updated(keep, new_chunks)
+            engine.similar_products = self.similar_products.updated(
+                engine.embeddings, engine.product_indices, len(engine.products),
+                np.arange(len(self.products), len(engine.products)), engine.products.removed
+            )
+            engine._build_lookups()
+            engine.index_version = None
+            
+            logger.info(f"Updated index: {len(new_products)} products embedded, "
+                        f"{len(tombstoned)} tombstoned, {len(engine.chunks)} chunks")
+            return engine
+        
+        except Exception as e:
+            logger.error(f"Error updating index: {str(e)}")
+            raise
+    
     def build_index(self) -> None:
         """
-        Build the TF-IDF index for search.
+        Fit the scorer and build the chunk weight matrix and inverted index for search.
         """
         try:
             if not self.chunks:
                 logger.error("No chunks available for indexing. Load data first.")
                 return
             
-            logger.info(f"Building TF-IDF index for {len(self.chunks)} chunks...")
-            self.embeddings = self.vectorizer.fit_transform(self.chunks)
+            logger.info(f"Building {self.scorer.name} index for {len(self.chunks)} chunks...")
+            self.embeddings = self.scorer.fit_transform(self.chunks, self.title_mask).tocsr()
+            self.postings = self.embeddings.tocsc()
+            self.postings.sort_indices()
+            if self.dense is not None:
+                self.dense.build(self.chunks)
+            self.similar_products = SimilarityTable()
+            self.similar_products.build(self.embeddings, self.product_indices, len(self.products))
+            self._build_lookups()
+            self.index_version = self._source_fingerprint()
             logger.info(f"Index built successfully with shape {self.embeddings.shape}")
         
         except Exception as e:
             logger.error(f"Error building index: {str(e)}")
             raise
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _build_lookups(self) -> None:
+        """
+        Derive the autocomplete prefix index, the URL lookup, the response fragments
+        and the index shards from the loaded index. All are cheap to rebuild, so
+        they are not persisted.
+        """
+        searchable = np.flatnonzero(~self.products.removed)
+        urls = self.products.columns['url']
+        self.url_ids = {urls[pid]: pid for pid in searchable.tolist()}
+        self.fragments = self._response_fragments()
+        self.shards = None
+        if self.n_shards > 1 and self.dense is None:
+            self.shards = ShardedPostings(self.embeddings, self.product_indices, self.n_shards)
+        self.suggestions = PrefixIndex.build(
+            self.products.columns['title'],
+            searchable,
+            self.scorer.vocabulary(),
+            np.diff(self.postings.indptr),
+            self.postings.shape[0]
+        )
+    
+    def _response_fragments(self) -> TextColumn:
+        """
+        The static members of every product's recommendation (title, url, description,
+        image_url and attributes) serialized once, without the enclosing braces.
+        """
+        columns = self.products.columns
+        fields = ('title', 'url', 'description', 'image_url')
+        fragments = TextColumnBuilder()
+        for values, attributes in zip(zip(*(columns[field] for field in fields)), self.products.iter_attributes()):
+            attributes.update(zip(fields, values))
+            fragments.append_bytes(dumps(attributes)[1:-1])
+        return fragments.build()
+    
+    def _source_fingerprint(self) -> str:
         """
-        Perform TF-IDF search to find chunks relevant to the query.
+        Fingerprint of the source data and the settings that shape the index.
+        """
+        return fingerprint_file(self.data_path, extra={
+            'format_version': INDEX_FORMAT_VERSION,
+            'scorer': self.scorer.name,
+            'scorer_params': self.scorer.params(),
+            'dense_params': self.dense.params() if self.dense is not None else None,
+            'similar_top_n': self.similar_products.top_n
+        })
+    
+    def save_index(self) -> None:
+        """
+        Persist the fitted scorer state, CSR weight matrix and inverted index to index_dir.
         
-        Args:
-            query: User query
-            top_k: Number of results to return
+        The artifact is written to a temporary directory and swapped into place so
+        readers never observe a half-written index.
+        """
+        try:
+            if self.embeddings is None:
+                logger.error("No index to save. Build the index first.")
+                return
+            
+            tmp_dir = f"{self.index_dir}.tmp-{os.getpid()}"
+            old_dir = f"{self.index_dir}.old-{os.getpid()}"
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            os.makedirs(tmp_dir)
+            
+            self.scorer.save(tmp_dir)
+            np.save(os.path.join(tmp_dir, "embeddings_data.npy"), self.embeddings.data)
+            np.save(os.path.join(tmp_dir, "embeddings_indices.npy"), self.embeddings.indices)
+            np.save(os.path.join(tmp_dir, "embeddings_indptr.npy"), self.embeddings.indptr)
+            np.save(os.path.join(tmp_dir, "postings_data.npy"), self.postings.data)
+            np.save(os.path.join(tmp_dir, "postings_indices.npy"), self.postings.indices)
+            np.save(os.path.join(tmp_dir, "postings_indptr.npy"), self.postings.indptr)
+            if self.dense is not None:
+                self.dense.save(os.path.join(tmp_dir, "dense"))
+            self.similar_products.save(tmp_dir)
+            
+            # Metadata goes last; its presence marks the artifact as complete
+            meta = {
+                'format_version': INDEX_FORMAT_VERSION,
+                'scorer': self.scorer.name,
+                'fingerprint': self.index_version,
+                'shape': list(self.embeddings.shape)
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=4)
+            
+            # Swap the new artifact into place; processes that already mapped the
+            # old files keep reading them until they reload. The two renames run under
+            # a lock so workers saving at the same time cannot interleave them
+            with _exclusive_lock(f"{self.index_dir}.lock"):
+                if os.path.exists(self.index_dir):
+                    os.rename(self.index_dir, old_dir)
+                os.rename(tmp_dir, self.index_dir)
+            if os.path.exists(old_dir):
+                shutil.rmtree(old_dir)
+            
+            logger.info(f"Saved index artifact to {self.index_dir}")
+        
+        except Exception as e:
+            logger.error(f"Error saving index: {str(e)}")
+            raise
+    
+    def load_index(self) -> bool:
+        """
+        Memory-map a persisted index artifact if it matches the current source data.
         
         Returns:
-            List of top_k relevant chunks with metadata
+            True if the artifact was loaded, False if it is missing or stale
         """
+        meta_file = os.path.join(self.index_dir, "meta.json")
+        if not os.path.exists(meta_file):
+            logger.info(f"No index artifact found in {self.index_dir}")
+            return False
+        
         try:
-            # Transform the query using the fitted vectorizer
-            query_vector = self.vectorizer.transform([query])
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
             
-            # Calculate cosine similarity between query and all chunks
-            similarities = cosine_similarity(query_vector, self.embeddings)[0]
+            fingerprint = self._source_fingerprint()
+            if meta.get('fingerprint') != fingerprint:
+                logger.info("Index artifact is stale; source data or settings changed")
+                return False
             
-            # Get indices of top_k highest similarities
-            top_indices = np.argsort(-similarities)[:top_k * 2]  # Get more to filter duplicates
+            # Read-only memory maps let every worker share the same page cache
+            data = np.load(os.path.join(self.index_dir, "embeddings_data.npy"), mmap_mode='r')
+            indices = np.load(os.path.join(self.index_dir, "embeddings_indices.npy"), mmap_mode='r')
+            indptr = np.load(os.path.join(self.index_dir, "embeddings_indptr.npy"), mmap_mode='r')
             
-            # Collect unique product indices and their highest similarity scores
-            unique_products = {}
-            for idx in top_indices:
-                product_idx = self.product_indices[idx]
-                similarity = similarities[idx]
-                
-                if product_idx not in unique_products or similarity > unique_products[product_idx]['similarity']:
-                    unique_products[product_idx] = {
-                        'product_idx': product_idx,
-                        'chunk_idx': idx,
-                        'similarity': similarity,
-                        'chunk': self.chunks[idx]
-                    }
-            
-            # Get the top_k unique products
-            results = list(unique_products.values())
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            return results[:top_k]
+            embeddings = sparse.csr_matrix((data, indices, indptr), shape=tuple(meta['shape']), copy=False)
+            postings = sparse.csc_matrix((
+                np.load(os.path.join(self.index_dir, "postings_data.npy"), mmap_mode='r'),
+                np.load(os.path.join(self.index_dir, "postings_indices.npy"), mmap_mode='r'),
+                np.load(os.path.join(self.index_dir, "postings_indptr.npy"), mmap_mode='r')
+            ), shape=tuple(meta['shape']), copy=False)
+            if embeddings.shape[0] != len(self.chunks):
+                logger.info("Index artifact does not match loaded chunks")
+                return False
+            
+            self.scorer.load(self.index_dir)
+            if self.dense is not None:
+                self.dense.load(os.path.join(self.index_dir, "dense"))
+            self.embeddings = embeddings
+            self.postings = postings
+            self.similar_products = SimilarityTable()
+            self.similar_products.load(self.index_dir)
+            self._build_lookups()
+            self.index_version = fingerprint
+            logger.info(f"Loaded index artifact from {self.index_dir} with shape {embeddings.shape}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error loading index artifact, will rebuild: {str(e)}")
+            return False
+    
+    def load_or_build_index(self) -> None:
+        """
+        Load the persisted index, rebuilding and saving it only when the fingerprint changed.
+        """
+        if self.load_index():
+            return
+        self.build_index()
+        # The built index serves fine from memory; a failed save only costs the next start a rebuild
+        try:
+            self.save_index()
+        except Exception as e:
+            logger.warning(f"Serving an index that could not be saved: {str(e)}")
+    
+    def _score_chunks(self, terms: np.ndarray, weights: np.ndarray):
+        """
+        Accumulate query-term weights over the postings lists of the inverted index.
+        
+        Args:
+            terms: Column indices of the query terms
+            weights: Scorer weights of the query terms
+        
+        Returns:
+            Tuple of (chunk row indices, scores) for every chunk touched by the query
+        """
+        return score_postings(self.postings.indptr, self.postings.indices, self.postings.data, terms, weights)
+    
+    def _pool_products(self, rows: np.ndarray, scores: np.ndarray, top_k: int, min_score: float = 0.0):
+        """
+        Max-pool chunk scores per product and select the top_k products.
+        
+        Args:
+            rows: Chunk row indices
+            scores: Scores of those chunks
+            top_k: Number of products to return
+            min_score: Chunks scoring below this are discarded before pooling
+        
+        Returns:
+            Tuple of (product indices, best chunk rows, best scores), ordered by
+            descending score with ties broken by product index
+        """
+        return pool_products(self.product_indices, rows, scores, top_k, min_score)
+    
+    def _chunk_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Boolean mask of the chunks whose product matches the structured filters,
+        or None when there are no filters.
+        """
+        if not filters:
+            return None
+        with STAGE_SECONDS.time(stage='filter'):
+            return self.products.mask(parse_filters(filters))[self.product_indices]
+    
+    def _score_filtered(self, query_vector: sparse.csr_matrix, chunk_mask: np.ndarray):
+        """
+        Score one query against the chunks in chunk_mask only.
+        
+        Walking the postings lists costs the total length of the query terms' lists;
+        scanning the allowed rows directly costs their nonzeros. The cheaper of the
+        two is used, so a selective filter makes the query cheaper, never dearer.
+        """
+        indptr = self.postings.indptr
+        postings_work = int(sum(indptr[term + 1] - indptr[term] for term in query_vector.indices))
+        allowed = np.flatnonzero(chunk_mask)
+        scan_work = len(allowed) * self.embeddings.nnz // max(self.embeddings.shape[0], 1)
+        
+        if scan_work < postings_work:
+            scores = self.embeddings[allowed] @ query_vector.toarray().ravel()
+            matched = np.flatnonzero(scores)
+            return allowed[matched], scores[matched]
+        rows, scores = self._score_chunks(query_vector.indices, query_vector.data)
+        keep = chunk_mask[rows]
+        return rows[keep], scores[keep]
+    
+    def _ranked(self, query: str, top_k: int, min_score: float, filters: Optional[Dict[str, Any]] = None):
+        """
+        Score the chunks of one query and pool them into the top_k products.
+        
+        Returns:
+            Tuple of (product indices, best chunk rows, scores) as from _pool_products
+        """
+        if self.dense is not None:
+            return self._ranked_dense([query], top_k, min_score, filters)[0]
+        chunk_mask = self._chunk_mask(filters)
+        
+        # Encode the query with the fitted scorer
+        started = time.perf_counter()
+        query_vector = self.scorer.transform_queries([query])
+        transformed = time.perf_counter()
+        STAGE_SECONDS.observe(transformed - started, stage='transform')
+        
+        # Queries with no known terms, or filters no product passes, cannot match anything
+        if query_vector.nnz == 0 or (chunk_mask is not None and not chunk_mask.any()):
+            self._count_queries(1, 1)
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        
+        # Sharded indexes score and pool in the process pool; only the merge is left here
+        if chunk_mask is None and self.shards is not None:
+            try:
+                ranked = self.shards.search(query_vector.indices, query_vector.data, top_k, min_score)
+            except BrokenProcessPool as e:
+                # A replacement pool is starting; score this query in-process
+                logger.error(f"Shard pool failed, scoring in-process: {str(e)}")
+            else:
+                STAGE_SECONDS.observe(time.perf_counter() - transformed, stage='score')
+                self._count_queries(1, int(len(ranked[0]) == 0))
+                return ranked
+        
+        # Score only the chunks that share a term with the query (and pass the filters)
+        if chunk_mask is None:
+            rows, scores = self._score_chunks(query_vector.indices, query_vector.data)
+        else:
+            rows, scores = self._score_filtered(query_vector, chunk_mask)
+        scored = time.perf_counter()
+        STAGE_SECONDS.observe(scored - transformed, stage='score')
+        
+        ranked = self._pool_products(rows, scores, top_k, min_score)
+        STAGE_SECONDS.observe(time.perf_counter() - scored, stage='topk')
+        self._count_queries(1, int(len(ranked[0]) == 0))
+        return ranked
+    
+    def _ranked_batch(self, queries: List[str], top_k: int, min_score: float,
+                      filters: Optional[Dict[str, Any]] = None):
+        """
+        Rank many queries with one transform and one (queries x chunks) sparse product.
+        With filters, the product only covers the chunks of matching products.
+        """
+        if not queries:
+            return []
+        if self.dense is not None:
+            return self._ranked_dense(queries, top_k, min_score, filters)
+        chunk_mask = self._chunk_mask(filters)
+        
+        started = time.perf_counter()
+        query_matrix = self.scorer.transform_queries(queries)
+        transformed = time.perf_counter()
+        STAGE_SECONDS.observe(transformed - started, stage='transform')
+        
+        if chunk_mask is None:
+            score_matrix = (query_matrix @ self.embeddings.T).tocsr()
+        else:
+            allowed = np.flatnonzero(chunk_mask)
+            score_matrix = (query_matrix @ self.embeddings[allowed].T).tocsr()
+            # Map columns of the restricted product back to chunk rows
+            score_matrix.indices = allowed[score_matrix.indices].astype(score_matrix.indices.dtype)
+        scored = time.perf_counter()
+        STAGE_SECONDS.observe(scored - transformed, stage='score')
+        
+        ranked = []
+        for i in range(score_matrix.shape[0]):
+            start, end = score_matrix.indptr[i], score_matrix.indptr[i + 1]
+            rows = score_matrix.indices[start:end]
+            scores = score_matrix.data[start:end]
+            ranked.append(self._pool_products(rows, scores, top_k, min_score))
+        STAGE_SECONDS.observe(time.perf_counter() - scored, stage='topk')
+        self._count_queries(len(queries), sum(len(product_ids) == 0 for product_ids, _, _ in ranked))
+        return ranked
+    
+    def _ranked_dense(self, queries: List[str], top_k: int, min_score: float,
+                      filters: Optional[Dict[str, Any]] = None):
+        """
+        Retrieve nearest chunks from the dense index and max-pool them per product.
+        
+        Only the nearest chunks are pooled, so fewer than top_k products can come
+        back when one product owns most of the neighbours.
+        """
+        n_candidates = max(top_k * DENSE_CANDIDATES_PER_RESULT, 32)
+        chunk_mask = self._chunk_mask(filters)
+        allowed = np.flatnonzero(chunk_mask) if chunk_mask is not None else None
+        started = time.perf_counter()
+        query_vectors = self.dense.embedder.encode(queries)
+        transformed = time.perf_counter()
+        STAGE_SECONDS.observe(transformed - started, stage='transform')
+        
+        neighbours = self.dense.search_vectors(query_vectors, n_candidates, rows=allowed)
+        scored = time.perf_counter()
+        STAGE_SECONDS.observe(scored - transformed, stage='score')
+        
+        ranked = [
+            self._pool_products(rows, scores.astype(np.float64), top_k, min_score)
+            for rows, scores in neighbours
+        ]
+        STAGE_SECONDS.observe(time.perf_counter() - scored, stage='topk')
+        self._count_queries(len(queries), sum(len(product_ids) == 0 for product_ids, _, _ in ranked))
+        return ranked
+    
+    @staticmethod
+    def _count_queries(queries: int, empty: int) -> None:
+        QUERIES.inc(queries)
+        if empty:
+            EMPTY_RESULTS.inc(empty)
+    
+    def search(self, query: str, top_k: int = 5, min_score: float = 0.0,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Search for the products most relevant to the query.
+        
+        Each product is scored by its best-matching chunk, so the result always
+        holds min(top_k, number of matching products) distinct products.
+        
+        Args:
+            query: User query
+            top_k: Number of products to return
+            min_score: Minimum similarity for a chunk to count as a match
+            filters: Structured filters (see product_store.parse_filters); only
+                chunks of matching products are scored
+        
+        Returns:
+            List of top_k relevant products with their best chunk and metadata
+        """
+        try:
+            return self._search_results(*self._ranked(query, top_k, min_score, filters))
         
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
             return []
     
-    def get_recommendations(self, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
+    def search_batch(self, queries: List[str], top_k: int = 5, min_score: float = 0.0,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search many queries at once with a single sparse matrix product.
+        
+        Args:
+            queries: User queries
+            top_k: Number of products to return per query
+            min_score: Minimum similarity for a chunk to count as a match
+            filters: Structured filters applied to every query
+        
+        Returns:
+            One list of search results per query, in input order
+        """
+        try:
+            return [self._search_results(*ranked) for ranked in self._ranked_batch(queries, top_k, min_score, filters)]
+        
+        except Exception as e:
+            logger.error(f"Error during batch search: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _search_results(self, product_ids: np.ndarray, chunk_rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Convert pooled product arrays into search result dicts.
+        """
+        return [
+            {
+                'product_idx': product_idx,
+                'chunk_idx': chunk_idx,
+                'similarity': similarity,
+                'chunk': self.chunks[chunk_idx]
+            }
+            for product_idx, chunk_idx, similarity in zip(
+                product_ids.tolist(), chunk_rows.tolist(), scores.tolist()
+            )
+        ]
+    
+    def get_recommendations(self, query: str, top_k: int = 4, min_score: float = 0.0,
+                            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Get product recommendations based on the user query.
         
         Args:
             query: User query
             top_k: Number of recommendations to return
+            min_score: Minimum similarity for a product to be recommended
+            filters: Structured filters (see product_store.parse_filters), e.g.
+                {'test_type': ['P'], 'max_duration': 30, 'remote': True}
         
         Returns:
             List of top_k relevant products with metadata
         """
         try:
-            search_results = self.search(query, top_k=top_k)
-            
-            recommendations = []
-            for result in search_results:
-                product_idx = result['product_idx']
-                product = self.products[product_idx]
-                
-                recommendation = {
-                    'title': product['title'],
-                    'url': product['url'],
-                    'description': product['description'][:300] + "..." if len(product['description']) > 300 else product['description'],
-                    'similarity': float(result['similarity']),
-                    'relevant_chunk': result['chunk'][:150] + "..." if len(result['chunk']) > 150 else result['chunk'],
-                    'image_url': product.get('image_url', '')
-                }
-                recommendations.append(recommendation)
-            
-            return recommendations
+            ranked = self._ranked(query, top_k, min_score, filters)
+            with STAGE_SECONDS.time(stage='assemble'):
+                return self._recommendations(*ranked)
         
         except Exception as e:
             logger.error(f"Error getting recommendations: {str(e)}")
             return []
+    
+    def get_recommendations_json(self, query: str, top_k: int = 4, min_score: float = 0.0,
+                                 filters: Optional[Dict[str, Any]] = None) -> List[bytes]:
+        """
+        Like get_recommendations, with each recommendation already encoded as a JSON
+        object spliced from the precomputed product fragments.
+        """
+        try:
+            ranked = self._ranked(query, top_k, min_score, filters)
+            with STAGE_SECONDS.time(stage='assemble'):
+                return self._recommendations_json(*ranked)
+        
+        except Exception as e:
+            logger.error(f"Error getting recommendations: {str(e)}")
+            return []
+    
+    def get_ranked(self, query: str, depth: int, min_score: float = 0.0,
+                   filters: Optional[Dict[str, Any]] = None):
+        """
+        Compact ranked list of up to depth products for paging through results,
+        e.g. kept behind a cursor; pages are encoded with get_page_json.
+        
+        Returns:
+            Tuple of (product indices, best chunk rows, scores), best first
+        """
+        try:
+            product_ids, chunk_rows, scores = self._ranked(query, depth, min_score, filters)
+            return product_ids.astype(np.int32), chunk_rows.astype(np.int32), scores
+        
+        except Exception as e:
+            logger.error(f"Error ranking query: {str(e)}")
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, np.empty(0, dtype=np.float64)
+    
+    def get_page_json(self, ranked, offset: int, top_k: int) -> List[bytes]:
+        """
+        Encoded recommendations for one page of a ranked list from get_ranked, without rescoring.
+        """
+        with STAGE_SECONDS.time(stage='assemble'):
+            return self._recommendations_json(*(part[offset:offset + top_k] for part in ranked))
+    
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        Autocomplete a partially typed query.
+        
+        Args:
+            prefix: Text typed so far
+            limit: Maximum number of completions
+        
+        Returns:
+            Completions as dicts with 'text' and 'type' ('title' or 'term'), best first
+        """
+        with STAGE_SECONDS.time(stage='suggest'):
+            return self.suggestions.suggest(prefix, limit)
+    
+    def get_similar(self, url: str, top_k: int = 4) -> Optional[List[Dict[str, Any]]]:
+        """
+        Products most similar to the product at url, read from the precomputed neighbour table.
+        
+        Args:
+            url: URL of a catalog product
+            top_k: Number of similar products to return (at most the table's top_n)
+        
+        Returns:
+            Recommendations as from get_recommendations, or None if url is not in the catalog
+        """
+        product_id = self.url_ids.get(url)
+        if product_id is None:
+            return None
+        with STAGE_SECONDS.time(stage='similar'):
+            neighbours, scores = self.similar_products.lookup(product_id, top_k)
+            # Show each neighbour's first body chunk (its title chunk if it has none)
+            starts = np.searchsorted(self.product_indices, neighbours, side='left')
+            ends = np.searchsorted(self.product_indices, neighbours, side='right')
+            rows = np.minimum(starts + 1, ends - 1)
+            return self._recommendations(neighbours, rows, scores.astype(np.float64))
+    
+    def get_recommendations_batch(self, queries: List[str], top_k: int = 4, min_score: float = 0.0,
+                                  filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Get product recommendations for many queries in one pass.
+        
+        Args:
+            queries: User queries
+            top_k: Number of recommendations to return per query
+            min_score: Minimum similarity for a product to be recommended
+            filters: Structured filters applied to every query
+        
+        Returns:
+            One list of recommendations per query, in input order
+        """
+        try:
+            batch_ranked = self._ranked_batch(queries, top_k, min_score, filters)
+            with STAGE_SECONDS.time(stage='assemble'):
+                return [self._recommendations(*ranked) for ranked in batch_ranked]
+        
+        except Exception as e:
+            logger.error(f"Error getting batch recommendations: {str(e)}")
+            return [[] for _ in queries]
+    
+    def get_recommendations_batch_json(self, queries: List[str], top_k: int = 4, min_score: float = 0.0,
+                                       filters: Optional[Dict[str, Any]] = None) -> List[List[bytes]]:
+        """
+        Like get_recommendations_batch, with recommendations encoded as in get_recommendations_json.
+        """
+        try:
+            batch_ranked = self._ranked_batch(queries, top_k, min_score, filters)
+            with STAGE_SECONDS.time(stage='assemble'):
+                return [self._recommendations_json(*ranked) for ranked in batch_ranked]
+        
+        except Exception as e:
+            logger.error(f"Error getting batch recommendations: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _recommendations(self, product_ids: np.ndarray, chunk_rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Build response dicts straight from the columnar store.
+        Descriptions and snippets were truncated at load time, so each field is a single decode.
+        """
+        columns = self.products.columns
+        return [
+            {
+                'title': columns['title'][product_idx],
+                'url': columns['url'][product_idx],
+                'description': columns['description'][product_idx],
+                'similarity': similarity,
+                'relevant_chunk': self.snippets[chunk_idx],
+                'image_url': columns['image_url'][product_idx],
+                **self.products.attributes_of(product_idx)
+            }
+            for product_idx, chunk_idx, similarity in zip(
+                product_ids.tolist(), chunk_rows.tolist(), scores.tolist()
+            )
+        ]
+    
+    def _recommendations_json(self, product_ids: np.ndarray, chunk_rows: np.ndarray, scores: np.ndarray) -> List[bytes]:
+        """
+        Encoded recommendations: only the snippet and score are serialized per request.
+        """
+        return [
+            b'{' + self.fragments.raw(product_idx) + b',"similarity":' + float_json(similarity)
+            + b',"relevant_chunk":' + dumps(self.snippets[chunk_idx]) + b'}'
+            for product_idx, chunk_idx, similarity in zip(
+                product_ids.tolist(), chunk_rows.tolist(), scores.tolist()
+            )
+        ]
 
 if __name__ == "__main__":
-    # Test the RAG engine
+    import sys
+    
     engine = RAGEngine()
     engine.load_data()
-    engine.build_index()
+    
+    # Build step: refresh the persisted index artifact and exit
+    if "--build-index" in sys.argv:
+        # Drop products tombstoned by catalog refreshes before refitting
+        if engine.products.removed.any():
+            compact_catalog(engine.data_path)
+            engine.load_data()
+        engine.load_or_build_index()
+        sys.exit(0)
+    
+    # Test the RAG engine
+    engine.load_or_build_index()
     
     test_query = "leadership assessment for executives"
     recommendations = engine.get_recommendations(test_query)
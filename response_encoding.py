@@ -0,0 +1,96 @@
+import os
+import gzip
+import json
+import logging
+from typing import Any, Dict, Iterable
+
+# orjson and brotli are optional; without them the stdlib encoder and gzip are used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent uncompressed; compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def dumps(value: Any) -> bytes:
+    """
+    Compact UTF-8 JSON, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_array(items: Iterable[bytes]) -> bytes:
+    """
+    JSON array of already-encoded JSON values.
+    """
+    return b'[' + b','.join(items) + b']'
+
+def splice(envelope: Dict[str, Any], name: str, raw: bytes) -> bytes:
+    """
+    JSON object of envelope plus one member whose value is already-encoded JSON,
+    so large precomputed payloads are not decoded and re-encoded.
+    """
+    head = dumps(envelope)
+    separator = b',' if len(head) > 2 else b''
+    return head[:-1] + separator + dumps(name) + b':' + raw + b'}'
+
+def float_json(value: float) -> bytes:
+    # repr is the shortest round-tripping form, as json.dumps writes it
+    return repr(float(value)).encode('ascii')
+
+def choose_encoding(accept_encoding: str) -> str:
+    """
+    Preferred content coding the client accepts: 'br', 'gzip' or '' for none.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return ''
+
+def compress_response(response, accept_encoding: str):
+    """
+    Compress a complete JSON or NDJSON response in place when it is large enough
+    and the client accepts br or gzip. Streamed responses are left alone.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'application/x-ndjson')):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    coding = choose_encoding(accept_encoding)
+    if not coding:
+        return response
+    
+    if coding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = coding
+    return response
@@ -6,6 +6,10 @@
 # Set environment variables
 echo "Setting up environment variables..."
 export RENDER=true
+# Load the index once in the master and share it with the workers (gunicorn.conf.py turns on preload_app)
+export PRELOAD_INDEX=true
+# DEBUG logging is costly on the request path; override LOG_LEVEL to troubleshoot
+export LOG_LEVEL=${LOG_LEVEL:-WARNING}
 
 # Install dependencies
 echo "Installing dependencies..."
@@ -31,9 +35,8 @@ gunicorn --bind 0.0.0.0:$PORT \
   --workers 2 \
   --timeout 120 \
   --keep-alive 5 \
-  --log-level debug \
+  --log-level $LOG_LEVEL \
   --error-logfile logs/gunicorn-error.log \
   --access-logfile logs/gunicorn-access.log \
   --forwarded-allow-ips='*' \
-  --preload \
   main:app
\ No newline at end of file
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+from scipy import sparse
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Scorer used when none is configured; override with the RAG_SCORER environment variable
+DEFAULT_SCORER = os.environ.get("RAG_SCORER", "tfidf")
+
+# TF-IDF vectorizer settings; part of the index fingerprint
+VECTORIZER_PARAMS = {
+    'min_df': 2,
+    'max_df': 0.95,
+    'max_features': 200,
+    'stop_words': 'english'
+}
+
+# Default token pattern of the scikit-learn vectorizers that fit the vocabulary
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+class Scorer:
+    """
+    Pluggable relevance model for RAGEngine.
+    
+    A scorer turns chunks into a sparse (chunks x terms) weight matrix and queries
+    into sparse term vectors; the relevance of a chunk is the dot product of the
+    two. Because every scorer reduces to that form, the engine's inverted index,
+    batching and top-k selection work unchanged for all of them.
+    """
+    
+    name = None
+    
+    def params(self) -> Dict[str, Any]:
+        """
+        Settings that shape the index; included in the index fingerprint.
+        """
+        raise NotImplementedError
+    
+    def fit_transform(self, chunks: List[str], title_mask: np.ndarray) -> sparse.csr_matrix:
+        """
+        Fit the model on all chunks and return their weight matrix.
+        """
+        raise NotImplementedError
+    
+    def transform_chunks(self, chunks: List[str], title_mask: np.ndarray) -> sparse.csr_matrix:
+        """
+        Weight new chunks with the already fitted model (fixed vocabulary).
+        """
+        raise NotImplementedError
+    
+    def transform_queries(self, queries: List[str]) -> sparse.csr_matrix:
+        """
+        Encode queries as term vectors in the same space as the chunk matrix.
+        """
+        raise NotImplementedError
+    
+    def vocabulary(self) -> List[str]:
+        """
+        Terms ordered by column index.
+        """
+        raise NotImplementedError
+    
+    def save(self, index_dir: str) -> None:
+        raise NotImplementedError
+    
+    def load(self, index_dir: str) -> None:
+        raise NotImplementedError
+
+def _ordered_terms(vocabulary: Dict[str, int]) -> List[str]:
+    # Vocabulary as a list ordered by column index
+    terms = [None] * len(vocabulary)
+    for term, col in vocabulary.items():
+        terms[col] = term
+    return terms
+
+def _save_vocabulary(index_dir: str, terms: List[str]) -> None:
+    with open(os.path.join(index_dir, "vocabulary.json"), 'w', encoding='utf-8') as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+def _load_vocabulary(index_dir: str) -> Dict[str, int]:
+    with open(os.path.join(index_dir, "vocabulary.json"), 'r', encoding='utf-8') as f:
+        return {term: col for col, term in enumerate(json.load(f))}
+
+def _term_counts(texts: List[str], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+    """
+    Count vocabulary terms per text, tokenizing like the fitted vectorizer.
+    
+    Stop words are never in the vocabulary, so dropping unknown tokens drops them
+    too; queries are encoded without importing scikit-learn, which is only needed
+    to fit the vocabulary and weigh chunks.
+    """
+    indptr = [0]
+    indices = []
+    counts = []
+    for text in texts:
+        row = {}
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            col = vocabulary.get(token)
+            if col is not None:
+                row[col] = row.get(col, 0) + 1
+        for col in sorted(row):
+            indices.append(col)
+            counts.append(row[col])
+        indptr.append(len(indices))
+    return sparse.csr_matrix((
+        np.asarray(counts, dtype=np.float64),
+        np.asarray(indices, dtype=np.int32),
+        np.asarray(indptr, dtype=np.int32)
+    ), shape=(len(texts), len(vocabulary)))
+
+def _scale_rows(matrix: sparse.csr_matrix, title_mask: np.ndarray, title_weight: float) -> sparse.csr_matrix:
+    """
+    Multiply the rows of title chunks by title_weight.
+    """
+    if title_weight == 1.0 or not title_mask.any():
+        return matrix
+    row_weights = np.where(title_mask, title_weight, 1.0)
+    matrix = matrix.copy()
+    matrix.data *= np.repeat(row_weights, np.diff(matrix.indptr))
+    return matrix
+
+class TfidfScorer(Scorer):
+    """
+    L2-normalized TF-IDF vectors; scores are cosine similarities.
+    """
+    
+    name = "tfidf"
+    
+    def __init__(self, title_weight: float = 1.0):
+        """
+        Args:
+            title_weight: Multiplier for title chunk rows (1.0 keeps plain cosine scores)
+        """
+        self.title_weight = title_weight
+        self.terms = {}  # Term -> column
+        self.idf = None
+        self._vectorizer = None  # Fitted scikit-learn vectorizer, created when chunks are weighed
+    
+    def params(self) -> Dict[str, Any]:
+        return {'vectorizer': VECTORIZER_PARAMS, 'title_weight': self.title_weight}
+    
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+            if self.idf is not None:
+                self._vectorizer.vocabulary_ = self.terms
+                self._vectorizer.idf_ = self.idf
+        return self._vectorizer
+    
+    def fit_transform(self, chunks, title_mask):
+        self._vectorizer = None
+        matrix = self.vectorizer.fit_transform(chunks).tocsr()
+        self.terms = self.vectorizer.vocabulary_
+        self.idf = self.vectorizer.idf_
+        return _scale_rows(matrix, title_mask, self.title_weight)
+    
+    def transform_chunks(self, chunks, title_mask):
+        matrix = self.vectorizer.transform(chunks).tocsr()
+        return _scale_rows(matrix, title_mask, self.title_weight)
+    
+    def transform_queries(self, queries):
+        # The vectorizer's transform: term counts times idf, then L2-normalized rows
+        weights = _term_counts(queries, self.terms)
+        weights.data *= self.idf[weights.indices]
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        weights.data /= np.repeat(norms, np.diff(weights.indptr))
+        return weights
+    
+    def vocabulary(self):
+        return _ordered_terms(self.terms)
+    
+    def save(self, index_dir):
+        _save_vocabulary(index_dir, self.vocabulary())
+        np.save(os.path.join(index_dir, "idf.npy"), self.idf)
+    
+    def load(self, index_dir):
+        self.terms = _load_vocabulary(index_dir)
+        self.idf = np.load(os.path.join(index_dir, "idf.npy"))
+        self._vectorizer = None
+
+class BM25Scorer(Scorer):
+    """
+    Okapi BM25 over sparse term-frequency rows with per-field (title vs body) weighting.
+    
+    Chunk weights idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) are
+    precomputed in one vectorized pass over the CSR data, so a query is scored by
+    summing the weights of its (binary) terms over the postings lists.
+    """
+    
+    name = "bm25"
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_weight: float = 2.0):
+        """
+        Args:
+            k1: Term-frequency saturation
+            b: Document-length normalization strength
+            title_weight: Multiplier for title chunk rows
+        """
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        # No vocabulary cap: BM25 handles rare terms well and the catalog is small
+        self.terms = {}  # Term -> column
+        self.idf = None
+        self.avgdl = None
+        self._vectorizer = None  # Fitted scikit-learn vectorizer, created when chunks are weighed
+    
+    def params(self) -> Dict[str, Any]:
+        return {'k1': self.k1, 'b': self.b, 'title_weight': self.title_weight, 'stop_words': 'english'}
+    
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+            self._vectorizer = CountVectorizer(stop_words='english')
+            if self.terms:
+                self._vectorizer.vocabulary_ = self.terms
+        return self._vectorizer
+    
+    def _weigh(self, tf: sparse.csr_matrix, title_mask: np.ndarray) -> sparse.csr_matrix:
+        tf = tf.tocsr().astype(np.float64)
+        doc_lengths = np.asarray(tf.sum(axis=1)).ravel()
+        norms = self.k1 * (1 - self.b + self.b * doc_lengths / self.avgdl)
+        row_norms = np.repeat(norms, np.diff(tf.indptr))
+        weights = tf.copy()
+        weights.data = self.idf[tf.indices] * tf.data * (self.k1 + 1) / (tf.data + row_norms)
+        return _scale_rows(weights, title_mask, self.title_weight)
+    
+    def fit_transform(self, chunks, title_mask):
+        self._vectorizer = None
+        tf = self.vectorizer.fit_transform(chunks).tocsr()
+        self.terms = self.vectorizer.vocabulary_
+        n_chunks = tf.shape[0]
+        doc_freq = np.bincount(tf.indices, minlength=tf.shape[1])
+        self.idf = np.log(1 + (n_chunks - doc_freq + 0.5) / (doc_freq + 0.5))
+        self.avgdl = max(float(tf.sum()) / max(n_chunks, 1), 1e-9)
+        return self._weigh(tf, title_mask)
+    
+    def transform_chunks(self, chunks, title_mask):
+        return self._weigh(self.vectorizer.transform(chunks), title_mask)
+    
+    def transform_queries(self, queries):
+        queries_tf = _term_counts(queries, self.terms)
+        queries_tf.data = np.ones_like(queries_tf.data, dtype=np.float64)
+        return queries_tf
+    
+    def vocabulary(self):
+        return _ordered_terms(self.terms)
+    
+    def save(self, index_dir):
+        _save_vocabulary(index_dir, self.vocabulary())
+        np.save(os.path.join(index_dir, "idf.npy"), self.idf)
+        with open(os.path.join(index_dir, "bm25.json"), 'w', encoding='utf-8') as f:
+            json.dump({'avgdl': self.avgdl}, f)
+    
+    def load(self, index_dir):
+        self.terms = _load_vocabulary(index_dir)
+        self._vectorizer = None
+        self.idf = np.load(os.path.join(index_dir, "idf.npy"))
+        with open(os.path.join(index_dir, "bm25.json"), 'r', encoding='utf-8') as f:
+            self.avgdl = json.load(f)['avgdl']
+
+SCORERS = {
+    TfidfScorer.name: TfidfScorer,
+    BM25Scorer.name: BM25Scorer
+}
+
+def make_scorer(name: Optional[str] = None, **kwargs) -> Scorer:
+    """
+    Create a scorer by name ('tfidf' or 'bm25'); defaults to the RAG_SCORER setting.
+    """
+    name = (name or DEFAULT_SCORER).lower()
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer '{name}'; expected one of {sorted(SCORERS)}")
+    return SCORERS[name](**kwargs)
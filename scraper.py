@@ -1,15 +1,21 @@
 import os
 import json
 import csv
+import re
 import time
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import trafilatura
-from urllib.parse import urljoin
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
 logger = logging.getLogger(__name__)
 
 # SHL website URL
@@ -18,40 +24,224 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
-def get_website_text_content(url):
+# Crawler settings
+MAX_WORKERS = int(os.environ.get("SCRAPER_MAX_WORKERS", 4))
+RATE_PER_HOST = float(os.environ.get("SCRAPER_RATE_PER_HOST", 1.0))  # Requests per second
+BURST_PER_HOST = int(os.environ.get("SCRAPER_BURST_PER_HOST", 2))
+REQUEST_TIMEOUT = 30
+HTTP_CACHE_FILE = os.path.join("data", "http_cache.json")
+
+# Product page labels for structured attributes
+_TEST_TYPE_LABEL_RE = re.compile(r'test\s*type', re.IGNORECASE)
+_REMOTE_LABEL_RE = re.compile(r'remote\s*testing', re.IGNORECASE)
+_ADAPTIVE_LABEL_RE = re.compile(r'adaptive', re.IGNORECASE)
+_PAGE_DURATION_RE = re.compile(r'completion\s*time\s*in\s*minutes\s*=\s*(\d{1,3})', re.IGNORECASE)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; acquire() blocks until a token is available.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Crawler:
+    """
+    Pooled, concurrent HTTP crawler with a per-host rate limit and conditional GETs.
+    Each page is downloaded once and the body is reused for all parsing.
+    """
+    
+    def __init__(self, max_workers: int = MAX_WORKERS, rate_per_host: float = RATE_PER_HOST,
+                 burst_per_host: int = BURST_PER_HOST, cache_file: Optional[str] = HTTP_CACHE_FILE):
+        """
+        Initialize the crawler.
+        
+        Args:
+            max_workers: Number of pages fetched concurrently
+            rate_per_host: Sustained requests per second allowed per host
+            burst_per_host: Requests allowed in a burst per host
+            cache_file: JSON file holding validators and parsed results from earlier crawls
+        """
+        self.max_workers = max_workers
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.cache_file = cache_file
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self.http_cache = self._load_cache()
+        
+        # One pooled session shared by all worker threads
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def _load_cache(self) -> Dict[str, Any]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading HTTP cache {self.cache_file}: {str(e)}")
+            return {}
+    
+    def save_cache(self) -> None:
+        """
+        Persist validators and parsed products so the next crawl can send conditional GETs.
+        """
+        if not self.cache_file:
+            return
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with self._cache_lock:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.http_cache, f, ensure_ascii=False)
+    
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_per_host, self.burst_per_host)
+            return self._buckets[host]
+    
+    def fetch(self, url: str, conditional: bool = True) -> Optional[requests.Response]:
+        """
+        Fetch a URL, sending ETag / Last-Modified validators from earlier crawls.
+        
+        Returns:
+            The response (status 200 or 304), or None on failure
+        """
+        headers = {}
+        cached = self.http_cache.get(url, {}) if conditional else {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        
+        self._bucket(url).acquire()
+        try:
+            response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {url}: {str(e)}")
+            return None
+        
+        if response.status_code not in (200, 304):
+            logger.error(f"Failed to get page: {url}, status code: {response.status_code}")
+            return None
+        return response
+    
+    def remember(self, url: str, response: requests.Response, product: Dict[str, Any]) -> None:
+        """
+        Store the validators and parsed product for a fetched page.
+        """
+        with self._cache_lock:
+            self.http_cache[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'product': product
+            }
+    
+    def scrape_product(self, product_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and parse a product page, reusing the cached result on 304 Not Modified.
+        """
+        response = self.fetch(product_url)
+        if response is None:
+            return None
+        
+        if response.status_code == 304:
+            cached = self.http_cache.get(product_url, {}).get('product')
+            if cached:
+                logger.debug(f"Not modified: {product_url}")
+                return cached
+            # Validators without a stored product; fetch the full page
+            response = self.fetch(product_url, conditional=False)
+            if response is None:
+                return None
+        
+        product = parse_product_page(product_url, response.text)
+        if product:
+            self.remember(product_url, response, product)
+        return product
+    
+    def iter_products(self, product_urls: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Scrape product pages concurrently, yielding products in input order.
+        Only a small window of pages is in flight, so memory stays bounded.
+        """
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for product_url in product_urls:
+                pending.append(executor.submit(self.scrape_product, product_url))
+                if len(pending) >= window:
+                    product = pending.popleft().result()
+                    if product:
+                        yield product
+            while pending:
+                product = pending.popleft().result()
+                if product:
+                    yield product
+    
+    def scrape_products(self, product_urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Scrape product pages concurrently, preserving the input order.
+        """
+        return list(self.iter_products(product_urls))
+    
+    def close(self) -> None:
+        self.session.close()
+
+def extract_text_content(html: str) -> Optional[str]:
     """
-    Gets clean text content from a URL using trafilatura.
+    Gets clean text content from an already downloaded page using trafilatura.
     """
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            text = trafilatura.extract(downloaded)
-            return text
-        return None
+        return trafilatura.extract(html)
     except Exception as e:
-        logger.error(f"Error extracting text from {url}: {str(e)}")
+        logger.error(f"Error extracting text: {str(e)}")
         return None
 
-def scrape_product_details(product_url):
+def parse_product_page(product_url: str, html: str) -> Optional[Dict[str, Any]]:
     """
-    Scrapes detailed information about a specific SHL product.
+    Parses a downloaded SHL product page into a product dict.
     """
     try:
-        # Get the product page
-        response = requests.get(product_url, headers=HEADERS)
-        if response.status_code != 200:
-            logger.error(f"Failed to get product page: {product_url}, status code: {response.status_code}")
-            return None
-
-        # Parse the product details
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         
         # Get product title
         title_elem = soup.find('h1')
         title = title_elem.text.strip() if title_elem else "Unknown Product"
         
         # Extract full description using trafilatura for better text extraction
-        description = get_website_text_content(product_url)
+        description = extract_text_content(html)
         if not description:
             # Fallback to BeautifulSoup if trafilatura fails
             description_elems = soup.find_all(['p', 'li'])
@@ -61,69 +251,189 @@ def scrape_product_details(product_url):
         image_elem = soup.find('img', class_='attachment-post-thumbnail')
         image_url = image_elem.get('src') if image_elem else None
         
-        return {
+        product = {
             'title': title,
             'url': product_url,
             'description': description,
             'image_url': image_url
         }
+        product.update(parse_page_attributes(soup))
+        return product
     
+    except Exception as e:
+        logger.error(f"Error parsing product page {product_url}: {str(e)}")
+        return None
+
+def _labelled_element(soup: BeautifulSoup, label: re.Pattern):
+    # Smallest element whose own text starts with the label, e.g. <p>Test Type: <span>K</span></p>
+    text = soup.find(string=label)
+    return text.parent if text else None
+
+def parse_page_attributes(soup: BeautifulSoup) -> Dict[str, Any]:
+    """
+    Reads structured attributes shown on a product page (test type keys, completion
+    time, remote testing and adaptive/IRT indicators). Only attributes the page
+    actually shows are returned; the processor derives the rest from the description.
+    """
+    attributes = {}
+    
+    test_type = _labelled_element(soup, _TEST_TYPE_LABEL_RE)
+    if test_type:
+        keys = [key.get_text(strip=True).upper() for key in test_type.find_all('span')]
+        codes = sorted({key for key in keys if len(key) == 1 and key.isalpha()})
+        if codes:
+            attributes['test_types'] = codes
+    
+    duration = _PAGE_DURATION_RE.search(soup.get_text(" "))
+    if duration:
+        attributes['duration_minutes'] = int(duration.group(1))
+    
+    # Yes/no indicators are rendered as circles with a '-yes' class
+    for field, label in (('remote', _REMOTE_LABEL_RE), ('adaptive', _ADAPTIVE_LABEL_RE)):
+        element = _labelled_element(soup, label)
+        if element:
+            indicator = element.find('span', class_=re.compile('circle'))
+            if indicator is not None:
+                attributes[field] = '-yes' in (indicator.get('class') or [])
+    
+    return attributes
+
+def scrape_product_details(product_url, crawler: Optional[Crawler] = None):
+    """
+    Scrapes detailed information about a specific SHL product.
+    """
+    owns_crawler = crawler is None
+    crawler = crawler or Crawler(max_workers=1)
+    try:
+        return crawler.scrape_product(product_url)
     except Exception as e:
         logger.error(f"Error scraping product details for {product_url}: {str(e)}")
         return None
+    finally:
+        if owns_crawler:
+            crawler.close()
 
-def scrape_shl_products():
+def find_product_links(base_url: str, html: str) -> List[str]:
     """
-    Scrapes SHL product catalog from the main products page.
-    Returns a list of product dictionaries.
+    Extracts unique absolute product URLs from the catalog page.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    product_links = []
+    seen = set()
+    
+    # Look for product cards or links
+    for elem in soup.find_all('a', href=True):
+        href = elem.get('href', '')
+        # Filter for product links - typically they'll be under /solutions/products/ or similar path
+        if 'product' in href.lower() and not href.endswith('#') and not href == base_url:
+            # Make sure we have absolute URLs
+            product_url = urljoin(base_url, href)
+            if product_url not in seen:
+                seen.add(product_url)
+                product_links.append(product_url)
+    return product_links
+
+def fetch_product_links(base_url: str, crawler: Crawler) -> Optional[List[str]]:
+    """
+    Fetches the catalog page and extracts its product links.
+    
+    Returns:
+        Product URLs listed on the catalog page, or None if the page could not be fetched
+    """
+    # The catalog page is always fetched in full so new links are discovered
+    response = crawler.fetch(base_url, conditional=False)
+    if response is None:
+        logger.error("Failed to get SHL products page")
+        return None
+    return find_product_links(base_url, response.text)
+
+def iter_shl_products(base_url: str = SHL_BASE_URL, crawler: Optional[Crawler] = None,
+                      skip_urls: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams SHL products from the catalog as each page is scraped.
+    
+    Args:
+        base_url: Catalog page to crawl; point it at a local server for testing
+        crawler: Crawler to use; a default one is created when omitted
+        skip_urls: Product URLs that should not be fetched (e.g. already ingested)
     """
-    logger.info(f"Scraping SHL products from {SHL_BASE_URL}...")
-    products = []
+    logger.info(f"Scraping SHL products from {base_url}...")
+    owns_crawler = crawler is None
+    crawler = crawler or Crawler()
+    count = 0
     
     try:
-        # Get the main products page
-        response = requests.get(SHL_BASE_URL, headers=HEADERS)
-        if response.status_code != 200:
-            logger.error(f"Failed to get SHL products page, status code: {response.status_code}")
-            return products
-        
-        # Parse the page
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find product links
-        product_links = []
-        
-        # Look for product cards or links
-        product_elems = soup.find_all('a', href=True)
-        for elem in product_elems:
-            href = elem.get('href', '')
-            # Filter for product links - typically they'll be under /solutions/products/ or similar path
-            if 'product' in href.lower() and not href.endswith('#') and not href == SHL_BASE_URL:
-                # Make sure we have absolute URLs
-                product_url = urljoin(SHL_BASE_URL, href)
-                if product_url not in [p for p in product_links]:
-                    product_links.append(product_url)
-        
+        product_links = fetch_product_links(base_url, crawler)
+        if product_links is None:
+            return
+        if skip_urls:
+            product_links = [url for url in product_links if url not in skip_urls]
         logger.info(f"Found {len(product_links)} product links to scrape")
         
-        # Scrape detailed information for each product
-        for i, product_url in enumerate(product_links):
-            logger.info(f"Scraping product {i+1}/{len(product_links)}: {product_url}")
-            product_info = scrape_product_details(product_url)
-            if product_info:
-                products.append(product_info)
-            # Be nice to the server
-            time.sleep(1)
+        # Scrape detailed information for each product concurrently
+        for product in crawler.iter_products(product_links):
+            count += 1
+            yield product
         
-        # Save the scraped data
-        save_scraped_data(products)
-        
-        logger.info(f"Successfully scraped {len(products)} SHL products")
-        return products
+        logger.info(f"Successfully scraped {count} SHL products")
     
     except Exception as e:
         logger.error(f"Error scraping SHL products: {str(e)}")
-        return products
+    
+    finally:
+        crawler.save_cache()
+        if owns_crawler:
+            crawler.close()
+
+def scrape_shl_products(base_url: str = SHL_BASE_URL, crawler: Optional[Crawler] = None, save: bool = True):
+    """
+    Scrapes SHL product catalog from the main products page.
+    Returns a list of product dictionaries.
+    
+    Args:
+        base_url: Catalog page to crawl; point it at a local server for testing
+        crawler: Crawler to use; a default one is created when omitted
+        save: Write the raw scrape to data/; disable when diffing against stored products
+    """
+    products = list(iter_shl_products(base_url, crawler))
+    
+    # Save the scraped data
+    if save:
+        save_scraped_data(products)
+    return products
+
+def scrape_shl_catalog(base_url: str = SHL_BASE_URL, crawler: Optional[Crawler] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Scrapes the catalog for an incremental refresh, keeping the listing alongside the products.
+    
+    Product pages whose fetch failed are missing from the products but still listed,
+    so callers can tell a failed fetch from a product taken off the catalog.
+    
+    Args:
+        base_url: Catalog page to crawl; point it at a local server for testing
+        crawler: Crawler to use; a default one is created when omitted
+    
+    Returns:
+        Tuple of (product URLs listed on the catalog page, scraped products); both are
+        empty if the catalog page could not be fetched
+    """
+    logger.info(f"Scraping SHL catalog from {base_url}...")
+    owns_crawler = crawler is None
+    crawler = crawler or Crawler()
+    
+    try:
+        product_links = fetch_product_links(base_url, crawler)
+        if product_links is None:
+            return [], []
+        
+        products = crawler.scrape_products(product_links)
+        logger.info(f"Scraped {len(products)} of {len(product_links)} listed SHL products")
+        return product_links, products
+    
+    finally:
+        crawler.save_cache()
+        if owns_crawler:
+            crawler.close()
 
 def save_scraped_data(products):
     """
@@ -142,7 +452,7 @@ def save_scraped_data(products):
     # Save CSV file
     csv_file = os.path.join(data_dir, "shl_products.csv")
     with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['title', 'url', 'description', 'image_url'])
+        writer = csv.DictWriter(f, fieldnames=['title', 'url', 'description', 'image_url'], extrasaction='ignore')
         writer.writeheader()
         for product in products:
             writer.writerow(product)
@@ -151,5 +461,9 @@ def save_scraped_data(products):
 
 # Main execution
 if __name__ == "__main__":
-    products = scrape_shl_products()
+    import sys
+    
+    # Optional catalog URL argument, e.g. a local stand-in server
+    base_url = sys.argv[1] if len(sys.argv) > 1 else SHL_BASE_URL
+    products = scrape_shl_products(base_url)
     logger.info(f"Scraped {len(products)} SHL products")
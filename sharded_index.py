@@ -0,0 +1,283 @@
+import os
+import heapq
+import shutil
+import logging
+import tempfile
+import threading
+import itertools
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Shards the sparse index is split into, each scored by its own pool process; 1 scores in-process
+INDEX_SHARDS = int(os.environ.get("INDEX_SHARDS", 1))
+# Where shard arrays are written for the pool processes to memory-map (tmpfs when available)
+SHARD_DIR = os.environ.get("SHARD_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+def score_postings(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                   terms: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Accumulate query-term weights over the postings lists of an inverted index.
+    
+    Args:
+        indptr, indices, data: CSC arrays of the index (term -> chunk rows and weights)
+        terms: Column indices of the query terms
+        weights: Scorer weights of the query terms
+    
+    Returns:
+        Tuple of (chunk row indices, scores) for every chunk touched by the query
+    """
+    row_parts = []
+    score_parts = []
+    for term, weight in zip(terms, weights):
+        start, end = indptr[term], indptr[term + 1]
+        if start == end:
+            continue
+        row_parts.append(indices[start:end])
+        score_parts.append(data[start:end] * weight)
+    
+    if not row_parts:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+    
+    # Sum contributions per chunk (for TF-IDF, rows and query are L2-normalized so this is the cosine)
+    rows, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(score_parts), minlength=len(rows))
+    return rows, scores
+
+def pool_products(product_indices: np.ndarray, rows: np.ndarray, scores: np.ndarray, top_k: int,
+                  min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Max-pool chunk scores per product and select the top_k products.
+    
+    Args:
+        product_indices: Product of every chunk row
+        rows: Chunk row indices
+        scores: Scores of those chunks
+        top_k: Number of products to return
+        min_score: Chunks scoring below this are discarded before pooling
+    
+    Returns:
+        Tuple of (product indices, best chunk rows, best scores), ordered by
+        descending score with ties broken by product index
+    
+    Runs in time linear in the number of chunks plus a partial top_k selection;
+    product_indices must be non-decreasing (each product's chunks contiguous).
+    """
+    if min_score > 0:
+        keep = scores >= min_score
+        rows, scores = rows[keep], scores[keep]
+    
+    if top_k <= 0 or len(rows) == 0:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty, np.empty(0, dtype=np.float64)
+    
+    # Postings scoring yields ascending rows; other callers (e.g. dense candidates) are put in order
+    if np.any(rows[1:] < rows[:-1]):
+        order = np.argsort(rows, kind='stable')
+        rows, scores = rows[order], scores[order]
+    
+    # Chunks of a product are contiguous rows, so products are runs of equal pids: take each
+    # run's maximum, and its first chunk reaching it as the product's best chunk
+    pids = product_indices[rows]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(pids)) + 1))
+    best_scores = np.maximum.reduceat(scores, starts)
+    best_pids = pids[starts]
+    hits = np.flatnonzero(scores == np.repeat(best_scores, np.diff(np.append(starts, len(scores)))))
+    runs = np.searchsorted(starts, hits, side='right')
+    best = hits[np.concatenate(([True], runs[1:] != runs[:-1]))]
+    
+    k = min(top_k, len(best))
+    if k < len(best):
+        # Products tied with the k-th score are taken lowest index first (runs are in product
+        # order), so the selection does not depend on partition order and shards merge exactly
+        kth = np.partition(-best_scores, k - 1)[k - 1]
+        above = np.flatnonzero(-best_scores < kth)
+        tied = np.flatnonzero(-best_scores == kth)
+        selected = np.concatenate([above, tied[:k - len(above)]])
+    else:
+        selected = np.arange(len(best))
+    selected = selected[np.lexsort((best_pids[selected], -best_scores[selected]))]
+    
+    return best_pids[selected], rows[best[selected]], best_scores[selected]
+
+def shard_bounds(product_indices: np.ndarray, n_shards: int) -> List[int]:
+    """
+    Chunk row boundaries splitting the rows into up to n_shards contiguous shards of
+    similar size. Boundaries fall between products, so every product's chunks (which
+    are contiguous) land in a single shard and pooling within a shard is exact.
+    """
+    n_rows = len(product_indices)
+    starts = np.flatnonzero(np.diff(product_indices)) + 1  # First row of every product but the first
+    bounds = [0]
+    for i in range(1, n_shards):
+        position = np.searchsorted(starts, i * n_rows / n_shards)
+        if position < len(starts) and starts[position] > bounds[-1]:
+            bounds.append(int(starts[position]))
+    bounds.append(n_rows)
+    return bounds
+
+# Shards memory-mapped by this pool process, by directory
+_loaded: Dict[str, Tuple[np.ndarray, ...]] = {}
+
+def _load_shard(shard_dir: str) -> Tuple[np.ndarray, ...]:
+    shard = _loaded.get(shard_dir)
+    if shard is None:
+        shard = tuple(np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode='r')
+                      for name in ('indptr', 'indices', 'data', 'product_indices'))
+        # Keep the maps of the current index generation only; older shards are not queried again
+        generation = os.path.dirname(shard_dir)
+        for stale in [path for path in _loaded if os.path.dirname(path) != generation]:
+            del _loaded[stale]
+        _loaded[shard_dir] = shard
+    return shard
+
+def _score_shard(shard_dir: str, offset: int, terms: np.ndarray, weights: np.ndarray, top_k: int,
+                 min_score: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pool process task: local top_k of one shard, with chunk rows in global numbering.
+    """
+    indptr, indices, data, product_indices = _load_shard(shard_dir)
+    rows, scores = score_postings(indptr, indices, data, terms, weights)
+    pids, best_rows, best_scores = pool_products(product_indices, rows, scores, top_k, min_score)
+    return pids, best_rows + offset, best_scores
+
+class ShardPool:
+    """
+    Persistent process pool scoring index shards, one process per shard.
+    
+    Processes are spawned, not forked, so a pool can be started from a threaded
+    server; a forked child (e.g. a gunicorn worker) starts its own pool on first use.
+    A pool broken by a crashed process is replaced on the first use after reset().
+    """
+    
+    def __init__(self, n_processes: int):
+        self.n_processes = n_processes
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.n_processes,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                    self._pid = os.getpid()
+        return self._executor
+    
+    def reset(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Discard a broken executor so the next use starts fresh processes.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._pid = None
+        executor.shutdown(wait=False)
+
+# One pool per process, shared by every engine snapshot with the same shard count
+_pools: Dict[int, ShardPool] = {}
+
+def get_pool(n_processes: int) -> ShardPool:
+    pool = _pools.get(n_processes)
+    if pool is None:
+        pool = _pools.setdefault(n_processes, ShardPool(n_processes))
+    return pool
+
+def _remove_shards(path: str, owner: int) -> None:
+    # Forked children inherit the finalizer; only the process that wrote the files removes them
+    if os.getpid() == owner:
+        shutil.rmtree(path, ignore_errors=True)
+
+class ShardedPostings:
+    """
+    The inverted index split by chunk rows into product-aligned shards.
+    
+    Each shard's CSC arrays and chunk-to-product map are written once to SHARD_DIR
+    and memory-mapped read-only by the pool processes, so they share one copy
+    through the page cache. A query is scattered to every shard; each returns its
+    local top_k (exact, since no product spans shards) and the lists are merged
+    in a heap by (descending score, product index), which reproduces the
+    unsharded ranking exactly.
+    """
+    
+    def __init__(self, embeddings, product_indices: np.ndarray, n_shards: int):
+        """
+        Write the shards of a chunk weight matrix.
+        
+        Args:
+            embeddings: CSR chunk weight matrix (chunks x terms)
+            product_indices: Product of each chunk; chunks of a product must be contiguous
+            n_shards: Requested number of shards (fewer when there are fewer products)
+        """
+        self.bounds = shard_bounds(product_indices, n_shards)
+        self.path = tempfile.mkdtemp(prefix="rag-shards-", dir=SHARD_DIR)
+        self._finalizer = weakref.finalize(self, _remove_shards, self.path, os.getpid())
+        self.shard_dirs = []
+        for shard, (start, end) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+            postings = embeddings[start:end].tocsc()
+            postings.sort_indices()
+            shard_dir = os.path.join(self.path, str(shard))
+            os.makedirs(shard_dir)
+            np.save(os.path.join(shard_dir, "indptr.npy"), postings.indptr)
+            np.save(os.path.join(shard_dir, "indices.npy"), postings.indices)
+            np.save(os.path.join(shard_dir, "data.npy"), postings.data)
+            np.save(os.path.join(shard_dir, "product_indices.npy"), np.asarray(product_indices[start:end]))
+            self.shard_dirs.append(shard_dir)
+        self.pool = get_pool(len(self.shard_dirs))
+        logger.info(f"Split the index into {len(self.shard_dirs)} shards under {self.path}")
+    
+    def __len__(self) -> int:
+        return len(self.shard_dirs)
+    
+    def search(self, terms: np.ndarray, weights: np.ndarray, top_k: int,
+               min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scatter one query to all shards and merge their local top_k lists.
+        
+        Returns:
+            Tuple of (product indices, best chunk rows, scores) as from pool_products
+        
+        Raises:
+            BrokenProcessPool: If a pool process died; a replacement pool is started in the background
+        """
+        executor = self.pool.executor
+        try:
+            futures = [
+                executor.submit(_score_shard, shard_dir, start, terms, weights, top_k, min_score)
+                for shard_dir, start in zip(self.shard_dirs, self.bounds)
+            ]
+            shard_results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            self.pool.reset(executor)
+            threading.Thread(target=self.warm, name="shard-pool-warm", daemon=True).start()
+            raise
+        # Each shard list is sorted by (-score, product), so a k-way heap merge keeps the order
+        shard_lists = [zip((-scores).tolist(), pids.tolist(), rows.tolist())
+                       for pids, rows, scores in shard_results]
+        merged = list(itertools.islice(heapq.merge(*shard_lists), top_k))
+        if not merged:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        negated, pids, rows = zip(*merged)
+        return np.asarray(pids, dtype=np.int32), np.asarray(rows, dtype=np.int32), -np.asarray(negated)
+    
+    def warm(self) -> None:
+        """
+        Start the pool processes and map every shard before the first query.
+        """
+        executor = self.pool.executor
+        empty = np.empty(0, dtype=np.int32)
+        futures = [
+            executor.submit(_score_shard, shard_dir, start, empty, np.empty(0), 0, 0.0)
+            for shard_dir, start in zip(self.shard_dirs, self.bounds)
+        ]
+        for future in futures:
+            future.result()
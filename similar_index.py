@@ -0,0 +1,219 @@
+import os
+import logging
+from typing import Optional, Tuple
+import numpy as np
+from scipy import sparse
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Neighbours kept per product; 0 disables the table (its build is quadratic in the catalog size)
+SIMILAR_TOP_N = int(os.environ.get("SIMILAR_TOP_N", 10))
+
+# Chunk-pair similarities computed per block (~64 MB of float32); the all-chunks
+# side stays sparse, so this bounds the build's working set at any catalog size
+BLOCK_ELEMENTS = 1 << 24
+
+class SimilarityTable:
+    """
+    Precomputed product-to-product nearest neighbours.
+    
+    The similarity of two products is the best dot product between any chunk of
+    one and any chunk of the other (max-pooled over chunk pairs), using the
+    scorer's chunk weight matrix. Row p holds the top_n most similar products of
+    p, best first, padded with -1; looking up a product is a row read.
+    """
+    
+    def __init__(self, top_n: int = SIMILAR_TOP_N):
+        self.top_n = top_n
+        self.neighbours = np.full((0, top_n), -1, dtype=np.int32)
+        self.scores = np.zeros((0, top_n), dtype=np.float32)
+    
+    def __len__(self) -> int:
+        return len(self.neighbours)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.top_n > 0
+    
+    def build(self, embeddings: sparse.csr_matrix, product_indices: np.ndarray, n_products: int) -> None:
+        """
+        Compute the neighbours of every product.
+        
+        Args:
+            embeddings: Chunk weight matrix (chunks x terms)
+            product_indices: Product of each chunk; chunks of a product must be contiguous
+            n_products: Number of products, including ones without chunks
+        """
+        self.neighbours = np.full((n_products, self.top_n), -1, dtype=np.int32)
+        self.scores = np.zeros((n_products, self.top_n), dtype=np.float32)
+        if not self.enabled or embeddings.shape[0] == 0:
+            return
+        
+        pooled = _PooledSimilarity(embeddings, product_indices)
+        for block_pids, similarities in pooled.blocks(pooled.pids):
+            self.neighbours[block_pids], self.scores[block_pids] = _top_neighbours(
+                similarities, pooled.pids, self.top_n)
+        logger.info(f"Built similar-products table for {len(pooled.pids)} products (top {self.top_n})")
+    
+    def updated(self, embeddings: sparse.csr_matrix, product_indices: np.ndarray, n_products: int,
+                new_pids: np.ndarray, removed: np.ndarray) -> "SimilarityTable":
+        """
+        Table for an incrementally updated catalog, computing similarities only for new products.
+        
+        New products get full neighbour lists. Existing products merge the new
+        products into their lists and drop tombstoned neighbours; products that
+        ranked just below top_n before the update are not recalled, so such
+        lists stay approximate until the next full rebuild.
+        
+        Args:
+            embeddings, product_indices, n_products: State of the updated catalog
+            new_pids: Ids of the products added by the update
+            removed: Tombstone flags of all products
+        """
+        table = SimilarityTable(self.top_n)
+        table.neighbours = np.full((n_products, self.top_n), -1, dtype=np.int32)
+        table.scores = np.zeros((n_products, self.top_n), dtype=np.float32)
+        if not self.enabled:
+            return table
+        
+        # Existing lists without tombstoned neighbours
+        old_n = len(self.neighbours)
+        old_neighbours = np.array(self.neighbours)
+        old_scores = np.array(self.scores, dtype=np.float32)
+        dropped = (old_neighbours < 0) | removed[np.maximum(old_neighbours, 0)]
+        old_neighbours[dropped] = -1
+        old_scores[dropped] = -np.inf
+        
+        pooled = _PooledSimilarity(embeddings, product_indices)
+        new_pids = new_pids[np.isin(new_pids, pooled.pids)]
+        # Similarity of every product (column) to the new ones (rows), filled block by block
+        to_new = np.full((n_products, len(new_pids)), -np.inf, dtype=np.float32)
+        row = 0
+        for block_pids, similarities in pooled.blocks(new_pids):
+            table.neighbours[block_pids], table.scores[block_pids] = _top_neighbours(
+                similarities, pooled.pids, self.top_n)
+            to_new[pooled.pids, row:row + len(block_pids)] = similarities.T
+            row += len(block_pids)
+        
+        # Merge the new products into the lists of existing, still searchable products
+        existing = pooled.pids[pooled.pids < old_n]
+        candidates = np.concatenate([
+            old_neighbours[existing],
+            np.broadcast_to(new_pids.astype(np.int32), (len(existing), len(new_pids)))
+        ], axis=1)
+        candidate_scores = np.concatenate([old_scores[existing], to_new[existing]], axis=1)
+        table.neighbours[existing], table.scores[existing] = _select(candidates, candidate_scores, self.top_n)
+        logger.info(f"Updated similar-products table with {len(new_pids)} new products")
+        return table
+    
+    def lookup(self, product_id: int, top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbour ids and similarities of a product, best first (none for a negative top_k).
+        """
+        if top_k is not None:
+            top_k = max(0, top_k)
+        if product_id < 0 or product_id >= len(self.neighbours):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        neighbours = np.asarray(self.neighbours[product_id])
+        valid = neighbours >= 0
+        neighbours, scores = neighbours[valid], np.asarray(self.scores[product_id])[valid]
+        return neighbours[:top_k], scores[:top_k]
+    
+    def save(self, index_dir: str) -> None:
+        np.save(os.path.join(index_dir, "neighbours.npy"), self.neighbours)
+        np.save(os.path.join(index_dir, "neighbour_scores.npy"), self.scores)
+    
+    def load(self, index_dir: str) -> None:
+        self.neighbours = np.load(os.path.join(index_dir, "neighbours.npy"), mmap_mode='r')
+        self.scores = np.load(os.path.join(index_dir, "neighbour_scores.npy"), mmap_mode='r')
+        self.top_n = self.neighbours.shape[1]
+
+class _PooledSimilarity:
+    """
+    Blocked chunk-by-chunk similarity, max-pooled to product-by-product.
+    """
+    
+    def __init__(self, embeddings: sparse.csr_matrix, product_indices: np.ndarray):
+        # Products with chunks, and the first chunk row and chunk count of each
+        self.pids, self.starts = np.unique(product_indices, return_index=True)
+        self.lengths = np.diff(np.append(self.starts, len(product_indices)))
+        n_chunks = embeddings.shape[0]
+        
+        # Only a block's own chunk vectors are densified
+        self.chunks = sparse.csr_matrix(embeddings, dtype=np.float32)
+        self.block_rows = max(1, BLOCK_ELEMENTS // max(n_chunks, 1))
+    
+    def blocks(self, source_pids: np.ndarray):
+        """
+        Yield (product ids, similarities to all products) for consecutive blocks of source_pids.
+        Similarities are -inf against the product itself.
+        """
+        positions = np.searchsorted(self.pids, source_pids)
+        lengths = self.lengths[positions]
+        cumulative = np.cumsum(lengths)
+        start = 0
+        while start < len(positions):
+            # Whole products per block, at least one
+            offset = cumulative[start - 1] if start else 0
+            end = max(start + 1, int(np.searchsorted(cumulative, offset + self.block_rows, side='right')))
+            block = positions[start:end]
+            rows = np.concatenate([np.arange(self.starts[p], self.starts[p] + self.lengths[p]) for p in block])
+            
+            # (all chunks x block chunks), pooled over all products, then over the block's products
+            block_vectors = self.chunks[rows].toarray()
+            chunk_similarities = np.asarray(self.chunks @ block_vectors.T, dtype=np.float32)
+            pooled = _segment_max(chunk_similarities, self.starts, self.lengths)
+            block_starts = cumulative[start:end] - lengths[start:end] - offset
+            pooled = _segment_max(np.ascontiguousarray(pooled.T), block_starts, lengths[start:end])
+            pooled[np.arange(len(block)), block] = -np.inf
+            
+            yield self.pids[block], pooled
+            start = end
+
+def _segment_max(matrix: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Row-wise max over each contiguous segment of rows.
+    
+    Segments are short (a product has a few chunks), so instead of reduceat this folds
+    in the j-th row of every segment still that long; each step is one gather of whole rows.
+    """
+    pooled = matrix[starts]
+    for j in range(1, int(lengths.max()) if len(lengths) else 0):
+        longer = np.flatnonzero(lengths > j)
+        pooled[longer] = np.maximum(pooled[longer], matrix[starts[longer] + j])
+    return pooled
+
+def _top_neighbours(similarities: np.ndarray, column_pids: np.ndarray, top_n: int):
+    """
+    Best top_n columns of each row as (product ids, scores), padded with -1 and 0.
+    """
+    candidates = np.broadcast_to(column_pids, similarities.shape)
+    return _select(candidates, similarities, top_n)
+
+def _select(candidates: np.ndarray, scores: np.ndarray, top_n: int):
+    """
+    Per row, the top_n candidates with positive score, best first (ties by product id).
+    """
+    n_rows = len(candidates)
+    neighbours = np.full((n_rows, top_n), -1, dtype=np.int32)
+    neighbour_scores = np.zeros((n_rows, top_n), dtype=np.float32)
+    if n_rows == 0 or candidates.shape[1] == 0:
+        return neighbours, neighbour_scores
+    
+    k = min(top_n, candidates.shape[1])
+    if k < candidates.shape[1]:
+        selected = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        selected = np.broadcast_to(np.arange(k), (n_rows, k))
+    selected_ids = np.take_along_axis(candidates, selected, axis=1)
+    selected_scores = np.take_along_axis(scores, selected, axis=1)
+    order = np.lexsort((selected_ids, -selected_scores), axis=1)
+    selected_ids = np.take_along_axis(selected_ids, order, axis=1)
+    selected_scores = np.take_along_axis(selected_scores, order, axis=1)
+    
+    valid = selected_scores > 0
+    neighbours[:, :k] = np.where(valid, selected_ids, -1)
+    neighbour_scores[:, :k] = np.where(valid, selected_scores, 0)
+    return neighbours, neighbour_scores
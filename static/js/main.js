@@ -4,6 +4,15 @@ document.addEventListener('DOMContentLoaded', function() {
     const queryInput = document.getElementById('query-input');
     const chatContainer = document.getElementById('chat-container');
     const themeToggle = document.getElementById('theme-toggle');
+    const suggestionList = document.getElementById('suggestion-list');
+    
+    // Autocomplete settings: wait for a pause in typing before asking the server
+    const SUGGEST_DEBOUNCE_MS = 150;
+    const SUGGEST_MIN_CHARS = 2;
+    const suggestionCache = new Map();
+    let suggestTimer = null;
+    let suggestController = null;
+    let activeSuggestion = -1;
     
     // Theme Toggle
     themeToggle.addEventListener('click', function() {
@@ -21,6 +30,39 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // Autocomplete: debounced requests to /api/suggest while typing
+    queryInput.addEventListener('input', function() {
+        clearTimeout(suggestTimer);
+        const prefix = queryInput.value;
+        if (prefix.trim().length < SUGGEST_MIN_CHARS) {
+            hideSuggestions();
+            return;
+        }
+        suggestTimer = setTimeout(() => fetchSuggestions(prefix), SUGGEST_DEBOUNCE_MS);
+    });
+    
+    queryInput.addEventListener('keydown', function(e) {
+        const items = suggestionList.querySelectorAll('.list-group-item');
+        if (suggestionList.classList.contains('d-none') || items.length === 0) return;
+        
+        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+            e.preventDefault();
+            const step = e.key === 'ArrowDown' ? 1 : -1;
+            activeSuggestion = (activeSuggestion + step + items.length) % items.length;
+            items.forEach((item, index) => item.classList.toggle('active', index === activeSuggestion));
+        } else if (e.key === 'Enter' && activeSuggestion >= 0) {
+            e.preventDefault();
+            items[activeSuggestion].click();
+        } else if (e.key === 'Escape') {
+            hideSuggestions();
+        }
+    });
+    
+    queryInput.addEventListener('blur', function() {
+        // Delay so a click on a suggestion lands before the list disappears
+        setTimeout(hideSuggestions, 150);
+    });
+    
     // Query Form Submission
     queryForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -28,6 +70,10 @@ document.addEventListener('DOMContentLoaded', function() {
         const query = queryInput.value.trim();
         if (!query) return;
         
+        // A submitted query makes pending suggestions irrelevant
+        clearTimeout(suggestTimer);
+        hideSuggestions();
+        
         // Add user message to chat
         addUserMessage(query);
         
@@ -68,6 +114,81 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Fetch completions for a prefix, reusing earlier answers and cancelling stale requests
+    function fetchSuggestions(prefix) {
+        const key = prefix.trim().toLowerCase();
+        if (suggestionCache.has(key)) {
+            showSuggestions(suggestionCache.get(key));
+            return;
+        }
+        
+        if (suggestController) {
+            suggestController.abort();
+        }
+        suggestController = new AbortController();
+        
+        fetch(`/api/suggest?prefix=${encodeURIComponent(prefix)}&limit=8`, { signal: suggestController.signal })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+            suggestionCache.set(key, data.suggestions);
+            // Only show them if the input still holds this prefix
+            if (queryInput.value === prefix) {
+                showSuggestions(data.suggestions);
+            }
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error('Error:', error);
+            }
+        });
+    }
+    
+    // Render the suggestion dropdown
+    function showSuggestions(suggestions) {
+        suggestionList.innerHTML = '';
+        activeSuggestion = -1;
+        if (!suggestions || suggestions.length === 0) {
+            hideSuggestions();
+            return;
+        }
+        
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('li');
+            item.className = 'list-group-item list-group-item-action';
+            item.setAttribute('role', 'option');
+            
+            const icon = document.createElement('i');
+            icon.className = suggestion.type === 'title' ? 'fas fa-clipboard-list me-2' : 'fas fa-search me-2';
+            item.appendChild(icon);
+            item.appendChild(document.createTextNode(suggestion.text));
+            
+            // Titles run a search straight away; terms complete the text being typed
+            item.addEventListener('mousedown', e => e.preventDefault());
+            item.addEventListener('click', function() {
+                queryInput.value = suggestion.text;
+                hideSuggestions();
+                if (suggestion.type === 'title') {
+                    queryForm.requestSubmit();
+                } else {
+                    queryInput.value += ' ';
+                    queryInput.focus();
+                }
+            });
+            suggestionList.appendChild(item);
+        });
+        
+        suggestionList.classList.remove('d-none');
+        queryInput.setAttribute('aria-expanded', 'true');
+    }
+    
+    function hideSuggestions() {
+        suggestionList.classList.add('d-none');
+        suggestionList.innerHTML = '';
+        activeSuggestion = -1;
+        queryInput.setAttribute('aria-expanded', 'false');
+    }
+    
     // Add user message to chat
     function addUserMessage(message) {
         const messageContainer = document.createElement('div');
@@ -108,6 +229,11 @@ document.addEventListener('DOMContentLoaded', function() {
             });
             
             messageElement.appendChild(recommendationContainer);
+            
+            // Later pages come from the server's stored ranking via the cursor
+            if (data.next_cursor) {
+                messageElement.appendChild(createShowMoreButton(recommendationContainer, data.next_cursor));
+            }
         } else {
             const noResultsParagraph = document.createElement('p');
             noResultsParagraph.textContent = "I couldn't find any matching assessments. Please try a different query.";
@@ -121,6 +247,50 @@ document.addEventListener('DOMContentLoaded', function() {
         scrollToBottom();
     }
     
+    // Button that appends the next page of results to a recommendation container
+    function createShowMoreButton(recommendationContainer, cursor) {
+        const button = document.createElement('button');
+        button.type = 'button';
+        button.className = 'btn btn-outline-secondary btn-sm mt-2';
+        button.textContent = 'Show more';
+        
+        button.addEventListener('click', function() {
+            button.disabled = true;
+            fetch('/api/query', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ cursor: cursor })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    button.remove();
+                    addErrorMessage(data.error || 'An error occurred while loading more results.');
+                    return;
+                }
+                
+                data.recommendations.forEach((rec, index) => {
+                    recommendationContainer.appendChild(createRecommendationCard(rec, index));
+                });
+                
+                if (data.next_cursor) {
+                    cursor = data.next_cursor;
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(error => {
+                button.disabled = false;
+                console.error('Error:', error);
+            });
+        });
+        
+        return button;
+    }
+    
     // Create recommendation card
     function createRecommendationCard(recommendation, index) {
         const card = document.createElement('div');
@@ -0,0 +1,135 @@
+import os
+import re
+import bisect
+import logging
+from typing import Any, Dict, List, Sequence
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG").upper())
+logger = logging.getLogger(__name__)
+
+# Vocabulary terms found in more than this fraction of chunks are too generic to suggest
+SUGGEST_MAX_DF = float(os.environ.get("SUGGEST_MAX_DF", 0.5))
+# Upper bound on completions returned for one prefix
+MAX_SUGGESTIONS = 20
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# Sorts after every character, so [prefix, prefix + _HIGHEST) spans all keys starting with prefix
+_HIGHEST = '\U0010ffff'
+
+def normalize_prefix(text: str) -> str:
+    return _WHITESPACE_RE.sub(' ', text).lstrip().lower()
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over product titles and vocabulary terms.
+    
+    Every title is keyed once per word, so "java" completes to "Core Java (Entry Level)"
+    as well as to titles starting with it. A lookup is two binary searches for the
+    range of keys sharing the prefix, then a top-k over precomputed ranks:
+    titles starting with the prefix first (shorter first), then vocabulary terms
+    (more common first), then titles matching at a later word.
+    """
+    
+    TITLE, TERM = 0, 1
+    
+    def __init__(self):
+        self.keys: List[str] = []  # Sorted, normalized keys
+        self.kinds = np.zeros(0, dtype=np.int8)  # TITLE or TERM, parallel to keys
+        self.targets = np.zeros(0, dtype=np.int32)  # Product index or term index
+        self.ranks = np.zeros(0, dtype=np.float64)  # Lower ranks are suggested first
+        self.titles: Sequence[str] = []
+        self.terms: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @classmethod
+    def build(cls, titles: Sequence[str], product_ids: Sequence[int], terms: List[str],
+              doc_freq: np.ndarray, n_chunks: int) -> "PrefixIndex":
+        """
+        Args:
+            titles: Titles of all products, indexed by product id
+            product_ids: Ids of the searchable (not tombstoned) products
+            terms: Scorer vocabulary, ordered by column
+            doc_freq: Number of chunks containing each term
+            n_chunks: Total number of chunks
+        """
+        entries = []
+        for pid in product_ids:
+            title = normalize_prefix(titles[pid]).rstrip()
+            length_rank = min(len(title), 9999) / 10000
+            words = title.split(' ')
+            start = 0
+            for position, word in enumerate(words):
+                if word:
+                    rank = length_rank if position == 0 else 2 + length_rank
+                    entries.append((title[start:], cls.TITLE, pid, rank))
+                start += len(word) + 1
+        
+        max_df = SUGGEST_MAX_DF * max(n_chunks, 1)
+        for col, (term, df) in enumerate(zip(terms, doc_freq.tolist())):
+            if 0 < df <= max_df:
+                entries.append((term, cls.TERM, col, 2 - df / max(n_chunks, 1)))
+        
+        entries.sort(key=lambda entry: entry[0])
+        index = cls()
+        index.keys = [entry[0] for entry in entries]
+        index.kinds = np.fromiter((entry[1] for entry in entries), dtype=np.int8, count=len(entries))
+        index.targets = np.fromiter((entry[2] for entry in entries), dtype=np.int32, count=len(entries))
+        index.ranks = np.fromiter((entry[3] for entry in entries), dtype=np.float64, count=len(entries))
+        index.titles = titles
+        index.terms = terms
+        logger.info(f"Built prefix index with {len(entries)} keys")
+        return index
+    
+    def _candidates(self, prefix: str, k: int) -> np.ndarray:
+        """
+        Positions of up to k keys starting with prefix, lowest rank first (ties in key order).
+        """
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + _HIGHEST, lo)
+        ranks = self.ranks[lo:hi]
+        if k < len(ranks):
+            candidates = np.sort(np.argpartition(ranks, k - 1)[:k])
+        else:
+            candidates = np.arange(len(ranks))
+        return candidates[np.argsort(ranks[candidates], kind='stable')] + lo
+    
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        Completions for prefix, best first; each title or term appears at most once.
+        
+        Titles and terms are matched against the whole prefix. For multi-word
+        prefixes, remaining slots complete the last word with vocabulary terms.
+        """
+        prefix = normalize_prefix(prefix)
+        limit = max(0, min(limit, MAX_SUGGESTIONS))
+        if not prefix or not limit:
+            return []
+        
+        suggestions = []
+        seen = set()
+        # A title can match at several words; over-select so duplicates still leave limit results
+        for entry in self._candidates(prefix, limit * 4).tolist():
+            kind, target = int(self.kinds[entry]), int(self.targets[entry])
+            if (kind, target) in seen:
+                continue
+            seen.add((kind, target))
+            if kind == self.TITLE:
+                suggestions.append({'text': self.titles[target], 'type': 'title'})
+            else:
+                suggestions.append({'text': self.terms[target], 'type': 'term'})
+            if len(suggestions) == limit:
+                return suggestions
+        
+        head, _, last_word = prefix.rpartition(' ')
+        if head and last_word:
+            for entry in self._candidates(last_word, limit * 4).tolist():
+                if self.kinds[entry] != self.TERM:
+                    continue
+                suggestions.append({'text': f"{head} {self.terms[self.targets[entry]]}", 'type': 'term'})
+                if len(suggestions) == limit:
+                    break
+        return suggestions